@@ -1,14 +1,23 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, g, request, jsonify, send_from_directory
 from flask_cors import CORS
 import os
 import pandas as pd
+import signal
 import sys
+import time
 
 # Добавляем директорию src в путь для импорта
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
 # Импортируем функции из модуля model.py
-from src.model import get_real_estate_details, extract_json_from_string, calculate_similarity_score
+from src.model import (extract_features_locally, extract_features_with_llm, extract_real_estate_features,
+                       extract_real_estate_features_async, preliminary_features, recommend_batch, service)
+from src.catalogue_reloader import CatalogueSnapshot, CatalogueReloader
+from src.structured_index import search_top_k
+from src.embedding_index import search_dense
+from src.search_log import SearchLog
+from src.result_cache import ResultCache, result_key
+from src.metrics import metrics, process_memory, render_counters, render_gauges, SlowRequestProfiler
 
 # Инициализация Flask приложения
 app = Flask(__name__, static_url_path='')
@@ -17,26 +26,178 @@ CORS(app)  # Включаем CORS для всех маршрутов
 # Определяем абсолютный путь к файлам данных
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 data_path = os.path.join(BASE_DIR, "data", "apartments.csv")
+description_index_path = os.path.join(BASE_DIR, "data", "index", "description_index.pkl")
+embedding_index_path = os.path.join(BASE_DIR, "data", "index", "embeddings")
 
-# Загружаем CSV файл с данными о квартирах
-try:
-    df = pd.read_csv(data_path, index_col=0)
-    print(f"Загружено {len(df)} объявлений о квартирах")
-except FileNotFoundError:
-    print(f"Ошибка: Файл {data_path} не найден")
-    df = pd.DataFrame()
+# Режим поиска: tfidf - структурный индекс и TF-IDF описаний, dense - кандидаты из
+# приближённого поиска по векторам описаний (SEARCH_MODE=dense)
+SEARCH_MODE = os.environ.get("SEARCH_MODE", "tfidf")
+# Кандидатов из индекса векторов и просматриваемых кластеров IVF на запрос
+DENSE_CANDIDATES = int(os.environ.get("DENSE_CANDIDATES", 200))
+DENSE_NPROBE = int(os.environ.get("DENSE_NPROBE", 16))
+# Жёсткий фильтр по цене, площади и этажу: объявления вне диапазонов запроса не показываются
+# (по умолчанию они только получают меньшую оценку)
+NUMERIC_FILTER = os.environ.get("NUMERIC_FILTER", "0") == "1"
+# Точное ранжирование (полный перебор); EXACT_SEARCH=0 - отбор кандидатов ярусами по структурному
+# индексу: на больших каталогах быстрее, но top-k может отличаться от полного ранжирования
+EXACT_SEARCH = os.environ.get("EXACT_SEARCH", "1") == "1"
+
+# Загружаем каталог квартир (один экземпляр на процесс, общий с src.model) и клиент LLM
+_initial_df = service.warm_up().df
+if not _initial_df.empty:
+    print(f"Загружено {len(_initial_df)} объявлений о квартирах")
+
+# Снимок каталога с индексами: индекс описаний (строится один раз или берётся с диска,
+# если CSV не менялся) и инвертированные индексы по комнатам, району, улице, цене и площади
+# В режиме dense к ним добавляется индекс векторов описаний (файлы в data/index/embeddings)
+catalogue_embedding_path = embedding_index_path if SEARCH_MODE == "dense" else None
+catalogue = CatalogueSnapshot.build(_initial_df, data_path, description_index_path,
+                                    embedding_path=catalogue_embedding_path, catalogue=service.catalogue)
+
+# Кэш top-k результатов по признакам, терминам запроса и версии каталога (RESULT_CACHE=0 - выключить)
+result_cache = None
+if os.environ.get("RESULT_CACHE", "1") == "1":
+    result_cache = ResultCache(
+        max_bytes=int(os.environ.get("RESULT_CACHE_MAX_BYTES", 32 * 1024 * 1024)),
+        redis_url=os.environ.get("RESULT_CACHE_REDIS_URL") or None,
+        redis_ttl=int(os.environ.get("RESULT_CACHE_TTL", 3600)),
+    )
+    result_cache.set_version(catalogue.version)
+
+def on_catalogue_swap(snapshot):
+    """Новый снимок каталога: общий с src.model каталог и кэш результатов переходят на новую версию"""
+    service.replace_catalogue(snapshot.df, snapshot.catalogue)
+    if result_cache is not None:
+        result_cache.set_version(snapshot.version)
+
+# Фоновая перезагрузка каталога при изменении data/apartments.csv (CATALOGUE_RELOAD_INTERVAL=0 - выключить).
+# Под serve.py файл отслеживает родительский процесс (REALTOR_MASTER_PID), а обработчики получают новый
+# снимок при перезапуске
+MASTER_PID = int(os.environ.get("REALTOR_MASTER_PID", 0)) or None
+reloader = CatalogueReloader(catalogue, data_path, description_index_path,
+                             interval=float(os.environ.get("CATALOGUE_RELOAD_INTERVAL", 5)),
+                             on_swap=on_catalogue_swap,
+                             embedding_path=catalogue_embedding_path)
+if MASTER_PID is None:
+    reloader.start()
+
+# Наибольшее число запросов и результатов на запрос в одном вызове /recommend/batch
+BATCH_MAX_QUERIES = int(os.environ.get("BATCH_MAX_QUERIES", 1000))
+BATCH_MAX_K = int(os.environ.get("BATCH_MAX_K", 100))
+
+# Журнал поисковых запросов для анализа (включается переменной SEARCH_LOG=1)
+search_log = None
+if os.environ.get("SEARCH_LOG", "0") == "1":
+    search_log = SearchLog(
+        os.environ.get("SEARCH_LOG_PATH", os.path.join(BASE_DIR, "data", "search_log.jsonl")),
+        max_bytes=int(os.environ.get("SEARCH_LOG_MAX_BYTES", 10 * 1024 * 1024)),
+    )
+
+# Профили cProfile для медленных запросов поиска (включается PROFILE_SLOW_MS, файлы в PROFILE_DIR)
+profiler = None
+if os.environ.get("PROFILE_SLOW_MS"):
+    profiler = SlowRequestProfiler(os.environ.get("PROFILE_DIR", os.path.join(BASE_DIR, "data", "profiles")),
+                                   threshold=float(os.environ["PROFILE_SLOW_MS"]) / 1000)
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    if profiler is not None and request.path.startswith('/recommend'):
+        g.profile = profiler.start()
+
+@app.after_request
+def record_request_time(response):
+    """
+    Длительность запроса в гистограмму по маршруту и коду ответа; профиль медленного
+    запроса - на диск. Тело потокового ответа (/recommend/stream) формируется уже после
+    after_request, поэтому для него замер завершается при закрытии ответа
+    """
+    request_start = g.get('request_start')
+    profile = g.get('profile')
+    endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    path = request.path
+
+    def finish():
+        if request_start is not None:
+            metrics.observe("realtor_request_seconds", time.perf_counter() - request_start,
+                            "Длительность HTTP-запросов, секунды", endpoint=endpoint, status=str(response.status_code))
+        if profile is not None:
+            dump = profiler.stop(profile, path)
+            if dump:
+                print(f"Медленный запрос {path}: профиль сохранён в {dump}")
+
+    if response.is_streamed:
+        response.call_on_close(finish)
+    else:
+        finish()
+    return response
 
 @app.route('/')
 def index():
     """Отображение главной страницы"""
     return send_from_directory(BASE_DIR, 'index.html')
 
+def listings_to_json(df, positions, scores):
+    """Найденные объявления в виде списка словарей для JSON (каталог не копируется)"""
+    top_results = []
+    for position, similarity in zip(positions, scores):
+        row = df.iloc[position].to_dict()
+        apartment = {col: value for col, value in row.items() if pd.notna(value)}
+        apartment['similarity_score'] = float(similarity)
+        # Добавляем процент схожести в формате для отображения
+        apartment['match_percent'] = int(similarity * 100) if similarity <= 1 else 100
+        top_results.append(apartment)
+    return top_results
+
+def rank_listings(snapshot, user_input, real_estate_dict, log=True):
+    """Топ-10 квартир для извлечённых признаков в виде списка словарей для JSON (log - записать в журнал поиска)"""
+    # Вычисление схожести и сортировка
+    print("Поиск подходящих вариантов...")
+    key = None
+    cached = None
+    if result_cache is not None:
+        mode = "dense" if snapshot.embedding_index is not None else "search"
+        key = result_key(real_estate_dict, user_input, snapshot.version, 10,
+                         mode=f"{mode}+filter" if NUMERIC_FILTER else mode, columns=snapshot.df.columns)
+        cached = result_cache.get(key)
+    if cached is not None:
+        positions, scores = cached
+    else:
+        with metrics.timed("scoring"):
+            if snapshot.embedding_index is not None:
+                # Семантический режим: оценки считаются только для ближайших по вектору описания объявлений
+                positions, scores = search_dense(snapshot.df, real_estate_dict, user_input, snapshot.embedding_index,
+                                                 k=10, n_candidates=DENSE_CANDIDATES, nprobe=DENSE_NPROBE,
+                                                 structured_index=snapshot.structured_index, hard_filter=NUMERIC_FILTER)
+            else:
+                # Точный top-k полным векторизованным перебором; при EXACT_SEARCH=0 текстовая схожесть
+                # считается только для кандидатов из структурного индекса (быстрее, но приближённо)
+                positions, scores = search_top_k(snapshot.df, real_estate_dict, user_input, k=10,
+                                                 structured_index=snapshot.structured_index,
+                                                 description_index=snapshot.description_index,
+                                                 exact=EXACT_SEARCH, hard_filter=NUMERIC_FILTER)
+        if key is not None:
+            result_cache.set(key, positions, scores)
+
+    with metrics.timed("serialization"):
+        top_results = listings_to_json(snapshot.df, positions, scores)
+
+    print(f"Найдено {len(top_results)} подходящих вариантов")
+
+    # Записываем запрос и его результаты в журнал в фоновом потоке
+    if search_log is not None and log:
+        search_log.log(user_input, real_estate_dict,
+                       [(item.get('url', ''), item['similarity_score']) for item in top_results])
+    return top_results
+
 @app.route('/recommend', methods=['POST'])
 def recommend():
     """
     Обрабатывает запрос на поиск квартир и возвращает топ-10 результатов
     """
-    if df.empty:
+    # Снимок каталога берётся один раз: перезагрузка не затронет этот запрос
+    snapshot = reloader.current
+    if snapshot.df.empty:
         return jsonify([]), 500
 
     # Получаем пользовательский запрос из JSON
@@ -49,40 +210,226 @@ def recommend():
     try:
         # Получаем признаки из LLM
         print(f"Анализ запроса пользователя: {user_input[:50]}...")
-        formatted_response = get_real_estate_details(user_input)
-        real_estate_dict = extract_json_from_string(formatted_response)
+        real_estate_dict = extract_real_estate_features(user_input)
         
         if "error" in real_estate_dict:
             print(f"Ошибка при извлечении данных: {real_estate_dict['error']}")
             return jsonify([]), 500
         
-        # Вычисление схожести и сортировка
-        print("Поиск подходящих вариантов...")
-        df_copy = df.copy()
-        df_copy["similarity_score"] = calculate_similarity_score(df_copy, real_estate_dict, user_input)
-        df_sorted = df_copy.sort_values("similarity_score", ascending=False)
-        
-        # Преобразуем топ-10 результатов в список словарей для JSON
-        top_results = []
-        for _, row in df_sorted.head(10).iterrows():
-            apartment = {col: row[col] for col in df_sorted.columns if pd.notna(row[col])}
-            # Добавляем процент схожести в формате для отображения
-            similarity = row.get('similarity_score', 0)
-            apartment['match_percent'] = int(similarity * 100) if similarity <= 1 else 100
-            top_results.append(apartment)
-        
-        print(f"Найдено {len(top_results)} подходящих вариантов")
-        
-        # Сохраняем результаты поиска для анализа
-        results_path = os.path.join(BASE_DIR, "data", "search_results.csv")
-        df_sorted.to_csv(results_path)
-        
-        return jsonify(top_results)
+        top_results = rank_listings(snapshot, user_input, real_estate_dict)
+        with metrics.timed("response_json"):
+            return jsonify(top_results)
     
     except Exception as e:
         print(f"Ошибка при выполнении запроса: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/recommend/async', methods=['POST'])
+async def recommend_async():
+    """
+    То же, что /recommend, но вызовы LLM идут через общий асинхронный шлюз с лимитом
+    параллельности, таймаутом и объединением одинаковых запросов. Flask выполняет
+    async-view в потоке WSGI-сервера, так что поток занят и во время ожидания LLM;
+    без занятого потока этот маршрут обслуживает asgi.py под uvicorn
+    """
+    # Снимок каталога берётся один раз: перезагрузка не затронет этот запрос
+    snapshot = reloader.current
+    if snapshot.df.empty:
+        return jsonify([]), 500
+
+    data = request.json
+    user_input = data.get('user_input', '')
+
+    if not user_input:
+        return jsonify([]), 400
+
+    try:
+        print(f"Анализ запроса пользователя: {user_input[:50]}...")
+        real_estate_dict = await extract_real_estate_features_async(user_input)
+
+        if "error" in real_estate_dict:
+            print(f"Ошибка при извлечении данных: {real_estate_dict['error']}")
+            # Таймаут шлюза - 504, остальные ошибки - 500
+            return jsonify([]), 504 if "TimeoutError" in real_estate_dict['error'] else 500
+
+        top_results = rank_listings(snapshot, user_input, real_estate_dict)
+        with metrics.timed("response_json"):
+            return jsonify(top_results)
+
+    except Exception as e:
+        print(f"Ошибка при выполнении запроса: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/recommend/stream', methods=['POST'])
+def recommend_stream():
+    """
+    Потоковый вариант /recommend: ответ в формате NDJSON, по строке JSON на этап.
+    Сразу отправляется предварительный топ-10 по признакам, разобранным локально,
+    затем уточнённый - после извлечения признаков LLM. Если запрос целиком разобран
+    локально, отправляется только итоговый этап.
+    Строки: {"stage": "preliminary" | "final", "features": {...}, "results": [...]}
+    или {"stage": "error", "error": "..."}
+    """
+    # Снимок каталога берётся один раз: перезагрузка не затронет этот запрос
+    snapshot = reloader.current
+    if snapshot.df.empty:
+        return jsonify([]), 500
+
+    data = request.json
+    user_input = data.get('user_input', '')
+
+    if not user_input:
+        return jsonify([]), 400
+
+    start = time.perf_counter()
+
+    def stage_line(stage, **payload):
+        # Время до первой и до итоговой выдачи с начала запроса
+        metrics.observe("realtor_stream_stage_seconds", time.perf_counter() - start,
+                        "Время от начала потокового запроса до отправки этапа, секунды", stage=stage)
+        return app.json.dumps(dict(payload, stage=stage)) + "\n"
+
+    def stages():
+        try:
+            print(f"Анализ запроса пользователя: {user_input[:50]}...")
+            real_estate_dict = extract_features_locally(user_input)
+            if real_estate_dict is None:
+                features = preliminary_features(user_input)
+                yield stage_line("preliminary", features=features,
+                                 results=rank_listings(snapshot, user_input, features, log=False))
+                real_estate_dict = extract_features_with_llm(user_input)
+
+            if "error" in real_estate_dict:
+                print(f"Ошибка при извлечении данных: {real_estate_dict['error']}")
+                yield stage_line("error", error=real_estate_dict['error'])
+                return
+            yield stage_line("final", features=real_estate_dict,
+                             results=rank_listings(snapshot, user_input, real_estate_dict))
+        except Exception as e:
+            print(f"Ошибка при выполнении запроса: {e}")
+            yield stage_line("error", error=str(e))
+
+    # Без буферизации в прокси (nginx), чтобы предварительный этап доходил сразу
+    return Response(stages(), mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def _valid_batch_query(query):
+    """Запрос пакета: текст или объект с необязательными user_input (текст) и features (объект)"""
+    if isinstance(query, str):
+        return True
+    return (isinstance(query, dict) and isinstance(query.get('user_input', ''), (str, type(None)))
+            and isinstance(query.get('features', {}), (dict, type(None))))
+
+@app.route('/recommend/batch', methods=['POST'])
+def recommend_batch_route():
+    """
+    Пакетный поиск: {"queries": [текст или {"user_input": ..., "features": {...}}, ...], "k": 10}.
+    Все запросы оцениваются одной матрицей; ответ - список {"features", "results"} в порядке запросов
+    """
+    # Снимок каталога берётся один раз: перезагрузка не затронет этот запрос
+    snapshot = reloader.current
+    if snapshot.df.empty:
+        return jsonify([]), 500
+
+    data = request.json or {}
+    if not isinstance(data, dict):
+        data = {}
+    queries = data.get('queries') or []
+    try:
+        k = int(data.get('k', 10))
+    except (TypeError, ValueError):
+        # Некорректное k отклоняется той же ошибкой 400, что и k <= 0
+        k = 0
+    if (not isinstance(queries, list) or not queries or len(queries) > BATCH_MAX_QUERIES
+            or not all(map(_valid_batch_query, queries)) or not 0 < k <= BATCH_MAX_K):
+        return jsonify({"error": f"queries: от 1 до {BATCH_MAX_QUERIES} запросов (текст или объект), "
+                                 f"k от 1 до {BATCH_MAX_K}"}), 400
+
+    try:
+        print(f"Пакетный поиск: {len(queries)} запросов")
+        results = recommend_batch(snapshot.df, queries, k=k, description_index=snapshot.description_index,
+                                  result_cache=result_cache, catalogue_version=snapshot.version,
+                                  numeric=snapshot.structured_index.numeric, hard_filter=NUMERIC_FILTER)
+        with metrics.timed("serialization"):
+            response = [{"features": features, "results": listings_to_json(snapshot.df, positions, scores)}
+                        for positions, scores, features in results]
+        with metrics.timed("response_json"):
+            return jsonify(response)
+    except Exception as e:
+        print(f"Ошибка при выполнении пакетного запроса: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/cache/stats')
+def cache_stats():
+    """Статистика кэша извлечения признаков LLM и кэша результатов (results)"""
+    return jsonify(dict(service.llm_cache.stats(),
+                        results=result_cache.stats() if result_cache is not None else None))
+
+@app.route('/catalogue/stats')
+def catalogue_stats():
+    """Версия текущего каталога, время последней загрузки и число перезагрузок"""
+    return jsonify(dict(reloader.stats(), pid=os.getpid()))
+
+@app.route('/catalogue/reload', methods=['POST'])
+def catalogue_reload():
+    """Принудительная перезагрузка каталога (например, сразу после сбора данных)"""
+    if MASTER_PID is not None:
+        # Каталог перезагружает родительский процесс serve.py, затем перезапускает обработчики
+        os.kill(MASTER_PID, signal.SIGHUP)
+        return jsonify(dict(reloader.stats(), reloaded="scheduled"))
+    reloaded = reloader.reload()
+    return jsonify(dict(reloader.stats(), reloaded=reloaded))
+
+@app.route('/llm/stats')
+def llm_stats():
+    """
+    Статистика асинхронного шлюза LLM (вызовы, объединённые запросы, таймауты) и
+    локального извлечения признаков (сколько запросов обошлись без LLM), токены и задержки
+    вызовов LLM по протоколам (usage)
+    """
+    extractor = service.fast_extractor
+    return jsonify(dict(service.llm_gateway.stats(),
+                        fast_path=extractor.stats() if extractor is not None else None,
+                        usage=service.llm_usage.stats()))
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """
+    Гистограммы задержек по этапам и маршрутам и счётчики кэшей в формате Prometheus.
+    Под serve.py ответ даёт тот обработчик, который принял запрос, и его серии помечены
+    меткой pid: серии разных обработчиков не смешиваются, а сумма по всем - sum without(pid)
+    """
+    worker = {"pid": os.getpid()} if MASTER_PID is not None else None
+    llm_cache = service.llm_cache.stats()
+    gateway = service.llm_gateway.stats()
+    extractor = service.fast_extractor
+    caches = [({"cache": "llm", "result": "hit"}, llm_cache["hits"]),
+              ({"cache": "llm", "result": "miss"}, llm_cache["misses"])]
+    if result_cache is not None:
+        results = result_cache.stats()
+        caches += [({"cache": "results", "result": "hit"}, results["hits"]),
+                   ({"cache": "results", "result": "miss"}, results["misses"])]
+    llm_calls = [({"kind": "api_calls"}, gateway["calls"]),
+                 ({"kind": "coalesced"}, gateway["coalesced"]),
+                 ({"kind": "timeouts"}, gateway["timeouts"]),
+                 ({"kind": "errors"}, gateway["errors"])]
+    if extractor is not None:
+        llm_calls.append(({"kind": "fast_path"}, extractor.stats()["accepted"]))
+    tokens = [({"protocol": protocol, "kind": kind}, usage[f"{kind}_tokens"])
+              for protocol, usage in service.llm_usage.stats().items() for kind in ("prompt", "completion")]
+    snapshot = reloader.current
+    text = (metrics.render(worker)
+            + render_counters("realtor_cache_lookups", "Обращения к кэшам", caches, worker)
+            + render_counters("realtor_llm_requests", "Запросы извлечения признаков (асинхронный шлюз и локальное извлечение)",
+                              llm_calls, worker)
+            + render_counters("realtor_llm_tokens", "Токены запросов и ответов LLM с запуска процесса", tokens, worker)
+            + render_gauges("realtor_catalogue_rows", "Объявлений в текущем каталоге", [({}, len(snapshot.df))], worker)
+            + render_gauges("realtor_catalogue_generation", "Номер перезагрузки каталога", [({}, snapshot.generation)],
+                            worker)
+            + render_gauges("realtor_process_memory_bytes", "Память процесса-обработчика (pss учитывает общие страницы)",
+                            [({"kind": kind, "pid": os.getpid()}, value) for kind, value in process_memory().items()]))
+    return Response(text, mimetype="text/plain; version=0.0.4")
+
 if __name__ == '__main__':
     print("Запуск API-сервера на порту 5000...")
     app.run(debug=True, port=5000)
\ No newline at end of file
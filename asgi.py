@@ -0,0 +1,109 @@
+"""
+ASGI-вход приложения для uvicorn и других ASGI-серверов.
+
+Flask выполняет async-view в потоке WSGI-сервера, поэтому под app.py и serve.py
+запрос к /recommend/async занимает поток всё время ожидания LLM. Здесь этот
+маршрут обслуживается прямо событийным циклом ASGI-сервера: пока ответ LLM не
+пришёл, поток не занят, и число одновременных запросов ограничено только
+LLM_MAX_CONCURRENCY шлюза. Ранжирование (работа CPU) и все остальные маршруты
+Flask выполняются в пуле из WSGI_THREADS потоков.
+
+    uvicorn asgi:application --port 5000
+"""
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+
+from app import app, rank_listings, reloader
+from src.metrics import metrics
+from src.model import extract_real_estate_features_async
+
+# Потоки для маршрутов Flask и ранжирования
+WSGI_THREADS = int(os.environ.get("WSGI_THREADS", 16))
+_executor = ThreadPoolExecutor(max_workers=WSGI_THREADS, thread_name_prefix="wsgi")
+
+
+class _PooledWsgiInstance(WsgiToAsgiInstance):
+    # В asgiref все запросы WSGI идут через один общий поток; здесь - через пул
+    run_wsgi_app = sync_to_async(WsgiToAsgiInstance.__dict__["run_wsgi_app"].func,
+                                 thread_sensitive=False, executor=_executor)
+
+
+class PooledWsgiToAsgi(WsgiToAsgi):
+    """WsgiToAsgi, обрабатывающий запросы в пуле потоков, а не по одному"""
+
+    async def __call__(self, scope, receive, send):
+        await _PooledWsgiInstance(self.wsgi_application, self.duplicate_header_limit)(scope, receive, send)
+
+
+_flask = PooledWsgiToAsgi(app)
+
+
+async def _read_body(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+
+async def _send_json(send, payload, status):
+    body = app.json.dumps(payload).encode("utf-8")
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"application/json"),
+                            (b"content-length", str(len(body)).encode("ascii")),
+                            (b"access-control-allow-origin", b"*")]})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def recommend_async(receive):
+    """То же, что /recommend/async в app.py: (ответ, код)"""
+    # Снимок каталога берётся один раз: перезагрузка не затронет этот запрос
+    snapshot = reloader.current
+    if snapshot.df.empty:
+        return [], 500
+    try:
+        data = json.loads(await _read_body(receive))
+    except ValueError:
+        return [], 400
+    user_input = data.get('user_input', '') if isinstance(data, dict) else ''
+    if not user_input:
+        return [], 400
+
+    try:
+        real_estate_dict = await extract_real_estate_features_async(user_input)
+        if "error" in real_estate_dict:
+            print(f"Ошибка при извлечении данных: {real_estate_dict['error']}")
+            # Таймаут шлюза - 504, остальные ошибки - 500
+            return [], 504 if "TimeoutError" in real_estate_dict['error'] else 500
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_executor, rank_listings, snapshot, user_input, real_estate_dict), 200
+    except Exception as e:
+        print(f"Ошибка при выполнении запроса: {e}")
+        return {"error": str(e)}, 500
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] == "http" and scope["method"] == "POST" and scope["path"] == "/recommend/async":
+        start = time.perf_counter()
+        payload, status = await recommend_async(receive)
+        with metrics.timed("response_json"):
+            await _send_json(send, payload, status)
+        metrics.observe("realtor_request_seconds", time.perf_counter() - start,
+                        "Длительность HTTP-запросов, секунды", endpoint="/recommend/async", status=str(status))
+        return
+    await _flask(scope, receive, send)
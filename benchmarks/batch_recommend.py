@@ -0,0 +1,95 @@
+"""
+Пакетный поиск против последовательных вызовов: N запросов с готовыми признаками
+по каталогу, увеличенному копированием до --rows строк. Сравнивается полный
+подсчёт по одному запросу (score_listings), поиск с индексом (search_top_k, как в
+/recommend) и recommend_batch. Проверяется, что топ-k пакета совпадает с полным подсчётом.
+
+    python benchmarks/batch_recommend.py [--queries 100] [--rows 20000] [--k 10]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+from src.description_index import DescriptionIndex
+from src.fast_extractor import FastFeatureExtractor
+from src.model import recommend_batch, data_path
+from src.scoring import score_listings, top_k_batch
+from src.structured_index import StructuredIndex, search_top_k
+
+PROMPT_TEMPLATES = [
+    "{rooms}-комнатная квартира, {district} район",
+    "{rooms}-комнатная квартира на улице {street}, до {price} тенге",
+    "квартира в {district} районе с мебелью, {area} м2",
+    "уютная {rooms}-комнатная квартира рядом с парком, {district} район",
+]
+
+
+def make_queries(df, count, seed=0):
+    """Запросы из районов и улиц каталога; признаки извлекаются локально, без LLM"""
+    rng = np.random.default_rng(seed)
+    extractor = FastFeatureExtractor(df)
+    districts = [name.split()[0] for name in extractor.districts.values()]
+    streets = list(extractor.streets.values())
+    queries = []
+    for i in range(count):
+        prompt = PROMPT_TEMPLATES[i % len(PROMPT_TEMPLATES)].format(
+            rooms=rng.integers(1, 5), district=rng.choice(districts), street=rng.choice(streets),
+            price=int(rng.integers(10, 60)) * 10000, area=int(rng.integers(30, 120)))
+        queries.append({"user_input": prompt, "features": extractor.extract(prompt)[0]})
+    return queries
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    base = pd.read_csv(data_path, index_col=0)
+    df = pd.concat([base] * max(1, -(-args.rows // len(base))), ignore_index=True).iloc[:args.rows]
+    queries = make_queries(base, args.queries)
+    description_index = DescriptionIndex.build(df["description"])
+    structured_index = StructuredIndex(df)
+
+    def sequential_full():
+        scores = np.array([score_listings(df, q["features"], q["user_input"], description_index) for q in queries])
+        return top_k_batch(scores, args.k)
+
+    def sequential_indexed():
+        return [search_top_k(df, q["features"], q["user_input"], k=args.k, structured_index=structured_index,
+                             description_index=description_index) for q in queries]
+
+    full_s, (full_positions, full_scores) = timed(sequential_full)
+    indexed_s, _ = timed(sequential_indexed)
+    batch_s, batch = timed(lambda: recommend_batch(df, queries, k=args.k, description_index=description_index))
+
+    batch_scores = np.array([scores for _, scores, _ in batch])
+    report = {
+        "rows": len(df),
+        "queries": len(queries),
+        "k": args.k,
+        "sequential_score_listings_s": round(full_s, 3),
+        "sequential_search_top_k_s": round(indexed_s, 3),
+        "recommend_batch_s": round(batch_s, 3),
+        "batch_queries_per_sec": round(len(queries) / batch_s, 1),
+        "speedup_vs_score_listings": round(full_s / batch_s, 2),
+        "speedup_vs_search_top_k": round(indexed_s / batch_s, 2),
+        # Пакет должен давать тот же топ-k, что и полный подсчёт по каждому запросу
+        "same_top_k_as_full_scoring": bool(np.array_equal(full_positions, np.array([p for p, _, _ in batch]))
+                                           and np.allclose(full_scores, batch_scores)),
+    }
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,118 @@
+"""
+Локальное извлечение признаков против LLM на фиксированном наборе запросов:
+доля запросов, обработанных без LLM, сэкономленное время и совпадение признаков
+с ответом LLM (по комнатам, району, улице, цене, площади и этажу).
+
+    python benchmarks/fast_extract.py            # DeepSeek (нужен DEEPSEEK_API_KEY)
+    python benchmarks/fast_extract.py --mock     # локальный mock-сервер LLM
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+PROMPTS = [
+    "2-комнатную квартиру в Алматы, Алмалинский район, по улице Айтеки би",
+    "Ищу однокомнатную квартиру в Бостандыкском районе до 250 000 тенге",
+    "3 комнатная на Гагарина, 80 м2, 5 этаж, с мебелью",
+    "студия в мкр Шугыла до 150 тыс",
+    "двушка в Медеуском районе с парковкой",
+    "1-комнатная квартира в Ауэзовском районе",
+    "квартира на Розыбакиева, 2 комнаты, до 300000 тг",
+    "трехкомнатная квартира в Наурызбайском районе, 90 кв.м",
+    "однокомнатная квартира мкр Аккент без мебели",
+    "4-комнатная на Аль-Фараби, охрана и паркинг",
+    "двухкомнатная квартира в Алатауском районе до 200 000",
+    "квартира в Жетысуском районе на 3 этаже",
+    "Хочу уютную квартиру рядом с парком и школой для семьи с детьми",
+    "Нужна светлая квартира с хорошим ремонтом недалеко от метро",
+    "квартира с видом на горы, тихий двор, рядом с Esentai Mall",
+    "2 комнаты, можно с животными, желательно новостройка после 2015 года",
+    "ищу жильё для студента недорого, чтобы рядом был университет",
+    "Бостандыкский район, 2 комнаты, рядом с КБТУ или Сатпаева, не первый этаж",
+    "Квартира в ЖК Esentai City, 3 комнаты, с паркингом",
+    "однушка на Абая, евроремонт, кондиционер, посудомойка",
+]
+
+# Признаки, по которым сравниваются ответы, и их нормализация
+_DIGITS = lambda value: re.sub(r"\D", "", str(value))
+
+
+def _normalize(key, value):
+    from src.structured_index import parse_district, normalize_street
+    if value in (None, "", "No Information"):
+        return None
+    if key == "city_region":
+        return parse_district(value) or str(value).lower().replace("ё", "е").split()[0]
+    if key == "adress":
+        # Только основа первого слова улицы: 'Айтеки би' и 'Айтеке би' совпадают
+        tokens = normalize_street(value)
+        return tokens[0][:4] if tokens else None
+    return _DIGITS(value) or None
+
+
+COMPARED_KEYS = ["rooms", "city_region", "adress", "price", "area", "floor"]
+
+
+def run(min_confidence):
+    import pandas as pd
+    from src.fast_extractor import FastFeatureExtractor
+    from src.model import get_real_estate_details, extract_json_from_string, data_path
+
+    extractor = FastFeatureExtractor(pd.read_csv(data_path, index_col=0))
+    rows = []
+    for prompt in PROMPTS:
+        start = time.perf_counter()
+        local, confidence = extractor.extract(prompt)
+        local_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        remote = extract_json_from_string(get_real_estate_details(prompt) or "{}")
+        llm_s = time.perf_counter() - start
+
+        agreement = {key: _normalize(key, local.get(key)) == _normalize(key, remote.get(key))
+                     for key in COMPARED_KEYS}
+        rows.append({"prompt": prompt, "confidence": round(confidence, 3),
+                     "fast_path": confidence >= min_confidence,
+                     "local_s": local_s, "llm_s": llm_s, "agreement": agreement})
+
+    accepted = [row for row in rows if row["fast_path"]]
+    pairs = [ok for row in accepted for ok in row["agreement"].values()]
+    return {
+        "prompts": len(rows),
+        "min_confidence": min_confidence,
+        "fast_path_share": round(len(accepted) / len(rows), 3),
+        "local_median_ms": round(statistics.median(row["local_s"] for row in rows) * 1000, 3),
+        "llm_median_ms": round(statistics.median(row["llm_s"] for row in rows) * 1000, 1),
+        # Время, которое не было потрачено на LLM благодаря локальному извлечению
+        "llm_time_saved_s": round(sum(row["llm_s"] - row["local_s"] for row in accepted), 3),
+        "fast_path_field_agreement": round(sum(pairs) / len(pairs), 3) if pairs else None,
+        "fast_path_exact_agreement": round(sum(all(row["agreement"].values()) for row in accepted) / len(accepted), 3)
+        if accepted else None,
+        "per_prompt": [{key: row[key] for key in ("prompt", "confidence", "fast_path", "agreement")} for row in rows],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mock", action="store_true", help="использовать локальный mock-сервер LLM")
+    parser.add_argument("--latency", type=float, default=0.8, help="задержка mock LLM, с")
+    parser.add_argument("--min-confidence", type=float, default=0.8)
+    args = parser.parse_args()
+
+    mock = None
+    if args.mock:
+        from src.mock_llm import MockLLMServer
+        mock = MockLLMServer(latency=args.latency).start()
+        os.environ["DEEPSEEK_BASE_URL"] = mock.base_url
+    try:
+        print(json.dumps(run(args.min_confidence), ensure_ascii=False, indent=2))
+    finally:
+        if mock is not None:
+            mock.stop()
@@ -0,0 +1,106 @@
+"""
+Воспроизводимые данные для бенчмарков: синтетический каталог любого размера
+на основе значений data/apartments.csv и HTML-страницы объявлений в разметке krisha.kz.
+"""
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_PATH = os.path.join(BASE_DIR, "data", "apartments.csv")
+
+STREETS = ["Айтеке би", "Абая", "Аль-Фараби", "Гагарина", "Достык", "Жандосова", "Розыбакиева", "Сатпаева",
+           "Сейфуллина", "Толе би", "Тимирязева", "Желтоксан", "Наурызбай батыра", "Жибек Жолы", "Кунаева",
+           "мкр Шугыла", "мкр Аккент", "мкр Алмагуль", "мкр Нуркент", "мкр Самал-2"]
+DISTRICTS = ["Алмалинский", "Бостандыкский", "Медеуский", "Ауэзовский", "Алатауский", "Наурызбайский",
+             "Жетысуский", "Турксибский"]
+CONDITIONS = ["евроремонт", "свежий ремонт", "среднее", "требует ремонта"]
+BATHROOMS = ["совмещенный", "раздельный", "2 с/у и более"]
+FURNITURE = ["полностью", "частично", "без мебели"]
+
+
+def _sentences():
+    """Предложения из описаний реального каталога - словарь для синтетических описаний"""
+    try:
+        descriptions = pd.read_csv(DATA_PATH, index_col=0)["description"].dropna().astype(str)
+    except (OSError, KeyError):
+        descriptions = []
+    sentences = {s.strip() for text in descriptions for s in re.split(r"[.\n!]+", text) if len(s.strip()) > 20}
+    return sorted(sentences) or ["Уютная квартира с мебелью и техникой", "Рядом школа, парк и остановки"]
+
+
+def synthetic_catalogue(rows, seed=0):
+    """
+    DataFrame с теми же столбцами, что data/apartments.csv: комнаты, районы, улицы,
+    цены и площади распределены случайно, описания собраны из предложений реального каталога
+    """
+    rng = np.random.default_rng(seed)
+    sentences = np.array(_sentences(), dtype=object)
+    rooms = rng.integers(1, 6, rows)
+    area = np.round(rooms * rng.uniform(18, 32, rows) + rng.uniform(10, 20, rows)).astype(int)
+    total_floors = rng.choice([5, 9, 12, 16, 20], rows)
+    floor = rng.integers(1, total_floors + 1)
+    houses = rng.integers(1, 300, rows)
+    streets = np.array(STREETS, dtype=object)[rng.integers(0, len(STREETS), rows)]
+    picks = rng.integers(0, len(sentences), (rows, 3))
+    return pd.DataFrame({
+        "url": [f"https://krisha.kz/a/show/{700000000 + i}" for i in range(rows)],
+        "rooms": rooms.astype(str),
+        "adress": [f"{street} {house}" for street, house in zip(streets, houses)],
+        "price": (np.round(rng.lognormal(12.5, 0.4, rows) / 1000) * 1000).astype(int),
+        "city_region": [f"Алматы, {d} р-н" for d in np.array(DISTRICTS, dtype=object)[rng.integers(0, len(DISTRICTS), rows)]],
+        "description": [". ".join(parts) for parts in sentences[picks]],
+        "floor": [f"{f} из {t}" for f, t in zip(floor, total_floors)],
+        "area": [f"{a} м²" for a in area],
+        "apartment_condition": np.array(CONDITIONS, dtype=object)[rng.integers(0, len(CONDITIONS), rows)],
+        "house_year": rng.integers(1960, 2025, rows),
+        "bathroom": np.array(BATHROOMS, dtype=object)[rng.integers(0, len(BATHROOMS), rows)],
+        "furniture_detailed": np.array(FURNITURE, dtype=object)[rng.integers(0, len(FURNITURE), rows)],
+    })
+
+
+_PAGE = """<!DOCTYPE html><html lang="ru"><head><meta charset="utf-8"><title>{title}</title>
+{scripts}</head><body><header class="header">{nav}</header>
+<div class="layout__container"><div class="offer__container">
+<div class="offer__header"><h1>{title}</h1></div>
+<div class="offer__sidebar"><div class="offer__price"> {price}&nbsp;〒 <span class="offer__price-period">/ месяц</span></div></div>
+<div class="offer__info">
+<div class="offer__location offer__advert-short-info"><span>Алматы, {district} р-н</span><a href="#map">показать на карте</a></div>
+<dl class="offer__advert-short-info"><dt>Этаж</dt><dd>{floor} из {total_floors}</dd></dl>
+<dl class="offer__advert-short-info"><dt>Площадь, м²</dt><dd>{area} м²</dd></dl>
+<dl class="offer__advert-short-info"><dt>Состояние</dt><dd>{condition}</dd></dl>
+<dl class="offer__advert-short-info"><dt>Год постройки</dt><dd>{year}</dd></dl>
+<dl class="offer__advert-short-info"><dt>Санузел</dt><dd>{bathroom}</dd></dl>
+<dl class="offer__advert-short-info"><dt>Мебель</dt><dd>{furniture}</dd></dl>
+</div>
+<div class="offer__description"><h3>О квартире</h3><div class="text">{description}</div></div>
+</div>{similar}</div><footer>{nav}</footer></body></html>"""
+
+
+def listing_pages(count, seed=0):
+    """[(url, html)] страниц объявлений со служебной разметкой, близкой по объёму к настоящим"""
+    rng = np.random.default_rng(seed)
+    sentences = _sentences()
+    nav = "".join(f'<li class="menu__item"><a href="/section/{i}">Раздел {i}</a></li>' for i in range(120))
+    scripts = "".join(f'<script>window.__data{i} = {{"key": "{"x" * 200}"}};</script>' for i in range(40))
+    pages = []
+    for i in range(count):
+        rooms = int(rng.integers(1, 5))
+        total_floors = int(rng.choice([5, 9, 12, 16]))
+        similar = "".join(f'<div class="a-card"><a href="/a/show/{800000000 + j}">{j}-комнатная квартира</a>'
+                          f'<div class="a-card__price">{int(rng.integers(100, 900))} 000 〒</div></div>'
+                          for j in range(30))
+        html = _PAGE.format(
+            title=f"{rooms}-комнатная квартира · {rooms * 25 + 15} м² · {int(rng.integers(1, total_floors + 1))}/{total_floors} этаж, "
+                  f"{STREETS[i % len(STREETS)]} {int(rng.integers(1, 300))}",
+            price=f"{int(rng.integers(100, 900))} 000",
+            district=DISTRICTS[i % len(DISTRICTS)],
+            floor=int(rng.integers(1, total_floors + 1)), total_floors=total_floors,
+            area=rooms * 25 + 15, condition=CONDITIONS[i % len(CONDITIONS)], year=int(rng.integers(1960, 2025)),
+            bathroom=BATHROOMS[i % len(BATHROOMS)], furniture=FURNITURE[i % len(FURNITURE)],
+            description=". ".join(rng.choice(sentences, 4)), nav=nav, scripts=scripts, similar=similar,
+        )
+        pages.append((f"https://krisha.kz/a/show/{900000000 + i}", html.encode("utf-8")))
+    return pages
@@ -0,0 +1,89 @@
+"""
+Компактный протокол извлечения признаков против прежнего подробного на одном наборе
+запросов: токены запроса и ответа, время до первого фрагмента и полное время вызова,
+время разбора ответа и совпадение признаков между протоколами.
+
+    python benchmarks/llm_protocol.py            # DeepSeek (нужен DEEPSEEK_API_KEY)
+    python benchmarks/llm_protocol.py --mock     # локальный mock-сервер LLM
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from fast_extract import COMPARED_KEYS, PROMPTS, _normalize
+
+
+def run_protocol(protocol):
+    import src.model as model
+    from src.llm_protocol import IncrementalJSONParser, LLMUsageTracker, parse_features
+
+    # Протокол читается при каждом вызове, поэтому его можно переключать без перезапуска
+    model.LLM_PROTOCOL = protocol
+    usage = model.service._llm_usage = LLMUsageTracker()
+    rows = []
+    for prompt in PROMPTS:
+        parser = IncrementalJSONParser()
+        start = time.perf_counter()
+        text = model.get_real_estate_details(prompt, parser)
+        call_s = time.perf_counter() - start
+        start = time.perf_counter()
+        features = parse_features(text, parser) if text is not None else {"error": "LLM request failed"}
+        parse_s = time.perf_counter() - start
+        rows.append({"features": features, "call_s": call_s, "parse_s": parse_s, "response_chars": len(text or "")})
+
+    totals = usage.stats().get(protocol, {})
+    first_token = [h["mean"] for name, h in model.metrics.summary().items()
+                   if name == f'realtor_llm_seconds{{phase="first_token",protocol="{protocol}"}}']
+    return rows, {
+        "mean_prompt_tokens": totals.get("mean_prompt_tokens"),
+        "mean_completion_tokens": totals.get("mean_completion_tokens"),
+        "mean_response_chars": round(statistics.mean(row["response_chars"] for row in rows), 1),
+        "first_token_mean_ms": round(first_token[0] * 1000, 1) if first_token else None,
+        "call_median_ms": round(statistics.median(row["call_s"] for row in rows) * 1000, 1),
+        "parse_median_us": round(statistics.median(row["parse_s"] for row in rows) * 1e6, 1),
+        "errors": sum(1 for row in rows if "error" in row["features"]),
+    }
+
+
+def run():
+    compact_rows, compact = run_protocol("compact")
+    verbose_rows, verbose = run_protocol("verbose")
+    pairs = [_normalize(key, a["features"].get(key)) == _normalize(key, b["features"].get(key))
+             for a, b in zip(compact_rows, verbose_rows) for key in COMPARED_KEYS]
+    return {
+        "prompts": len(PROMPTS),
+        "compact": compact,
+        "verbose": verbose,
+        "completion_tokens_ratio": round(compact["mean_completion_tokens"] / verbose["mean_completion_tokens"], 3)
+        if compact["mean_completion_tokens"] and verbose["mean_completion_tokens"] else None,
+        "call_time_ratio": round(compact["call_median_ms"] / verbose["call_median_ms"], 3),
+        # Совпадение признаков, по которым ведётся поиск, между двумя протоколами
+        "field_agreement": round(sum(pairs) / len(pairs), 3),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mock", action="store_true", help="использовать локальный mock-сервер LLM")
+    parser.add_argument("--latency", type=float, default=0.3, help="задержка mock LLM до первого токена, с")
+    parser.add_argument("--token-latency", type=float, default=0.02, help="задержка mock LLM на токен ответа, с")
+    args = parser.parse_args()
+
+    mock = None
+    if args.mock:
+        from src.mock_llm import MockLLMServer
+        mock = MockLLMServer(latency=args.latency, token_latency=args.token_latency).start()
+        os.environ["DEEPSEEK_BASE_URL"] = mock.base_url
+        os.environ.setdefault("DEEPSEEK_API_KEY", "mock")
+    try:
+        print(json.dumps(run(), ensure_ascii=False, indent=2))
+    finally:
+        if mock is not None:
+            mock.stop()
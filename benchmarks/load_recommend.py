@@ -0,0 +1,193 @@
+"""
+Нагрузочный тест /recommend, /recommend/async и /recommend/stream с локальным
+mock-сервером LLM (src/mock_llm.py) вместо DeepSeek. Сервер приложения запускается
+в отдельном процессе; запросы отправляются параллельно, часть из них повторяется,
+чтобы было видно объединение одинаковых вызовов LLM. Время до первой выдачи
+(first_result_*) - до первой строки ответа: у потокового маршрута это
+предварительный этап.
+
+С --threads N сервер приложения обслуживает запросы фиксированным пулом из N потоков
+вместо потока на запрос. Flask выполняет async-view в потоке WSGI-сервера, так что
+/recommend/async тоже занимает поток пула на всё время запроса; выигрыш async-маршрута
+при этом - в числе вызовов LLM (объединение одинаковых запросов в шлюзе), а не в
+числе одновременно обслуживаемых запросов. С --asgi приложение запускается под
+uvicorn (asgi.py): /recommend/async ждёт LLM в событийном цикле, а пул из --threads
+потоков (WSGI_THREADS) обслуживает остальные маршруты и ранжирование.
+
+    python benchmarks/load_recommend.py [--requests 200] [--concurrency 32] [--latency 0.5] [--threads 8] [--asgi]
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+from src.mock_llm import MockLLMServer
+
+_SERVER = """
+import sys
+sys.path.insert(0, {base_dir!r})
+from app import app
+app.run(port={port}, threaded=True)
+"""
+
+# Тот же сервер, но запросы обрабатывает пул из {threads} потоков
+_POOLED_SERVER = """
+import sys
+sys.path.insert(0, {base_dir!r})
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.serving import BaseWSGIServer
+from app import app
+
+class PooledServer(BaseWSGIServer):
+    pool = ThreadPoolExecutor({threads})
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.handle_in_pool, request, client_address)
+
+    def handle_in_pool(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+PooledServer("127.0.0.1", {port}, app).serve_forever()
+"""
+
+# Под uvicorn через asgi.py
+_ASGI_SERVER = """
+import os
+import sys
+sys.path.insert(0, {base_dir!r})
+os.environ["WSGI_THREADS"] = "{threads}"
+import uvicorn
+uvicorn.run("asgi:application", host="127.0.0.1", port={port}, log_level="warning")
+"""
+
+REGIONS = ["Алмалинский", "Бостандыкский", "Медеуский", "Ауэзовский", "Наурызбайский"]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def make_prompts(count, unique, run_id):
+    """count запросов, среди которых unique разных (остальные - повторы)"""
+    return [f"{i % 4 + 1}-комнатная квартира, {REGIONS[i % len(REGIONS)]} район, запрос {run_id}-{i % unique}"
+            for i in range(count)]
+
+
+def wait_ready(url, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(url + "/cache/stats", timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.5)
+    raise RuntimeError("Сервер приложения не запустился")
+
+
+def run_load(url, endpoint, prompts, concurrency):
+    def one(prompt):
+        start = time.perf_counter()
+        first = None
+        with requests.post(url + endpoint, json={"user_input": prompt}, timeout=120, stream=True) as response:
+            for line in response.iter_lines():
+                if line and first is None:
+                    first = time.perf_counter() - start
+        total = time.perf_counter() - start
+        return total, response.status_code, total if first is None else first
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, prompts))
+    elapsed = time.perf_counter() - start
+    latencies = sorted(latency for latency, _, _ in results)
+    first_results = sorted(first for _, _, first in results)
+    percentile = lambda values, q: values[min(len(values) - 1, int(q * len(values)))]
+    return {
+        "requests": len(results),
+        "errors": sum(1 for _, status, _ in results if status != 200),
+        "throughput_rps": round(len(results) / elapsed, 2),
+        "p50_s": round(statistics.median(latencies), 4),
+        "p95_s": round(percentile(latencies, 0.95), 4),
+        "p99_s": round(percentile(latencies, 0.99), 4),
+        "first_result_p50_s": round(statistics.median(first_results), 4),
+        "first_result_p95_s": round(percentile(first_results, 0.95), 4),
+    }
+
+
+def stage_means(metrics_text):
+    """Среднее время этапов (мс) из гистограмм realtor_stage_seconds в выводе /metrics"""
+    sums = dict(re.findall(r'realtor_stage_seconds_sum\{stage="(\w+)"\} ([\d.e+-]+)', metrics_text))
+    counts = dict(re.findall(r'realtor_stage_seconds_count\{stage="(\w+)"\} (\d+)', metrics_text))
+    return {stage: round(float(sums[stage]) / int(counts[stage]) * 1000, 3)
+            for stage in sums if int(counts.get(stage, 0))}
+
+
+def measure(requests_count=200, unique=50, concurrency=32, latency=0.5, llm_concurrency=16,
+            endpoints=("/recommend", "/recommend/async", "/recommend/stream"), threads=None, asgi=False):
+    """
+    Запускает mock LLM и сервер приложения, нагружает маршруты endpoints и возвращает отчёт.
+    threads - размер пула потоков сервера (None - поток на запрос, под uvicorn - 16);
+    asgi - запустить приложение под uvicorn
+    """
+    mock = MockLLMServer(latency=latency).start()
+    port = free_port()
+    # Локальное извлечение признаков выключено: измеряется путь через LLM
+    env = dict(os.environ, DEEPSEEK_BASE_URL=mock.base_url, DEEPSEEK_API_KEY="mock",
+               LLM_MAX_CONCURRENCY=str(llm_concurrency), SEARCH_LOG="0", FAST_EXTRACT="0",
+               CATALOGUE_RELOAD_INTERVAL="0")
+    env.pop("LLM_CACHE_DB", None)
+    if asgi:
+        script = _ASGI_SERVER.format(base_dir=BASE_DIR, port=port, threads=threads or 16)
+    else:
+        script = (_POOLED_SERVER if threads else _SERVER).format(base_dir=BASE_DIR, port=port, threads=threads)
+    server = subprocess.Popen([sys.executable, "-c", script],
+                              cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    report = {}
+    try:
+        wait_ready(url)
+        # Разные run_id, чтобы второй прогон не попадал в кэш признаков первого
+        for run_id, endpoint in enumerate(endpoints):
+            before = mock.requests
+            result = run_load(url, endpoint, make_prompts(requests_count, unique, run_id), concurrency)
+            result["llm_calls"] = mock.requests - before
+            report[endpoint] = result
+        report["gateway"] = requests.get(url + "/llm/stats", timeout=5).json()
+        report["stage_mean_ms"] = stage_means(requests.get(url + "/metrics", timeout=5).text)
+    finally:
+        server.terminate()
+        server.wait()
+        mock.stop()
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--unique", type=int, default=50, help="число разных запросов")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.5, help="задержка mock LLM, с")
+    parser.add_argument("--llm-concurrency", type=int, default=16, help="LLM_MAX_CONCURRENCY сервера")
+    parser.add_argument("--endpoints", default="/recommend,/recommend/async,/recommend/stream")
+    parser.add_argument("--threads", type=int, default=None, help="фиксированный пул потоков сервера")
+    parser.add_argument("--asgi", action="store_true", help="запустить приложение под uvicorn (asgi.py)")
+    args = parser.parse_args()
+    print(json.dumps(measure(args.requests, args.unique, args.concurrency, args.latency, args.llm_concurrency,
+                             tuple(args.endpoints.split(",")), args.threads, args.asgi), indent=2))
@@ -0,0 +1,94 @@
+"""
+Память нескольких процессов-обработчиков с общим каталогом (как в serve.py):
+родитель загружает синтетический каталог и индексы один раз, затем порождает
+обработчики через fork; каждый выполняет поисковые запросы и сообщает свою
+память. Сравнивается с оценкой для независимой загрузки каталога в каждом процессе.
+
+    python benchmarks/shared_catalogue.py --rows 200000 --workers 4
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from fixtures import synthetic_catalogue
+from suite import QUERIES
+from src.catalogue import compact_text_columns
+from src.catalogue_reloader import CatalogueSnapshot
+from src.description_index import DescriptionIndex
+from src.metrics import process_memory
+from src.structured_index import StructuredIndex, search_top_k
+
+
+def _mb(value):
+    return round(value / 1024 / 1024, 1)
+
+
+def worker(snapshot, rounds, write_fd):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for prompt, features in QUERIES:
+            search_top_k(snapshot.df, features, prompt, k=10, structured_index=snapshot.structured_index,
+                         description_index=snapshot.description_index)
+    report = dict(process_memory(), seconds=time.perf_counter() - start)
+    os.write(write_fd, (json.dumps(report) + "\n").encode())
+
+
+def measure(rows, workers, rounds, compact=True):
+    baseline = process_memory().get("rss", 0)
+    df = synthetic_catalogue(rows)
+    if compact:
+        # Как при загрузке из хранилища каталога (Catalogue.to_dataframe)
+        df = compact_text_columns(df)
+    snapshot = CatalogueSnapshot(df, DescriptionIndex.build(df["description"]), StructuredIndex(df), "bench")
+    gc.collect()
+    gc.freeze()
+    loaded = process_memory()
+
+    read_fd, write_fd = os.pipe()
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                worker(snapshot, rounds, write_fd)
+            finally:
+                os._exit(0)
+        children.append(pid)
+    for pid in children:
+        os.waitpid(pid, 0)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as f:
+        reports = [json.loads(line) for line in f]
+
+    catalogue_mb = _mb(loaded["rss"] - baseline)
+    return {
+        "rows": rows,
+        "workers": workers,
+        "compact_text_columns": compact,
+        "parent_rss_mb": _mb(loaded["rss"]),
+        "catalogue_mb": catalogue_mb,
+        "worker_private_mb": [_mb(r["private"]) for r in reports],
+        "worker_pss_mb": [_mb(r["pss"]) for r in reports],
+        # Фактический расход: сумма pss родителя и обработчиков
+        "total_pss_mb": _mb(process_memory()["pss"] + sum(r["pss"] for r in reports)),
+        # Если бы каждый обработчик загружал каталог сам
+        "independent_estimate_mb": round(_mb(loaded["rss"]) * (workers + 1), 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=3, help="повторов набора запросов в каждом обработчике")
+    parser.add_argument("--no-compact", action="store_true", help="строковые столбцы без перевода в category")
+    args = parser.parse_args()
+    print(json.dumps(measure(args.rows, args.workers, args.rounds, compact=not args.no_compact),
+                     ensure_ascii=False, indent=2))
@@ -0,0 +1,44 @@
+"""
+Время импорта src.model и RSS процесса: ленивый импорт против полной инициализации
+(warm_up - то, что раньше происходило при каждом импорте).
+
+    python benchmarks/startup.py [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_PROBE = """
+import json, resource, sys, time
+sys.path.insert(0, {base_dir!r})
+start = time.perf_counter()
+import src.model
+imported = time.perf_counter() - start
+if {warm_up}:
+    src.model.service.warm_up()
+total = time.perf_counter() - start
+print(json.dumps({{"import_s": imported, "ready_s": total,
+                  "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}}))
+"""
+
+
+def measure(warm_up, runs):
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", _PROBE.format(base_dir=BASE_DIR, warm_up=warm_up)],
+                                capture_output=True, text=True, check=True, cwd=BASE_DIR).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    return {key: round(statistics.median(s[key] for s in samples), 4) for key in samples[0]}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps({"lazy_import": measure(False, args.runs),
+                      "eager_warm_up": measure(True, args.runs)}, indent=2))
@@ -0,0 +1,246 @@
+"""
+Набор бенчмарков поиска и сбора данных с результатом в JSON для сравнения прогонов:
+
+- recommend: задержки (p50/p95/p99) и пропускная способность /recommend при разной
+  параллельности, LLM заменён локальным mock-сервером;
+- scoring: построение индексов и время поиска на синтетическом каталоге от 5 тыс.
+  до 1 млн объявлений;
+- dense: построение индекса векторов описаний, время приближённого поиска (IVF)
+  против полного перебора и полнота top-10;
+- parsing: страниц в секунду для каждого парсера на локальных HTML-фикстурах.
+
+Каждый раздел (и каждый размер каталога) выполняется в отдельном процессе, чтобы
+пиковая память (max_rss_mb) относилась только к нему.
+
+    python benchmarks/suite.py --output benchmarks/results/run.json
+    python benchmarks/suite.py --sizes 5000,50000 --sections scoring,parsing
+    python benchmarks/suite.py --compare old.json new.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BASE_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+DEFAULT_SIZES = "5000,50000,200000,1000000"
+
+QUERIES = [
+    ("2-комнатная квартира в Алмалинском районе на Айтеке би",
+     {"rooms": "2", "city_region": "Алмалинский р-н", "adress": "Айтеке би"}),
+    ("однокомнатная квартира до 250000 тенге, Бостандыкский район",
+     {"rooms": "1", "city_region": "Бостандыкский р-н", "price": "250000"}),
+    ("просторная квартира с мебелью рядом с парком", {"furniture_detailed": "полностью"}),
+    ("3 комнатная на Гагарина, евроремонт, 80 м2",
+     {"rooms": "3", "adress": "Гагарина", "apartment_condition": "евроремонт", "area": "80"}),
+    ("квартира в Медеуском районе, тихий двор, высокие потолки", {"city_region": "Медеуский р-н"}),
+]
+
+
+def _max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _timed(func, repeat=1):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples), result
+
+
+def section_scoring(rows, repeat):
+    from fixtures import synthetic_catalogue
+    from src.description_index import DescriptionIndex
+    from src.scoring import score_listings
+    from src.structured_index import StructuredIndex, search_top_k
+
+    generate_s, df = _timed(lambda: synthetic_catalogue(rows))
+    description_s, description_index = _timed(lambda: DescriptionIndex.build(df["description"]))
+    structured_s, structured_index = _timed(lambda: StructuredIndex(df))
+
+    search = [_timed(lambda: search_top_k(df, features, prompt, k=10, structured_index=structured_index,
+                                          description_index=description_index), repeat)[0]
+              for prompt, features in QUERIES]
+    full = [_timed(lambda: score_listings(df, features, prompt, description_index), repeat)[0]
+            for prompt, features in QUERIES]
+    return {
+        "rows": rows,
+        "generate_s": round(generate_s, 3),
+        "description_index_build_s": round(description_s, 3),
+        "structured_index_build_s": round(structured_s, 3),
+        "search_top_k_median_ms": round(statistics.median(search) * 1000, 2),
+        "search_top_k_max_ms": round(max(search) * 1000, 2),
+        "score_listings_median_ms": round(statistics.median(full) * 1000, 2),
+        "score_listings_max_ms": round(max(full) * 1000, 2),
+        "max_rss_mb": round(_max_rss_mb(), 1),
+    }
+
+
+def section_dense(rows, repeat):
+    import tempfile
+
+    from fixtures import synthetic_catalogue
+    from src.embedding_index import EmbeddingIndex, search_dense
+
+    df = synthetic_catalogue(rows)
+    with tempfile.TemporaryDirectory() as directory:
+        build_s, index = _timed(lambda: EmbeddingIndex.build(list(df["description"]),
+                                                             os.path.join(directory, "embeddings")))
+        ann, exact, recall = [], [], []
+        for prompt, features in QUERIES:
+            ann.append(_timed(lambda: search_dense(df, features, prompt, index, k=10), repeat)[0])
+            exact.append(_timed(lambda: index.search(prompt, exact=True), repeat)[0])
+            # Полнота с учётом равных оценок: доля найденных не хуже 10-й точной
+            _, approximate_scores = index.search(prompt)
+            _, exact_scores = index.search(prompt, exact=True)
+            top = min(10, len(exact_scores))
+            recall.append(float((approximate_scores[:top] >= exact_scores[top - 1] - 1e-6).mean()) if top else 1.0)
+        return {
+            "rows": rows,
+            "n_lists": index.meta["n_lists"],
+            "build_s": round(build_s, 3),
+            "vectors_mb": round(index.vectors.nbytes / 1024 / 1024, 1),
+            "search_dense_median_ms": round(statistics.median(ann) * 1000, 2),
+            "exact_search_median_ms": round(statistics.median(exact) * 1000, 2),
+            "recall_at_10": round(statistics.mean(recall), 3),
+            "max_rss_mb": round(_max_rss_mb(), 1),
+        }
+
+
+def section_parsing(pages, repeat, workers):
+    from fixtures import listing_pages
+    from src.listing_parser import benchmark_backends
+
+    fixtures = listing_pages(pages)
+    return {
+        "pages": pages,
+        "page_kb": round(statistics.mean(len(html) for _, html in fixtures) / 1024, 1),
+        "backends": benchmark_backends(fixtures, repeat=repeat, workers=workers),
+        "max_rss_mb": round(_max_rss_mb(), 1),
+    }
+
+
+def section_recommend(requests_count, concurrency_levels, latency):
+    from load_recommend import measure
+
+    runs = {}
+    for concurrency in concurrency_levels:
+        report = measure(requests_count=requests_count, unique=max(1, requests_count // 4),
+                         concurrency=concurrency, latency=latency, endpoints=("/recommend",))
+        runs[str(concurrency)] = dict(report["/recommend"], stage_mean_ms=report["stage_mean_ms"])
+    return {"requests": requests_count, "llm_latency_s": latency, "by_concurrency": runs}
+
+
+def _run_section(args_list):
+    """Раздел в отдельном процессе; возвращает его JSON"""
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child"] + args_list,
+                            capture_output=True, text=True, cwd=BASE_DIR)
+    if output.returncode != 0:
+        return {"error": output.stderr.strip().splitlines()[-1] if output.stderr.strip() else "failed"}
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=BASE_DIR).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def _flatten(value, prefix=""):
+    if isinstance(value, dict):
+        items = {}
+        for key, item in value.items():
+            items.update(_flatten(item, f"{prefix}.{key}" if prefix else str(key)))
+        return items
+    if isinstance(value, list):
+        items = {}
+        for i, item in enumerate(value):
+            key = item.get("rows", i) if isinstance(item, dict) else i
+            items.update(_flatten(item, f"{prefix}[{key}]"))
+        return items
+    return {prefix: value} if isinstance(value, (int, float)) and not isinstance(value, bool) else {}
+
+
+def compare(old_path, new_path):
+    """Отношение new/old для всех числовых показателей, которые есть в обоих прогонах"""
+    with open(old_path, encoding="utf-8") as f:
+        old = _flatten(json.load(f))
+    with open(new_path, encoding="utf-8") as f:
+        new = _flatten(json.load(f))
+    return {key: {"old": old[key], "new": new[key], "ratio": round(new[key] / old[key], 3) if old[key] else None}
+            for key in sorted(old.keys() & new.keys()) if not key.startswith("meta.")}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sections", default="recommend,scoring,dense,parsing")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="размеры синтетического каталога через запятую")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--pages", type=int, default=200, help="число HTML-фикстур для разбора")
+    parser.add_argument("--workers", type=int, default=None, help="процессов при разборе")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", default="1,8,32", help="уровни параллельности для /recommend")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="задержка mock LLM, с")
+    parser.add_argument("--output", help="файл для JSON-результата")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="сравнить два сохранённых прогона")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--rows", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        print(json.dumps(compare(*args.compare), ensure_ascii=False, indent=2))
+        sys.exit(0)
+
+    if args.child:
+        if args.sections == "scoring":
+            result = section_scoring(args.rows, args.repeat)
+        elif args.sections == "dense":
+            result = section_dense(args.rows, args.repeat)
+        elif args.sections == "parsing":
+            result = section_parsing(args.pages, args.repeat, args.workers)
+        else:
+            result = section_recommend(args.requests, [int(c) for c in args.concurrency.split(",")], args.llm_latency)
+        print(json.dumps(result))
+        sys.exit(0)
+
+    sections = args.sections.split(",")
+    report = {"meta": {
+        "commit": _git_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }}
+    common = ["--repeat", str(args.repeat)]
+    if "recommend" in sections:
+        report["recommend"] = _run_section(["--sections", "recommend", "--requests", str(args.requests),
+                                            "--concurrency", args.concurrency,
+                                            "--llm-latency", str(args.llm_latency)])
+    if "scoring" in sections:
+        report["scoring"] = [_run_section(["--sections", "scoring", "--rows", size] + common)
+                             for size in args.sizes.split(",")]
+    if "dense" in sections:
+        report["dense"] = [_run_section(["--sections", "dense", "--rows", size] + common)
+                           for size in args.sizes.split(",")]
+    if "parsing" in sections:
+        report["parsing"] = _run_section(["--sections", "parsing", "--pages", str(args.pages)] + common
+                                         + (["--workers", str(args.workers)] if args.workers else []))
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
@@ -0,0 +1,179 @@
+"""
+Запуск API в несколько процессов-обработчиков с общим каталогом (Linux/macOS).
+
+Родительский процесс один раз загружает каталог, индексы описаний, структурный
+индекс и справочник извлекателя признаков (импорт app.py), открывает порт и
+порождает обработчики через fork. Обработчики наследуют уже загруженные данные:
+страницы памяти остаются общими, пока их никто не изменяет, а массивы хранилища
+каталога и индекса векторов открыты через mmap и разделяются через кэш ОС.
+Поэтому обработчик запускается мгновенно, а память почти не растёт с их числом.
+
+Родитель следит за data/apartments.csv (CATALOGUE_RELOAD_INTERVAL) и по SIGHUP
+или POST /catalogue/reload строит новый снимок каталога один раз, после чего
+заменяет обработчики новыми; старые дорабатывают начатые запросы.
+
+    python serve.py --workers 4 --port 5000
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BASE_DIR)
+
+# Обработчик, завершившийся быстрее, считается упавшим при запуске; перезапуск с паузой
+_MIN_WORKER_LIFETIME = 1.0
+
+
+def _worker(app, listener, host, port):
+    """Тело процесса-обработчика: многопоточный WSGI-сервер на унаследованном сокете"""
+    from werkzeug.serving import make_server
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    server = make_server(host, port, app, threaded=True, fd=listener.fileno())
+    # При остановке дождаться уже принятых запросов
+    server.daemon_threads = False
+    server.block_on_close = True
+
+    def stop(signum, frame):
+        # shutdown() ждёт выхода из serve_forever, поэтому вызывается из другого потока
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+class Master:
+    """Родительский процесс: порождает обработчики, перезапускает упавшие и обновляет каталог"""
+
+    def __init__(self, app_module, listener, workers, host, port):
+        self.app_module = app_module
+        self.listener = listener
+        self.size = workers
+        self.host = host
+        self.port = port
+        self.workers = {}
+        self.generation = 0
+        self._reload_requested = False
+        self._stopping = False
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _worker(self.app_module.app, self.listener, self.host, self.port)
+            except BaseException as e:
+                print(f"Обработчик {os.getpid()} завершился с ошибкой: {e}")
+                code = 1
+            finally:
+                os._exit(code)
+        self.workers[pid] = (self.generation, time.monotonic())
+        return pid
+
+    def _freeze(self):
+        """Загруженные объекты - в постоянное поколение GC, чтобы сборщик в обработчиках их не трогал"""
+        gc.collect()
+        gc.freeze()
+
+    def restart_workers(self):
+        """Новое поколение обработчиков с текущим снимком каталога; старые завершаются мягко"""
+        old = [pid for pid, (generation, _) in self.workers.items() if generation == self.generation]
+        self.generation += 1
+        self._freeze()
+        for _ in range(self.size):
+            self.spawn()
+        for pid in old:
+            self._signal(pid, signal.SIGTERM)
+
+    def _signal(self, pid, signum):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def _reap(self):
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            generation, started = self.workers.pop(pid, (None, 0.0))
+            if generation == self.generation and not self._stopping:
+                print(f"Обработчик {pid} завершился (код {os.waitstatus_to_exitcode(status)}), запускаем новый")
+                if time.monotonic() - started < _MIN_WORKER_LIFETIME:
+                    time.sleep(_MIN_WORKER_LIFETIME)
+                self.spawn()
+
+    def _reload(self, force):
+        reloader = self.app_module.reloader
+        # Старый снимок освобождается сборщиком только вне постоянного поколения
+        gc.unfreeze()
+        swapped = reloader.reload() if force else reloader.check()
+        if swapped:
+            self.restart_workers()
+        else:
+            self._freeze()
+
+    def run(self):
+        signal.signal(signal.SIGHUP, lambda signum, frame: setattr(self, "_reload_requested", True))
+        signal.signal(signal.SIGTERM, lambda signum, frame: setattr(self, "_stopping", True))
+        signal.signal(signal.SIGINT, lambda signum, frame: setattr(self, "_stopping", True))
+
+        self._freeze()
+        for _ in range(self.size):
+            self.spawn()
+        print(f"Запущено {self.size} обработчиков на http://{self.host}:{self.port} "
+              f"(pid родителя {os.getpid()})")
+
+        interval = self.app_module.reloader.interval
+        next_check = time.monotonic() + interval
+        while not self._stopping:
+            time.sleep(0.2)
+            self._reap()
+            if self._reload_requested:
+                self._reload_requested = False
+                self._reload(force=True)
+            elif interval > 0 and time.monotonic() >= next_check:
+                self._reload(force=False)
+                next_check = time.monotonic() + interval
+
+        for pid in list(self.workers):
+            self._signal(pid, signal.SIGTERM)
+        deadline = time.monotonic() + 30
+        while self.workers and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for pid in list(self.workers):
+            self._signal(pid, signal.SIGKILL)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_WORKERS", os.cpu_count() or 1)),
+                        help="число процессов-обработчиков (по умолчанию - по одному на ядро)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    args = parser.parse_args()
+
+    if not hasattr(os, "fork"):
+        sys.exit("serve.py требует os.fork (Linux/macOS); на этой системе запускайте app.py")
+
+    listener = socket.create_server((args.host, args.port), backlog=1024)
+    listener.set_inheritable(True)
+    # Обработчики app.py узнают родителя, которому передают перезагрузку каталога
+    os.environ["REALTOR_MASTER_PID"] = str(os.getpid())
+    import app as app_module
+
+    Master(app_module, listener, max(1, args.workers), args.host, args.port).run()
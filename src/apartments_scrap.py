@@ -1,12 +1,21 @@
 from bs4 import BeautifulSoup
 import requests
 import time
-import pandas as pd
 import os
+import sys
 import random
 import logging
+import argparse
 from requests.exceptions import RequestException
 
+# Корень проекта в пути импорта, чтобы модуль работал и как скрипт
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.crawler import Crawler
+from src.crawl_state import CrawlState, listing_id, content_hash, merge_into_dataset
+from src.listing_parser import parse_listing, parse_pipeline
+from src.dataset_writer import StreamingDatasetWriter
+from concurrent.futures import ProcessPoolExecutor
+
 # Настройка логирования
 logging.basicConfig(
     level=logging.INFO,
@@ -23,35 +32,9 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, "data")
 os.makedirs(DATA_DIR, exist_ok=True)
 
-# Функции для извлечения информации
-def get_info_from_header(text):
-    try:
-        info = text.split("·")
-        if len(info) >= 2:
-            rooms = info[0].strip()[0] if info[0].strip() and info[0].strip()[0].isdigit() else "1"
-            address = ""
-            for part in info:
-                if "," in part:
-                    address = part.split(",")[1].strip() if len(part.split(",")) > 1 else ""
-                    break
-            return [rooms, address]
-        else:
-            return ["1", ""]
-    except Exception as e:
-        logger.error(f"Ошибка при обработке заголовка: {e}")
-        return ["", ""]
-
-def get_info_from_price(price):
-    try:
-        price_text = price.strip()
-        price_text = price_text.replace("&nbsp;", "").replace("\xa0", "")
-        # Находим цифры в тексте
-        digits = ''.join(filter(str.isdigit, price_text))
-        return digits if digits else "0"
-    except Exception as e:
-        logger.error(f"Ошибка при обработке цены: {e}")
-        return "0"
+BASE_LINK = "https://krisha.kz/"
 
+# Функции для извлечения информации
 def get_first_int(s):
     try:
         f = 0
@@ -88,116 +71,220 @@ def make_request(url, max_retries=3, delay=1):
     logger.error(f"Не удалось получить данные с {url} после {max_retries} попыток")
     return None
 
-def main():
-    # Логика скрапинга
-    base_link = "https://krisha.kz/"
-    list_of_apartments = []
-    start_time = time.time()
-    
-    # Увеличиваем количество страниц для скрапинга
-    pages_to_scrape = 5  # Увеличьте это значение для большего количества данных
-    
-    logger.info(f"Начинаем собирать данные с {pages_to_scrape} страниц")
-    
-    for p in range(1, pages_to_scrape + 1):
+def list_page_url(base_link, page):
+    """Адрес страницы со списком объявлений"""
+    return f"{base_link}arenda/kvartiry/almaty/?rent-period-switch=%2Farenda%2Fkvartiry&page={page}"
+
+def parse_listing_links(html):
+    """Ссылки на объявления со страницы списка"""
+    soup = BeautifulSoup(html, "html.parser")
+    return [l.get('href') for l in soup.findAll("a", attrs={"class": "a-card__title"}) if l.get('href')]
+
+def scrape_sequential(base_link, pages_to_scrape, writer):
+    """
+    Последовательный обход страниц с паузами между объявлениями.
+    Объявления сразу передаются в writer; обход начинается с его контрольной точки.
+    """
+    start_page, skip_listings = writer.position["page"], writer.position["listing"]
+    for p in range(start_page, pages_to_scrape + 1):
         logger.info(f"Обработка страницы {p}")
-        page_url = f"{base_link}arenda/kvartiry/almaty/?rent-period-switch=%2Farenda%2Fkvartiry&page={p}"
-        
-        page_response = make_request(page_url)
+        page_response = make_request(list_page_url(base_link, p))
         if not page_response:
             continue
         
         try:
-            soup = BeautifulSoup(page_response.text, "html.parser")
-            links = soup.findAll("a", attrs={"class": "a-card__title"})
-            
+            links = parse_listing_links(page_response.text)
             logger.info(f"Найдено {len(links)} объявлений на странице {p}")
             
-            for l in links:
+            for i, href in enumerate(links):
+                # Объявления, обработанные до прерывания, пропускаем
+                if p == start_page and i < skip_listings:
+                    continue
+                apartment = None
                 try:
-                    cell_url = f"{base_link}{l.get('href')}"
+                    cell_url = f"{base_link}{href}"
                     logger.info(f"Обработка объявления: {cell_url}")
                     
                     cell_response = make_request(cell_url)
-                    if not cell_response:
-                        continue
-                    
-                    soup_cell = BeautifulSoup(cell_response.text, "html.parser")
-                    
-                    # Извлечение данных с защитой от ошибок
-                    header = soup_cell.find("h1")
-                    cell_main_info = get_info_from_header(header.text if header else "")
-                    
-                    price_html = soup_cell.find("div", attrs={"class": "offer__price"})
-                    price_info = get_info_from_price(price_html.text if price_html else "")
-                    
-                    city_html = soup_cell.find("div", attrs={"class": "offer__location offer__advert-short-info"})
-                    city_info = city_html.find('span').text.strip() if city_html and city_html.find('span') else ""
-                    
-                    # Дополнительные данные
-                    description_html = soup_cell.find("div", attrs={"class": "offer__description"})
-                    description = description_html.text.strip() if description_html else ""
-                    
-                    # Собираем параметры квартиры из списка характеристик
-                    params = {}
-                    params_list = soup_cell.findAll("dl", attrs={"class": "offer__advert-short-info"})
-                    for param in params_list:
-                        try:
-                            dt = param.find("dt")
-                            dd = param.find("dd")
-                            if dt and dd:
-                                key = dt.text.strip().lower()
-                                value = dd.text.strip()
-                                params[key] = value
-                        except Exception as e:
-                            logger.warning(f"Ошибка при обработке параметра: {e}")
-                    
-                    # Формируем словарь с данными о квартире
-                    apartment = {
-                        "url": cell_url,
-                        "rooms": cell_main_info[0],
-                        "adress": cell_main_info[1],
-                        "price": price_info,
-                        "city_region": city_info,
-                        "description": description
-                    }
-                    
-                    # Добавляем параметры из списка характеристик
-                    apartment.update({
-                        "floor": params.get("этаж", ""),
-                        "area": params.get("площадь, м²", ""),
-                        "apartment_condition": params.get("состояние", ""),
-                        "house_year": params.get("год постройки", ""),
-                        "bathroom": params.get("санузел", ""),
-                        "furniture_detailed": params.get("мебель", "")
-                    })
-                    
-                    list_of_apartments.append(apartment)
-                    
-                    # Задержка между запросами для избежания блокировки
-                    time.sleep(random.uniform(0.5, 2.0))
+                    if cell_response:
+                        apartment = parse_listing(cell_response.text, cell_url)
+                        
+                        # Задержка между запросами для избежания блокировки
+                        time.sleep(random.uniform(0.5, 2.0))
                     
                 except Exception as e:
-                    logger.error(f"Ошибка при обработке объявления {l.get('href') if l else 'неизвестно'}: {e}")
+                    logger.error(f"Ошибка при обработке объявления {href}: {e}")
+                writer.write(apartment, p, i + 1)
+            writer.page_done(p)
         
         except Exception as e:
             logger.error(f"Ошибка при обработке страницы {p}: {e}")
+
+def scrape_concurrent(base_link, pages_to_scrape, writer, concurrency=8, rate=2.0, parse_workers=0):
+    """
+    Параллельный обход: общий пул keep-alive соединений, token bucket на хост
+    вместо пауз и до concurrency одновременных загрузок объявлений.
+    При parse_workers > 0 страницы разбираются в пуле процессов, а загрузчики
+    только складывают сырой HTML в очередь. Объявления каждой страницы
+    передаются в writer, после чего страница отмечается завершённой.
+    Продолжение с контрольной точки, оставленной последовательным обходом
+    посреди страницы, пропускает уже записанные объявления этой страницы.
+    """
+    start_page, skip_listings = writer.position["page"], writer.position["listing"]
+    pool = ProcessPoolExecutor(max_workers=parse_workers) if parse_workers > 0 else None
+    with Crawler(concurrency=concurrency, rate=rate, burst=concurrency) as crawler:
+        page_numbers = {list_page_url(base_link, p): p for p in range(start_page, pages_to_scrape + 1)}
+        links_by_page = {}
+        for page_url, page_response in crawler.fetch_many(page_numbers):
+            if not page_response:
+                continue
+            try:
+                links = parse_listing_links(page_response.text)
+                logger.info(f"Найдено {len(links)} объявлений на странице {page_url}")
+                links_by_page[page_numbers[page_url]] = links
+            except Exception as e:
+                logger.error(f"Ошибка при обработке страницы {page_url}: {e}")
+        
+        try:
+            for p in sorted(links_by_page):
+                links = links_by_page[p][skip_listings:] if p == start_page else links_by_page[p]
+                cell_urls = [f"{base_link}{href}" for href in links]
+                apartments = []
+                if pool is not None:
+                    raw_pages = ((url, response.content) for url, response in crawler.fetch_many(cell_urls) if response)
+                    apartments.extend(parse_pipeline(raw_pages, workers=parse_workers, pool=pool))
+                else:
+                    for cell_url, cell_response in crawler.fetch_many(cell_urls):
+                        if not cell_response:
+                            continue
+                        try:
+                            apartments.append(parse_listing(cell_response.text, cell_url))
+                        except Exception as e:
+                            logger.error(f"Ошибка при обработке объявления {cell_url}: {e}")
+                # Объявления страницы приходят не по порядку, поэтому страница пишется
+                # целиком вместе с контрольной точкой
+                writer.write_page(apartments, p)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+def scrape_incremental(base_link, pages_to_scrape, state, concurrency=8, rate=2.0):
+    """
+    Инкрементальный обход: объявления дедуплицируются по ID, загружаются условными
+    запросами (ETag / Last-Modified) и разбираются только при изменении содержимого.
+    Возвращает новые и изменённые объявления и счётчики.
+    """
+    changed = []
+    stats = {"listings": 0, "not_modified": 0, "same_content": 0, "changed": 0, "failed": 0}
+    with Crawler(concurrency=max(concurrency, 1), rate=rate, burst=max(concurrency, 1)) as crawler:
+        page_urls = [list_page_url(base_link, p) for p in range(1, pages_to_scrape + 1)]
+        cell_urls = {}
+        for page_url, page_response in crawler.fetch_many(page_urls):
+            if not page_response:
+                continue
+            try:
+                for href in parse_listing_links(page_response.text):
+                    cell_url = f"{base_link}{href}"
+                    # Одно объявление может встречаться на нескольких страницах
+                    cell_urls.setdefault(listing_id(cell_url) or cell_url, cell_url)
+            except Exception as e:
+                logger.error(f"Ошибка при обработке страницы {page_url}: {e}")
+        stats["listings"] = len(cell_urls)
+        
+        ids_by_url = {url: item_id for item_id, url in cell_urls.items()}
+        
+        def conditional_fetch(cell_url):
+            return crawler.fetch(cell_url, headers=state.conditional_headers(ids_by_url[cell_url]))
+        
+        for cell_url, cell_response in crawler.fetch_many(cell_urls.values(), conditional_fetch):
+            item_id = ids_by_url[cell_url]
+            if not cell_response:
+                stats["failed"] += 1
+                continue
+            if cell_response.status_code == 304:
+                stats["not_modified"] += 1
+                state.touch(item_id)
+                continue
+            digest = content_hash(cell_response.content)
+            if state.is_unchanged(item_id, digest):
+                stats["same_content"] += 1
+                state.update(item_id, cell_response, digest)
+                continue
+            try:
+                changed.append(parse_listing(cell_response.text, cell_url))
+                state.update(item_id, cell_response, digest)
+                stats["changed"] += 1
+            except Exception as e:
+                stats["failed"] += 1
+                logger.error(f"Ошибка при обработке объявления {cell_url}: {e}")
+    return changed, stats
+
+def main(pages_to_scrape=5, base_link=BASE_LINK, concurrency=0, rate=2.0, incremental=False, parse_workers=0,
+         resume=False):
+    # Логика скрапинга
+    start_time = time.time()
+    
+    logger.info(f"Начинаем собирать данные с {pages_to_scrape} страниц")
+    output_path = os.path.join(DATA_DIR, "apartments.csv")
+    
+    if incremental:
+        state = CrawlState(os.path.join(DATA_DIR, "crawl_state.json"))
+        changed, stats = scrape_incremental(base_link, pages_to_scrape, state, concurrency or 8, rate)
+        logger.info(f"Инкрементальный обход завершен за {time.time() - start_time:.2f} секунд: {stats}")
+        if changed:
+            try:
+                merged = merge_into_dataset(changed, output_path)
+                logger.info(f"Обновлено {len(changed)} объявлений, всего в {output_path}: {len(merged)}")
+            except Exception as e:
+                logger.error(f"Ошибка при сохранении данных: {e}")
+                return
+        # Состояние сохраняется только после успешного слияния с набором данных
+        state.save()
+        return
+    
+    # Пишем во временный файл, рабочий набор данных заменяется только после завершения обхода
+    partial_path = f"{output_path}.partial"
+    writer = StreamingDatasetWriter(partial_path, os.path.join(DATA_DIR, "scrape_checkpoint.json"), resume=resume)
+    if resume and writer.rows_written:
+        logger.info(f"Продолжаем обход со страницы {writer.position['page']}, "
+                    f"объявление {writer.position['listing']} (уже собрано {writer.rows_written})")
+    
+    try:
+        if concurrency > 0:
+            scrape_concurrent(base_link, pages_to_scrape, writer, concurrency, rate, parse_workers)
+        else:
+            scrape_sequential(base_link, pages_to_scrape, writer)
+    except BaseException:
+        # Сохраняем собранное и контрольную точку, чтобы продолжить с --resume
+        writer.close(complete=False)
+        logger.error("Обход прерван, для продолжения запустите с --resume")
+        raise
+    writer.close()
     
     elapsed_time = time.time() - start_time
     logger.info(f"Скрапинг завершен за {elapsed_time:.2f} секунд")
-    logger.info(f"Собрано {len(list_of_apartments)} объявлений")
+    logger.info(f"Собрано {writer.rows_written} объявлений")
     
-    if list_of_apartments:
-        try:
-            # Сохраняем данные в CSV
-            df = pd.DataFrame(list_of_apartments)
-            output_path = os.path.join(DATA_DIR, "apartments.csv")
-            df.to_csv(output_path)
-            logger.info(f"Данные сохранены в {output_path}")
-        except Exception as e:
-            logger.error(f"Ошибка при сохранении данных: {e}")
+    if writer.rows_written:
+        os.replace(partial_path, output_path)
+        logger.info(f"Данные сохранены в {output_path}")
     else:
+        os.remove(partial_path)
         logger.warning("Нет данных для сохранения")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Сбор объявлений об аренде квартир с krisha.kz")
+    parser.add_argument("--pages", type=int, default=5, help="количество страниц со списком объявлений")
+    parser.add_argument("--base-url", default=os.environ.get("KRISHA_BASE_URL", BASE_LINK),
+                        help="адрес сайта (например, локальный сервер с сохранёнными страницами)")
+    parser.add_argument("--concurrency", type=int, default=0,
+                        help="число одновременных загрузок (0 - последовательный режим)")
+    parser.add_argument("--rate", type=float, default=2.0, help="запросов в секунду к одному хосту")
+    parser.add_argument("--incremental", action="store_true",
+                        help="загружать только новые и изменённые объявления и дописывать их в набор данных")
+    parser.add_argument("--parse-workers", type=int, default=0,
+                        help="число процессов для разбора страниц (только с --concurrency)")
+    parser.add_argument("--resume", action="store_true",
+                        help="продолжить прерванный обход с последней контрольной точки")
+    args = parser.parse_args()
+    main(args.pages, args.base_url, args.concurrency, args.rate, args.incremental, args.parse_workers, args.resume)
@@ -0,0 +1,253 @@
+import io
+import json
+import os
+import re
+import shutil
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Корень проекта в пути импорта, чтобы модуль работал и как скрипт
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.description_index import data_checksum, file_checksum
+from src.numeric_ranges import NUMERIC_FEATURES, numeric_column
+from src.structured_index import parse_district
+
+# Версия формата хранилища; увеличивается при изменении структуры
+STORE_FORMAT_VERSION = 2
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CSV_PATH = os.path.join(BASE_DIR, "data", "apartments.csv")
+DEFAULT_STORE_PATH = os.path.join(BASE_DIR, "data", "catalogue")
+
+
+def parse_total_floors(value):
+    """Этажность из строки вида '3 из 9' -> 9; NaN, если не указана"""
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return np.nan
+    numbers = re.findall(r"\d+", str(value))
+    return float(numbers[1]) if len(numbers) > 1 else np.nan
+
+
+def parse_year(value):
+    match = re.search(r"(1[89]\d\d|20\d\d)", str(value))
+    return float(match.group(1)) if match else np.nan
+
+
+def normalize_columns(df):
+    """
+    Типизированные столбцы каталога: числа вместо строк и район как категория.
+    Цена, площадь и этаж разбираются так же, как при поиске (numeric_column), и
+    хранятся в float64 - StructuredIndex берёт их отсюда без повторного разбора строк.
+    Отсутствующие значения - NaN (для района - код -1).
+    """
+    def numeric(column):
+        if column not in df.columns:
+            return np.full(len(df), np.nan)
+        return numeric_column(df[column])
+
+    def parsed(column, parse):
+        if column not in df.columns:
+            return np.full(len(df), np.nan, dtype=np.float32)
+        return np.array([parse(v) if pd.notna(v) else np.nan for v in df[column]], dtype=np.float32)
+
+    districts = pd.Categorical([parse_district(v) if pd.notna(v) else None
+                                for v in (df["city_region"] if "city_region" in df.columns else [None] * len(df))])
+    return {
+        "price": numeric("price"),
+        "rooms": numeric("rooms").astype(np.float32),
+        "area": numeric("area"),
+        "floor": numeric("floor"),
+        "total_floors": parsed("floor", parse_total_floors),
+        "house_year": parsed("house_year", parse_year),
+        "district_code": districts.codes.astype(np.int16),
+    }, list(districts.categories)
+
+
+def _write_text_column(path, values):
+    """Строковый столбец: UTF-8 данные одним файлом и массив смещений; None хранится как -1"""
+    encoded = [None if v is None else v.encode("utf-8") for v in values]
+    lengths = np.array([-1 if b is None else len(b) for b in encoded], dtype=np.int64)
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum(np.maximum(lengths, 0), out=offsets[1:])
+    with open(f"{path}.bytes", "wb") as f:
+        for b in encoded:
+            if b:
+                f.write(b)
+    np.save(f"{path}.offsets.npy", offsets)
+    np.save(f"{path}.missing.npy", lengths < 0)
+
+
+def ingest(csv_path=DEFAULT_CSV_PATH, store_path=DEFAULT_STORE_PATH):
+    """
+    Конвертирует CSV каталога в колоночное хранилище: исходные столбцы (как их
+    читает pd.read_csv) и нормализованные типизированные столбцы в .npy-файлах,
+    открываемых через mmap. Запись атомарна: каталог заменяется целиком.
+    """
+    # Файл читается один раз: контрольная сумма относится ровно к загруженным строкам,
+    # даже если CSV перезаписывают во время загрузки
+    with open(csv_path, "rb") as f:
+        data = f.read()
+    df = pd.read_csv(io.BytesIO(data), index_col=0)
+    tmp_path = f"{store_path}.tmp-{os.getpid()}"
+    os.makedirs(os.path.join(tmp_path, "raw"), exist_ok=True)
+    os.makedirs(os.path.join(tmp_path, "typed"), exist_ok=True)
+
+    raw_columns = []
+    for column in df.columns:
+        series = df[column]
+        file_base = os.path.join(tmp_path, "raw", f"c{len(raw_columns)}")
+        if pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+            np.save(f"{file_base}.npy", series.to_numpy())
+            raw_columns.append({"name": column, "kind": "numeric"})
+        else:
+            _write_text_column(file_base, [None if pd.isna(v) else str(v) for v in series])
+            raw_columns.append({"name": column, "kind": "text"})
+    np.save(os.path.join(tmp_path, "raw", "index.npy"), df.index.to_numpy())
+
+    typed, districts = normalize_columns(df)
+    for name, values in typed.items():
+        np.save(os.path.join(tmp_path, "typed", f"{name}.npy"), values)
+
+    meta = {
+        "format_version": STORE_FORMAT_VERSION,
+        "checksum": data_checksum(data),
+        "rows": len(df),
+        "raw_columns": raw_columns,
+        "typed_columns": list(typed),
+        "districts": districts,
+        "created": time.time(),
+    }
+    with open(os.path.join(tmp_path, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+    # Атомарная замена: старое хранилище убирается только после записи нового
+    old_path = f"{store_path}.old-{os.getpid()}"
+    if os.path.exists(store_path):
+        os.replace(store_path, old_path)
+    os.replace(tmp_path, store_path)
+    if os.path.exists(old_path):
+        shutil.rmtree(old_path, ignore_errors=True)
+    return meta
+
+
+class Catalogue:
+    """
+    Каталог, открытый из колоночного хранилища. Массивы отображаются в память
+    (mmap_mode='r'), поэтому открытие не читает данные, а страницы файлов
+    разделяются между процессами через кэш ОС.
+    """
+
+    def __init__(self, store_path):
+        self.store_path = store_path
+        with open(os.path.join(store_path, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.districts = self.meta["districts"]
+        self._typed = {}
+
+    def __len__(self):
+        return self.meta["rows"]
+
+    @property
+    def checksum(self):
+        return self.meta["checksum"]
+
+    def typed(self, name):
+        """Типизированный столбец (price, rooms, area, floor, total_floors, house_year, district_code)"""
+        if name not in self._typed:
+            self._typed[name] = np.load(os.path.join(self.store_path, "typed", f"{name}.npy"), mmap_mode="r")
+        return self._typed[name]
+
+    def numeric(self):
+        """
+        Цена, площадь и этаж как числа (признак -> массив по строкам), в том же виде,
+        что StructuredIndex.numeric; только признаки, которые есть среди исходных столбцов
+        """
+        columns = {column["name"] for column in self.meta["raw_columns"]}
+        return {feature: self.typed(feature) for feature in NUMERIC_FEATURES if feature in columns}
+
+    def _raw_file(self, i, suffix):
+        return os.path.join(self.store_path, "raw", f"c{i}{suffix}")
+
+    def text_column(self, i):
+        """Строковый столбец из хранилища; отсутствующие значения - NaN, как в pd.read_csv"""
+        offsets = np.load(self._raw_file(i, ".offsets.npy"))
+        missing = np.load(self._raw_file(i, ".missing.npy"))
+        with open(self._raw_file(i, ".bytes"), "rb") as f:
+            blob = f.read()
+        return [np.nan if missing[j] else blob[offsets[j]:offsets[j + 1]].decode("utf-8")
+                for j in range(len(missing))]
+
+    def to_dataframe(self):
+        """
+        DataFrame с теми же столбцами и значениями, что у pd.read_csv(apartments.csv, index_col=0);
+        повторяющиеся строковые столбцы хранятся как category (см. compact_text_columns)
+        """
+        data = {}
+        for i, column in enumerate(self.meta["raw_columns"]):
+            if column["kind"] == "numeric":
+                data[column["name"]] = np.load(self._raw_file(i, ".npy"))
+            else:
+                data[column["name"]] = np.array(self.text_column(i), dtype=object)
+        index = np.load(os.path.join(self.store_path, "raw", "index.npy"), allow_pickle=True)
+        return compact_text_columns(pd.DataFrame(data, index=index))
+
+
+def compact_text_columns(df):
+    """
+    Строковые столбцы с повторами (комнаты, район, улица, состояние и т.п.) переводятся
+    в category: каждое значение хранится один раз, строки ссылаются на него целочисленным
+    кодом. Оценки при этом не меняются, а поиск не обращается к объекту строки каждого
+    объявления - страницы памяти каталога остаются общими для процессов serve.py.
+    """
+    columns = {}
+    for column in df.columns:
+        series = df[column]
+        if (not pd.api.types.is_numeric_dtype(series) and not isinstance(series.dtype, pd.CategoricalDtype)
+                and series.nunique(dropna=False) * 2 <= len(series)):
+            columns[column] = series.astype("category")
+    return df.assign(**columns) if columns else df
+
+
+def open_catalogue(csv_path=DEFAULT_CSV_PATH, store_path=DEFAULT_STORE_PATH):
+    """
+    Открывает колоночное хранилище; если его нет или оно построено по другой
+    версии CSV, сначала выполняет загрузку (ingest)
+    """
+    try:
+        catalogue = Catalogue(store_path)
+        fresh = (catalogue.meta.get("format_version") == STORE_FORMAT_VERSION and
+                 (not os.path.exists(csv_path) or catalogue.checksum == file_checksum(csv_path)))
+        if fresh:
+            return catalogue
+    except (OSError, ValueError, KeyError):
+        pass
+    ingest(csv_path, store_path)
+    return Catalogue(store_path)
+
+
+def load_catalogue(csv_path=DEFAULT_CSV_PATH, store_path=DEFAULT_STORE_PATH):
+    """
+    Каталог как DataFrame и открытое хранилище (его типизированные столбцы передаются
+    в StructuredIndex). При ошибке хранилища DataFrame читается напрямую из CSV, а
+    вместо хранилища возвращается None.
+    """
+    try:
+        catalogue = open_catalogue(csv_path, store_path)
+        return catalogue.to_dataframe(), catalogue
+    except Exception as e:
+        print(f"Не удалось открыть хранилище каталога ({e}), читаем CSV")
+        return pd.read_csv(csv_path, index_col=0), None
+
+
+def load_dataframe(csv_path=DEFAULT_CSV_PATH, store_path=DEFAULT_STORE_PATH):
+    """Каталог как DataFrame: из колоночного хранилища, при ошибке - напрямую из CSV"""
+    return load_catalogue(csv_path, store_path)[0]
+
+
+if __name__ == "__main__":
+    start = time.time()
+    meta = ingest()
+    print(f"Каталог из {meta['rows']} объявлений записан в {DEFAULT_STORE_PATH} за {time.time() - start:.2f} с")
@@ -0,0 +1,170 @@
+import os
+import threading
+import time
+
+from src.catalogue import DEFAULT_STORE_PATH, load_catalogue
+from src.description_index import file_checksum, load_or_build_description_index
+from src.embedding_index import load_or_build_embedding_index
+from src.structured_index import StructuredIndex
+
+
+class CatalogueSnapshot:
+    """
+    Неизменяемый набор данных для обработки запросов: каталог и построенные по нему
+    индексы. Запрос берёт текущий снимок один раз и работает с ним до конца, поэтому
+    замена снимка не влияет на уже начатые запросы.
+    """
+
+    def __init__(self, df, description_index, structured_index, version, generation=0, load_seconds=0.0,
+                 embedding_index=None, catalogue=None):
+        self.df = df
+        self.catalogue = catalogue
+        self.description_index = description_index
+        self.structured_index = structured_index
+        self.embedding_index = embedding_index
+        self.version = version
+        self.generation = generation
+        self.load_seconds = load_seconds
+        self.loaded_at = time.time()
+
+    @classmethod
+    def build(cls, df, csv_path, index_path, version=None, generation=0, embedding_path=None, catalogue=None):
+        """
+        Строит индексы для загруженного каталога (вне обработки запросов).
+        embedding_path - каталог индекса векторов описаний для семантического поиска,
+        catalogue - колоночное хранилище, из которого загружен df (его типизированные
+        столбцы берёт StructuredIndex). version - контрольная сумма CSV, из которой
+        загружен df; по умолчанию берётся из хранилища, а без него - по файлу. Индексы
+        сохраняются под этой версией, а не под суммой файла, который мог измениться.
+        """
+        start = time.perf_counter()
+        if version is None:
+            if catalogue is not None:
+                version = catalogue.checksum
+            else:
+                version = file_checksum(csv_path) if os.path.exists(csv_path) else "empty"
+        checksum = version if version != "empty" else None
+        description_index = (load_or_build_description_index(df, csv_path, index_path, checksum)
+                             if not df.empty else None)
+        structured_index = StructuredIndex(df, catalogue) if not df.empty else None
+        embedding_index = None
+        if embedding_path and not df.empty:
+            embedding_index = load_or_build_embedding_index(df, csv_path, embedding_path, checksum=checksum)
+        return cls(df, description_index, structured_index, version, generation, time.perf_counter() - start,
+                   embedding_index, catalogue)
+
+    def info(self):
+        return {
+            "version": self.version,
+            "generation": self.generation,
+            "rows": len(self.df),
+            "loaded_at": self.loaded_at,
+            "load_seconds": round(self.load_seconds, 3),
+            "embeddings": self.embedding_index.meta if self.embedding_index is not None else None,
+        }
+
+
+class CatalogueReloader:
+    """
+    Следит за файлом каталога и при его изменении строит новый снимок в фоновом
+    потоке, затем атомарно подменяет текущий. Изменение принимается, когда размер и
+    время изменения файла не менялись между двумя проверками (файл дописан).
+    on_swap(snapshot) вызывается после подмены - например, чтобы сбросить кэши.
+    """
+
+    def __init__(self, snapshot, csv_path, index_path, store_path=DEFAULT_STORE_PATH, interval=5.0, on_swap=None,
+                 embedding_path=None):
+        self.current = snapshot
+        self.csv_path = csv_path
+        self.index_path = index_path
+        self.embedding_path = embedding_path
+        self.store_path = store_path
+        self.interval = interval
+        self.on_swap = on_swap
+        self.reloads = 0
+        self.failures = 0
+        self.last_error = None
+        self._seen_stat = self._stat()
+        self._pending_stat = None
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.csv_path)
+            return stat.st_size, stat.st_mtime_ns
+        except OSError:
+            return None
+
+    def check(self):
+        """Одна проверка файла; True, если снимок был заменён"""
+        stat = self._stat()
+        if stat is None or stat == self._seen_stat:
+            self._pending_stat = None
+            return False
+        if stat != self._pending_stat:
+            # Файл ещё может дописываться: ждём следующей проверки
+            self._pending_stat = stat
+            return False
+        self._pending_stat = None
+        self._seen_stat = stat
+        return self.reload()
+
+    def reload(self):
+        """Строит снимок по текущему файлу и подменяет им текущий; False, если версия та же"""
+        with self._reload_lock:
+            start = time.perf_counter()
+            try:
+                checksum = file_checksum(self.csv_path)
+                if checksum == self.current.version:
+                    return False
+                df, catalogue = load_catalogue(self.csv_path, self.store_path)
+                # Версия - контрольная сумма именно тех байтов, из которых построено хранилище:
+                # файл мог измениться между проверкой и загрузкой
+                if catalogue is not None:
+                    version = catalogue.checksum
+                elif file_checksum(self.csv_path) == checksum:
+                    # CSV прочитан напрямую и не менялся во время чтения
+                    version = checksum
+                else:
+                    raise RuntimeError("файл каталога изменился во время загрузки")
+                if version == self.current.version:
+                    return False
+                snapshot = CatalogueSnapshot.build(df, self.csv_path, self.index_path, version,
+                                                   generation=self.current.generation + 1,
+                                                   embedding_path=self.embedding_path, catalogue=catalogue)
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                print(f"Не удалось перезагрузить каталог: {e}")
+                return False
+            snapshot.load_seconds = time.perf_counter() - start
+            # Присваивание атомарно: новые запросы получают новый снимок, начатые доработают со старым
+            self.current = snapshot
+            self.reloads += 1
+            self.last_error = None
+            if self.on_swap is not None:
+                self.on_swap(snapshot)
+            print(f"Каталог перезагружен: {len(snapshot.df)} объявлений за {snapshot.load_seconds:.2f} с "
+                  f"(версия {snapshot.version[:12]})")
+            return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def start(self):
+        if self._thread is None and self.interval > 0:
+            self._thread = threading.Thread(target=self._run, name="catalogue-reloader", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+
+    def stats(self):
+        return dict(self.current.info(), reloads=self.reloads, failures=self.failures,
+                    last_error=self.last_error, watching=self._thread is not None)
@@ -0,0 +1,97 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+import pandas as pd
+
+_LISTING_ID_RE = re.compile(r"/a/show/(\d+)")
+
+
+def listing_id(url):
+    """Стабильный ID объявления из адреса вида /a/show/<id>; None, если его нет"""
+    match = _LISTING_ID_RE.search(str(url))
+    return match.group(1) if match else None
+
+
+def content_hash(content):
+    """SHA-256 тела ответа"""
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    return hashlib.sha256(content).hexdigest()
+
+
+class CrawlState:
+    """
+    Локальное состояние обхода: ID объявления -> ETag, Last-Modified и хэш
+    содержимого при последней загрузке. Хранится в JSON-файле.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                self.entries = {}
+
+    def conditional_headers(self, item_id):
+        """Заголовки условного запроса для ранее загруженного объявления"""
+        entry = self.entries.get(item_id) or {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def is_unchanged(self, item_id, digest):
+        entry = self.entries.get(item_id)
+        return entry is not None and entry.get("content_hash") == digest
+
+    def update(self, item_id, response, digest):
+        with self._lock:
+            self.entries[item_id] = {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "content_hash": digest,
+                "fetched_at": time.time(),
+            }
+
+    def touch(self, item_id):
+        """Отмечает, что объявление проверено и не изменилось"""
+        with self._lock:
+            if item_id in self.entries:
+                self.entries[item_id]["fetched_at"] = time.time()
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with self._lock, open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
+
+
+def merge_into_dataset(apartments, output_path):
+    """
+    Объединяет новые и изменённые объявления с существующим CSV по ID объявления:
+    изменённые строки заменяются, новые добавляются, остальные сохраняются
+    """
+    updates = pd.DataFrame(apartments)
+    if os.path.exists(output_path):
+        existing = pd.read_csv(output_path, index_col=0)
+        merged = pd.concat([existing, updates], ignore_index=True)
+    else:
+        merged = updates
+    if merged.empty:
+        return merged
+    ids = merged["url"].map(listing_id)
+    # Строки без ID не дедуплицируются
+    key = ids.where(ids.notna(), merged.index.astype(str) + "#")
+    merged = merged[~key.duplicated(keep="last")].reset_index(drop=True)
+    merged.to_csv(output_path)
+    return merged
@@ -0,0 +1,183 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.exceptions import HTTPError, RequestException
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+              "(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36")
+
+# Ответы, после которых имеет смысл повторить запрос; остальные ошибки 4xx окончательные
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Потокобезопасный token bucket: rate запросов в секунду, всплеск до capacity"""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Блокирует поток, пока не появится свободный токен"""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_time = (1 - self._tokens) / self.rate
+            time.sleep(wait_time)
+
+
+class HostRateLimiter:
+    """Отдельный token bucket для каждого хоста"""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = TokenBucket(self.rate, self.capacity)
+        bucket.acquire()
+
+
+class HostConcurrencyLimiter:
+    """Не больше limit одновременных запросов к одному хосту"""
+
+    def __init__(self, limit):
+        self.limit = max(limit, 1)
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def slot(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            semaphore = self._semaphores.get(host)
+            if semaphore is None:
+                semaphore = self._semaphores[host] = threading.BoundedSemaphore(self.limit)
+        return semaphore
+
+
+def _retry_after(response, limit):
+    """Пауза из заголовка Retry-After (в секундах), не больше limit; None, если его нет"""
+    value = response.headers.get("Retry-After") if response is not None else None
+    try:
+        return min(max(float(value), 0.0), limit) if value is not None else None
+    except ValueError:
+        return None
+
+
+def make_session(pool_size=10):
+    """HTTP-сессия с пулом keep-alive соединений"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = USER_AGENT
+    return session
+
+
+class Crawler:
+    """
+    Загрузчик страниц с общим пулом соединений, ограничением частоты запросов
+    к каждому хосту, не более concurrency одновременных загрузок всего и не более
+    host_concurrency (по умолчанию concurrency) к одному хосту. Ответы 429 и 5xx и
+    сетевые ошибки повторяются с экспоненциальной задержкой от backoff секунд
+    (или по Retry-After), но не дольше max_backoff.
+    """
+
+    def __init__(self, concurrency=8, rate=2.0, burst=4, timeout=10, max_retries=3, session=None,
+                 host_concurrency=None, backoff=1.0, max_backoff=10.0):
+        self.concurrency = max(concurrency, 1)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.session = session or make_session(self.concurrency)
+        self.limiter = HostRateLimiter(rate, burst)
+        self.host_limiter = HostConcurrencyLimiter(host_concurrency or self.concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="crawler")
+
+    def fetch(self, url, headers=None):
+        """Загружает страницу с повторными попытками; None, если все попытки не удались"""
+        delay = None
+        for attempt in range(self.max_retries):
+            if attempt > 0:
+                # Экспоненциальная задержка с джиттером перед повтором, если сервер не назвал паузу сам
+                if delay is None:
+                    delay = min(self.backoff * 2 ** attempt, self.max_backoff) * random.uniform(0.5, 1.0)
+                time.sleep(delay)
+            delay = None
+            self.limiter.acquire(url)
+            try:
+                with self.host_limiter.slot(url):
+                    response = self.session.get(url, headers=headers, timeout=self.timeout)
+                response.raise_for_status()
+                return response
+            except HTTPError as e:
+                if e.response is not None and e.response.status_code not in RETRY_STATUSES:
+                    logger.error(f"Запрос к {url} отклонён: {e}")
+                    return None
+                delay = _retry_after(e.response, self.max_backoff)
+                logger.warning(f"Попытка {attempt+1} запроса к {url} не удалась: {e}")
+            except RequestException as e:
+                logger.warning(f"Попытка {attempt+1} запроса к {url} не удалась: {e}")
+
+        logger.error(f"Не удалось получить данные с {url} после {self.max_retries} попыток")
+        return None
+
+    def fetch_many(self, urls, fetch=None):
+        """
+        Загружает страницы параллельно, держа в работе не больше concurrency задач.
+        Возвращает пары (url, результат) по мере готовности.
+        """
+        fetch = fetch or self.fetch
+        urls = iter(urls)
+        in_flight = {}
+
+        def submit_next():
+            for url in urls:
+                in_flight[self._executor.submit(fetch, url)] = url
+                return True
+            return False
+
+        for _ in range(self.concurrency):
+            if not submit_next():
+                break
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                url = in_flight.pop(future)
+                submit_next()
+                yield url, future.result()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,101 @@
+import csv
+import json
+import os
+
+# Столбцы набора данных в порядке, в котором их пишет скрапер
+FIELDS = ["url", "rooms", "adress", "price", "city_region", "description", "floor", "area",
+          "apartment_condition", "house_year", "bathroom", "furniture_detailed"]
+
+
+class StreamingDatasetWriter:
+    """
+    Потоковая запись объявлений в CSV пачками по batch_size строк.
+    После каждой пачки сохраняется контрольная точка: позиция обхода (страница и
+    номер объявления на ней), число записанных строк и размер файла. Прерванный
+    обход продолжается с контрольной точки; файл обрезается до её размера, чтобы
+    не было дублей. Формат CSV совместим с pd.read_csv(path, index_col=0).
+    """
+
+    def __init__(self, path, checkpoint_path, batch_size=50, resume=False):
+        self.path = path
+        self.checkpoint_path = checkpoint_path
+        self.batch_size = batch_size
+        self.rows_written = 0
+        self.position = {"page": 1, "listing": 0}
+        self._buffer = []
+        self._pending_position = None
+
+        checkpoint = self.load_checkpoint() if resume else None
+        if checkpoint and os.path.exists(path):
+            self.rows_written = checkpoint["rows"]
+            self.position = {"page": checkpoint["page"], "listing": checkpoint["listing"]}
+            with open(path, "r+b") as f:
+                f.truncate(checkpoint["bytes"])
+            self._file = open(path, "a", newline="", encoding="utf-8")
+        else:
+            self._file = open(path, "w", newline="", encoding="utf-8")
+            csv.writer(self._file).writerow([""] + FIELDS)
+            self._file.flush()
+        self._writer = csv.writer(self._file)
+
+    def load_checkpoint(self):
+        try:
+            with open(self.checkpoint_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write(self, apartment, page, listing):
+        """
+        Добавляет объявление (или None, если объявление пропущено) и отмечает, что
+        обход дошёл до listing-го объявления на странице page
+        """
+        if apartment is not None:
+            self._buffer.append([self.rows_written + len(self._buffer)] + [apartment.get(f, "") for f in FIELDS])
+        self._pending_position = {"page": page, "listing": listing}
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def write_page(self, apartments, page):
+        """
+        Записывает все объявления страницы одной пачкой и отмечает страницу
+        завершённой. Нужен, когда объявления страницы приходят не по порядку:
+        контрольная точка не должна попасть в середину страницы, иначе при
+        продолжении уже записанные объявления страницы запишутся повторно
+        """
+        for apartment in apartments:
+            if apartment is not None:
+                self._buffer.append([self.rows_written + len(self._buffer)] + [apartment.get(f, "") for f in FIELDS])
+        self.page_done(page)
+
+    def page_done(self, page):
+        """Страница обработана полностью: следующая точка продолжения - начало page + 1"""
+        self._pending_position = {"page": page + 1, "listing": 0}
+        self.flush()
+
+    def flush(self):
+        """Дописывает буфер на диск и сохраняет контрольную точку"""
+        if self._buffer:
+            self._writer.writerows(self._buffer)
+            self.rows_written += len(self._buffer)
+            self._buffer = []
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        if self._pending_position is not None:
+            self.position = self._pending_position
+            self._pending_position = None
+        checkpoint = dict(self.position, rows=self.rows_written, bytes=self._file.tell())
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def close(self, complete=True):
+        """
+        Закрывает файл. При complete=True обход считается завершённым и контрольная
+        точка удаляется
+        """
+        self.flush()
+        self._file.close()
+        if complete and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
@@ -0,0 +1,116 @@
+import hashlib
+import os
+import pickle
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+# Версия формата файла индекса; увеличивается при изменении структуры
+INDEX_FORMAT_VERSION = 1
+
+
+def data_checksum(data):
+    """SHA-256 уже прочитанного содержимого файла (то же, что file_checksum)"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_checksum(path, chunk_size=1 << 20):
+    """SHA-256 содержимого файла"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DescriptionIndex:
+    """
+    TF-IDF индекс описаний объявлений: один векторизатор, обученный на всём корпусе,
+    и L2-нормированная разреженная матрица документов (строки в порядке DataFrame)
+    """
+
+    def __init__(self, vectorizer, matrix, checksum=None):
+        self.vectorizer = vectorizer
+        self.matrix = matrix.tocsr()
+        self.checksum = checksum
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    @classmethod
+    def build(cls, descriptions, checksum=None):
+        """Обучает векторизатор на описаниях и строит матрицу документов"""
+        texts = ["" if not isinstance(text, str) else text for text in descriptions]
+        vectorizer = TfidfVectorizer()
+        try:
+            matrix = vectorizer.fit_transform(texts)
+        except ValueError:
+            # В корпусе нет ни одного токена
+            vectorizer = TfidfVectorizer(vocabulary={"": 0})
+            matrix = vectorizer.fit_transform(texts)
+        return cls(vectorizer, matrix, checksum)
+
+    def query(self, text, rows=None):
+        """
+        Косинусная схожесть текста с описаниями одним умножением матрицы на вектор.
+        rows ограничивает расчёт заданными строками (в их порядке).
+        """
+        matrix = self.matrix if rows is None else self.matrix[rows]
+        if not text or not text.strip():
+            return np.zeros(matrix.shape[0])
+        query_vector = self.vectorizer.transform([text])
+        return np.asarray((matrix @ query_vector.T).todense()).ravel()
+
+    def save(self, path):
+        """Сохраняет индекс на диск (атомарно через временный файл)"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({
+                "format_version": INDEX_FORMAT_VERSION,
+                "checksum": self.checksum,
+                "vectorizer": self.vectorizer,
+                "matrix": self.matrix,
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, checksum=None):
+        """
+        Загружает индекс; возвращает None, если файла нет, он устарел или записан
+        несовместимой версией scikit-learn (тогда индекс строится заново)
+        """
+        try:
+            with open(path, "rb") as f:
+                payload = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError, ValueError, TypeError):
+            return None
+        if not isinstance(payload, dict):
+            return None
+        if payload.get("format_version") != INDEX_FORMAT_VERSION:
+            return None
+        if checksum is not None and payload.get("checksum") != checksum:
+            return None
+        return cls(payload["vectorizer"], payload["matrix"], payload["checksum"])
+
+
+def load_or_build_description_index(df, csv_path, index_path, checksum=None):
+    """
+    Загружает индекс описаний с диска, если он построен по той же версии CSV,
+    иначе строит его заново и сохраняет. checksum - версия CSV, из которой загружен
+    df (по умолчанию считается по файлу, который мог измениться после загрузки)
+    """
+    if checksum is None and os.path.exists(csv_path):
+        checksum = file_checksum(csv_path)
+    index = DescriptionIndex.load(index_path, checksum) if checksum else None
+    if index is not None and len(index) == len(df):
+        return index
+
+    descriptions = df["description"] if "description" in df.columns else [""] * len(df)
+    index = DescriptionIndex.build(descriptions, checksum)
+    if checksum:
+        try:
+            index.save(index_path)
+        except OSError as e:
+            print(f"Не удалось сохранить индекс описаний: {e}")
+    return index
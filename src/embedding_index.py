@@ -0,0 +1,288 @@
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+
+# Корень проекта в пути импорта, чтобы модуль работал и как скрипт
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.description_index import file_checksum
+from src.scoring import feature_scores, numeric_filter_rows, structured_scores
+
+# Версия формата индекса; увеличивается при изменении структуры
+EMBEDDING_FORMAT_VERSION = 1
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_INDEX_PATH = os.path.join(BASE_DIR, "data", "index", "embeddings")
+
+# Каталоги меньше этого размера ищутся полным перебором, без кластеров
+_BRUTE_FORCE_ROWS = 2000
+
+
+class HashingEncoder:
+    """
+    Векторы текстов без модели: символьные n-граммы внутри слов, хешированные в
+    dim измерений со случайным знаком (аналог случайной проекции), L2-нормированные.
+    Устойчивы к падежным окончаниям и опечаткам, в отличие от TF-IDF по словам.
+    """
+
+    name = "hashing"
+
+    def __init__(self, dim=256, ngram_range=(3, 5)):
+        self.dim = dim
+        self._vectorizer = HashingVectorizer(analyzer="char_wb", ngram_range=ngram_range, n_features=dim,
+                                             alternate_sign=True, norm="l2", lowercase=True)
+
+    def encode(self, texts):
+        return self._vectorizer.transform(texts).toarray().astype(np.float32)
+
+
+class SentenceTransformerEncoder:
+    """Небольшая локальная модель sentence-transformers (если пакет установлен)"""
+
+    name = "sentence-transformers"
+
+    def __init__(self, model_name):
+        from sentence_transformers import SentenceTransformer
+        self.model_name = model_name
+        self._model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self._model.get_sentence_embedding_dimension()
+
+    def encode(self, texts):
+        return self._model.encode(list(texts), batch_size=64, normalize_embeddings=True,
+                                  convert_to_numpy=True).astype(np.float32)
+
+
+def make_encoder(model_name=None, dim=256):
+    """Модель sentence-transformers, если она задана и доступна, иначе хешированные n-граммы"""
+    if model_name:
+        try:
+            return SentenceTransformerEncoder(model_name)
+        except ImportError:
+            print("Пакет sentence-transformers не установлен, используются хешированные n-граммы")
+    return HashingEncoder(dim)
+
+
+def _normalize_rows(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+def _decode_rows(vectors, scales, rows):
+    """Нормированные float32-векторы строк rows из хранимых (int8 со шкалой или float16)"""
+    return _normalize_rows(vectors[rows].astype(np.float32) * scales[rows, None])
+
+
+def _spherical_kmeans(sample, n_lists, iterations=10, seed=0):
+    """Центроиды кластеров по косинусной близости (k-means на единичной сфере)"""
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        empty = np.bincount(assignment, minlength=n_lists) == 0
+        # Пустой кластер получает случайную точку выборки
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+        centroids = _normalize_rows(sums)
+    return centroids
+
+
+class EmbeddingIndex:
+    """
+    Векторы описаний объявлений в файле .npy (float16 или int8 с масштабом на строку),
+    открываемом через mmap, и IVF-индекс: центроиды кластеров и номера строк,
+    упорядоченные по кластерам. Поиск просматривает только nprobe ближайших
+    кластеров, поэтому время запроса растёт медленнее размера каталога.
+    """
+
+    def __init__(self, path, encoder=None):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        self.scales = np.load(os.path.join(path, "scales.npy")) if self.meta["dtype"] == "int8" else None
+        self.centroids = np.load(os.path.join(path, "centroids.npy"))
+        self.list_offsets = np.load(os.path.join(path, "list_offsets.npy"))
+        self.list_rows = np.load(os.path.join(path, "list_rows.npy"), mmap_mode="r")
+        self.encoder = encoder or make_encoder(self.meta.get("model"), self.meta["dim"])
+
+    def __len__(self):
+        return self.meta["rows"]
+
+    @property
+    def checksum(self):
+        return self.meta["checksum"]
+
+    @classmethod
+    def build(cls, texts, path, checksum=None, encoder=None, dtype="float16", n_lists=None,
+              chunk_size=50000, seed=0):
+        """Кодирует тексты частями прямо в файл на диске и строит IVF-индекс; запись атомарна"""
+        encoder = encoder or make_encoder()
+        texts = ["" if not isinstance(text, str) else text for text in texts]
+        rows = len(texts)
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        os.makedirs(tmp_path, exist_ok=True)
+
+        vectors = np.lib.format.open_memmap(os.path.join(tmp_path, "vectors.npy"), mode="w+",
+                                            dtype=np.int8 if dtype == "int8" else np.float16,
+                                            shape=(rows, encoder.dim))
+        scales = np.ones(rows, dtype=np.float32)
+        for start in range(0, rows, chunk_size):
+            chunk = encoder.encode(texts[start:start + chunk_size])
+            if dtype == "int8":
+                # Симметричное квантование строки: максимум по модулю -> 127
+                peak = np.abs(chunk).max(axis=1)
+                scale = np.where(peak > 0, peak / 127.0, 1.0).astype(np.float32)
+                vectors[start:start + len(chunk)] = np.round(chunk / scale[:, None]).astype(np.int8)
+                scales[start:start + len(chunk)] = scale
+            else:
+                vectors[start:start + len(chunk)] = chunk.astype(np.float16)
+        vectors.flush()
+
+        # Кластеры обучаются на выборке, затем к ним относятся все строки
+        if n_lists is None:
+            n_lists = 1 if rows < _BRUTE_FORCE_ROWS else int(min(4096, np.sqrt(rows)))
+        n_lists = max(1, min(n_lists, rows))
+        rng = np.random.default_rng(seed)
+        sample_rows = np.sort(rng.choice(rows, min(rows, max(50000, 40 * n_lists)), replace=False)) if rows else []
+        centroids = (_spherical_kmeans(_decode_rows(vectors, scales, sample_rows), n_lists, seed=seed) if n_lists > 1
+                     else np.zeros((1, encoder.dim), dtype=np.float32))
+        assignment = np.zeros(rows, dtype=np.int32)
+        if n_lists > 1:
+            for start in range(0, rows, chunk_size):
+                block = np.arange(start, min(rows, start + chunk_size))
+                assignment[block] = np.argmax(_decode_rows(vectors, scales, block) @ centroids.T, axis=1)
+        list_rows = np.argsort(assignment, kind="stable").astype(np.int64)
+        list_offsets = np.searchsorted(assignment[list_rows], np.arange(n_lists + 1)).astype(np.int64)
+
+        np.save(os.path.join(tmp_path, "centroids.npy"), centroids.astype(np.float32))
+        np.save(os.path.join(tmp_path, "list_rows.npy"), list_rows)
+        np.save(os.path.join(tmp_path, "list_offsets.npy"), list_offsets)
+        if dtype == "int8":
+            np.save(os.path.join(tmp_path, "scales.npy"), scales)
+        meta = {
+            "format_version": EMBEDDING_FORMAT_VERSION,
+            "checksum": checksum,
+            "rows": rows,
+            "dim": encoder.dim,
+            "dtype": dtype,
+            "encoder": encoder.name,
+            "model": getattr(encoder, "model_name", None),
+            "n_lists": n_lists,
+            "created": time.time(),
+        }
+        with open(os.path.join(tmp_path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        del vectors
+
+        old_path = f"{path}.old-{os.getpid()}"
+        if os.path.exists(path):
+            os.replace(path, old_path)
+        os.replace(tmp_path, path)
+        if os.path.exists(old_path):
+            shutil.rmtree(old_path, ignore_errors=True)
+        return cls(path, encoder)
+
+    def _similarity(self, rows, query_vector):
+        vectors = self.vectors[rows].astype(np.float32)
+        if self.scales is not None:
+            vectors *= self.scales[rows, None]
+        return vectors @ query_vector
+
+    def encode_query(self, text):
+        return self.encoder.encode([text or ""])[0]
+
+    def search(self, text, n_candidates=200, nprobe=16, exact=False):
+        """
+        Строки с наибольшей косинусной близостью к тексту (по убыванию) и их оценки.
+        exact=True - полный перебор, для проверки полноты приближённого поиска.
+        """
+        query_vector = self.encode_query(text)
+        n_lists = len(self.centroids)
+        if exact or n_lists == 1:
+            rows = np.arange(len(self))
+        else:
+            order = np.argsort(-(self.centroids @ query_vector))
+            sizes = np.diff(self.list_offsets)[order]
+            # Не меньше nprobe кластеров и достаточно строк для n_candidates
+            probe = max(nprobe, int(np.searchsorted(np.cumsum(sizes), n_candidates)) + 1)
+            rows = np.concatenate([self.list_rows[self.list_offsets[c]:self.list_offsets[c + 1]]
+                                   for c in order[:probe]])
+        if not len(rows):
+            return np.array([], dtype=np.int64), np.array([])
+        similarity = self._similarity(rows, query_vector)
+        if len(rows) > n_candidates:
+            top = np.argpartition(-similarity, n_candidates - 1)[:n_candidates]
+            rows, similarity = rows[top], similarity[top]
+        order = np.lexsort((rows, -similarity))
+        return np.asarray(rows)[order], similarity[order]
+
+
+def load_or_build_embedding_index(df, csv_path, index_path=DEFAULT_INDEX_PATH, dtype=None, model_name=None,
+                                  checksum=None):
+    """
+    Открывает индекс векторов с диска, если он построен по той же версии CSV,
+    иначе строит его заново (описания объявлений -> векторы -> IVF).
+    checksum - версия CSV, из которой загружен df (по умолчанию считается по файлу)
+    """
+    dtype = dtype or os.environ.get("EMBEDDING_DTYPE", "float16")
+    model_name = model_name or os.environ.get("EMBEDDING_MODEL") or None
+    if checksum is None and os.path.exists(csv_path):
+        checksum = file_checksum(csv_path)
+    # Сравнивается модель, которая на самом деле будет кодировать тексты: без пакета
+    # sentence-transformers это хешированные n-граммы, а не заданная EMBEDDING_MODEL
+    encoder = make_encoder(model_name)
+    try:
+        index = EmbeddingIndex(index_path, encoder)
+        if (index.meta.get("format_version") == EMBEDDING_FORMAT_VERSION and checksum and
+                index.checksum == checksum and len(index) == len(df) and index.meta["dtype"] == dtype and
+                index.meta.get("encoder") == encoder.name and index.meta["dim"] == encoder.dim and
+                index.meta.get("model") == getattr(encoder, "model_name", None)):
+            return index
+    except (OSError, ValueError, KeyError):
+        pass
+    descriptions = df["description"] if "description" in df.columns else [""] * len(df)
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    return EmbeddingIndex.build(list(descriptions), index_path, checksum, encoder=encoder, dtype=dtype)
+
+
+def search_dense(df, feature_dict, user_prompt, embedding_index, k=10, n_candidates=200, nprobe=16,
+                 structured_index=None, hard_filter=False):
+    """
+    Поиск top-k в семантическом режиме: кандидаты - ближайшие по вектору описания
+    из IVF-индекса, структурные бонусы и схожесть признаков считаются только для них.
+    Вклад описания (до 0.3) - косинусная близость векторов вместо TF-IDF.
+    structured_index даёт готовые числовые столбцы цены, площади и этажа;
+    hard_filter=True отбрасывает кандидатов вне числовых диапазонов запроса.
+    Возвращает номера строк df и их оценки.
+    """
+    if df.empty:
+        return np.array([], dtype=np.int64), np.array([])
+    data_df = df.iloc[:, 1:] if 'url' in df.columns else df
+    rows, similarity = embedding_index.search(user_prompt, max(k, n_candidates), nprobe)
+    numeric = ({feature: values[rows] for feature, values in structured_index.numeric.items()}
+               if structured_index is not None else None)
+    if hard_filter and len(rows):
+        keep = numeric_filter_rows(data_df.iloc[rows], feature_dict, numeric)
+        if keep is not None:
+            rows, similarity = rows[keep], similarity[keep]
+            numeric = {feature: values[keep] for feature, values in numeric.items()} if numeric is not None else None
+    if not len(rows):
+        return np.array([], dtype=np.int64), np.array([])
+    sub_df = data_df.iloc[rows]
+    scores = np.minimum(structured_scores(sub_df, feature_dict) + feature_scores(sub_df, feature_dict, numeric)
+                        + np.clip(similarity, 0.0, 1.0) * 0.3, 1.0)
+    order = np.lexsort((rows, -scores))[:k]
+    return rows[order], scores[order]
+
+
+if __name__ == "__main__":
+    from src.catalogue import DEFAULT_CSV_PATH, load_dataframe
+    start = time.time()
+    index = load_or_build_embedding_index(load_dataframe(), DEFAULT_CSV_PATH)
+    print(f"Индекс векторов: {len(index)} объявлений, {index.meta['n_lists']} кластеров, "
+          f"{index.meta['dtype']}, {time.time() - start:.2f} с")
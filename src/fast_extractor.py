@@ -0,0 +1,200 @@
+import re
+
+import numpy as np
+
+from src.structured_index import parse_district, normalize_street
+
+# Признаки, которые возвращает LLM (порядок как в системном промпте)
+FEATURE_KEYS = [
+    "rooms", "adress", "price", "city_region", "floor", "area", "kitchen_studio", "apartment_condition",
+    "is_apartment_has_furniture(full or no)", "is_previously_dormitory", "security", "furniture_detailed",
+    "facilities", "bathroom", "zhiloi_complex", "house_year", "parking", "is_separated_toilet",
+    "toilet_count", "description",
+]
+
+# Слова запроса, которые не несут признаков и не снижают уверенность
+_FILLER_WORDS = {
+    "ищу", "ищем", "нужна", "нужен", "нужно", "хочу", "хотим", "найди", "найдите", "найти", "подбери",
+    "подберите", "покажи", "покажите", "пожалуйста", "мне", "нам", "для", "квартира", "квартиру", "квартиры",
+    "квартире", "жилье", "жильё", "аренда", "аренду", "арендовать", "снять", "сниму", "в", "во", "на", "по",
+    "с", "со", "и", "или", "до", "от", "за", "а", "город", "городе", "г", "алматы", "алма", "ата",
+    "район", "районе", "р", "н", "рн", "улица", "улице", "улицы", "ул", "проспект", "проспекте", "пр",
+    "мкр", "микрорайон", "микрорайоне", "комнатная", "комнатную", "комнатной", "комнат", "комнаты",
+    "комн", "к", "х", "тенге", "тг", "тыс", "млн", "м", "м2", "м²", "кв", "метров", "этаж", "этаже",
+    "месяц", "сутки", "бюджет", "цена", "дороже", "больше", "меньше", "примерно", "около",
+}
+# Отрицания: если такое слово не вошло в найденный признак ('не дороже', 'без мебели'),
+# признаки рядом с ним пришлось бы понять наоборот ('не Алмалинский район') - нужен LLM
+_NEGATION_WORDS = {"не", "ни", "нет", "без", "кроме", "исключая", "искл", "помимо"}
+
+_ROOM_WORDS = [
+    (r"одно\s*-?\s*комнатн\w*|однушк\w*", "1"),
+    (r"двух\s*-?\s*комнатн\w*|двушк\w*", "2"),
+    (r"тр[её]х\s*-?\s*комнатн\w*|тр[её]шк\w*", "3"),
+    (r"четыр[её]х\s*-?\s*комнатн\w*", "4"),
+    (r"пяти\s*-?\s*комнатн\w*", "5"),
+]
+_ROOMS_RE = re.compile(r"\b(\d)\s*-?\s*(?:х\s*)?(?:комнатн\w*|комн\w*|к)\b")
+_STUDIO_RE = re.compile(r"\bстуди\w*")
+_PRICE_RE = re.compile(
+    r"(?:\b(?:до|не дороже|за|бюджет\w*|цен\w*)\s+)?(\d[\d\s]*(?:[.,]\d+)?)\s*(млн|тыс\w*|к)?\s*(?:тг|тенге|₸)\b"
+    r"|\b(?:до|не дороже|бюджет\w*)\s+(\d[\d\s]*(?:[.,]\d+)?)\s*(млн|тыс\w*|к)?(?=\s|$|[,.;])"
+)
+# Цена с такими словами - верхняя граница ('до 250000'), а не ориентир
+_PRICE_UPPER_RE = re.compile(r"(?:до|не дороже|бюджет\w*)\s")
+_AREA_RE = re.compile(r"\b(\d+(?:[.,]\d+)?)\s*(?:м²|м2|кв\.?\s*м\w*|квадрат\w*)")
+_FLOOR_RE = re.compile(
+    r"(?:\b(до|не\s+выше|ниже|от|не\s+ниже|выше|с|начиная\s+с)\s+)?\b(\d+)\s*-?\s*(?:м|й|ом|го)?\s*этаж\w*"
+)
+# Этаж с такими словами - граница диапазона ('до 5 этажа' -> 'до 5'), а не точное значение
+_FLOOR_UPPER = {"до", "не выше", "ниже"}
+_YEAR_RE = re.compile(r"\b((?:19|20)\d\d)\s*(?:г\b|год\w*)")
+_COMPLEX_RE = re.compile(r"\bжк\s+[«\"]?([^\W\d_][\w\-]*)")
+_STREET_RE = re.compile(
+    r"\b(?:улиц[аеыу]|ул\.?|проспект[аеу]?|пр\.?|микрорайон[аеу]?|мкр\.?)\s+((?:[^\W\d_][\w\-]*)(?:\s+(?:би|батыра|хана|улы))?)"
+)
+_FLAGS = [
+    (re.compile(r"\bс\s+мебел\w*|\bмеблирован\w*"), "is_apartment_has_furniture(full or no)", "полностью"),
+    (re.compile(r"\bбез\s+мебел\w*"), "is_apartment_has_furniture(full or no)", "нет"),
+    (re.compile(r"\bпарков\w*|\bпаркинг\w*"), "parking", "есть"),
+    (re.compile(r"\bохран\w*"), "security", "есть"),
+    (re.compile(r"\bраздельн\w*\s+санузел\w*"), "is_separated_toilet", "да"),
+]
+
+
+def _stem(token):
+    """Основа слова для сравнения падежных форм ('айтеке' и 'айтеки' -> 'айте')"""
+    return token if len(token) <= 3 else token[:max(3, len(token) - 2)]
+
+
+def _number(text, unit=None):
+    value = float(text.replace(" ", "").replace("\xa0", "").replace(",", "."))
+    if unit == "млн":
+        value *= 1_000_000
+    elif unit and (unit.startswith("тыс") or unit == "к"):
+        value *= 1000
+    return str(int(value)) if value == int(value) else str(value)
+
+
+class FastFeatureExtractor:
+    """
+    Извлечение признаков из простых запросов без LLM: регулярные выражения для
+    комнат, цены, площади, этажа и справочник районов и улиц, построенный по
+    city_region и adress каталога. Возвращает словарь той же схемы, что и LLM, и
+    уверенность - долю значимых слов запроса, объяснённых найденными признаками.
+    """
+
+    def __init__(self, df):
+        # Район -> его запись в каталоге ('алмалинский' -> 'Алмалинский р-н')
+        self.districts = {}
+        if 'city_region' in df.columns:
+            for region in df['city_region'].dropna().astype(str).unique():
+                district = parse_district(region)
+                if district and district not in self.districts:
+                    part = next(p.strip() for p in region.split(",") if p.strip().lower().replace("ё", "е").startswith(district))
+                    self.districts[district] = part
+        self._district_patterns = [(re.compile(rf"\b{re.escape(_stem(d))}\w*(?:\s+(?:р-н|район\w*))?"), d)
+                                   for d in sorted(self.districts, key=len, reverse=True)]
+
+        # Улица -> её написание в каталоге (первая улица адреса без номера дома)
+        self.streets = {}
+        if 'adress' in df.columns:
+            for address in df['adress'].dropna().astype(str).unique():
+                street = re.split(r"\s+—\s+|\d", address, maxsplit=1)[0].strip(" ,.-")
+                tokens = tuple(normalize_street(street))
+                if tokens and street and tokens not in self.streets:
+                    self.streets[tokens] = street
+        self._street_patterns = [
+            (re.compile(r"\b" + r"[\s\-]+".join(rf"{re.escape(_stem(t))}\w*" for t in tokens) + r"\b"), tokens)
+            for tokens in sorted(self.streets, key=lambda t: (-len(t), -sum(map(len, t))))
+        ]
+        self.calls = 0
+        self.accepted = 0
+
+    def extract(self, prompt):
+        """(словарь признаков, уверенность от 0 до 1)"""
+        text = prompt.lower().replace("ё", "е").replace("\xa0", " ")
+        features = {key: "No Information" for key in FEATURE_KEYS}
+        covered = np.zeros(len(text), dtype=bool)
+
+        def take(match, key, value, group=0):
+            if features[key] == "No Information":
+                features[key] = value
+            covered[match.start(group):match.end(group)] = True
+
+        for pattern, rooms in _ROOM_WORDS:
+            for match in re.finditer(pattern, text):
+                take(match, "rooms", rooms)
+        for match in _ROOMS_RE.finditer(text):
+            take(match, "rooms", match.group(1))
+        for match in _STUDIO_RE.finditer(text):
+            take(match, "rooms", "1")
+            take(match, "kitchen_studio", "да")
+        for match in _PRICE_RE.finditer(text):
+            prefix = "до " if _PRICE_UPPER_RE.match(match.group(0)) else ""
+            if match.group(1):
+                take(match, "price", prefix + _number(match.group(1), match.group(2)))
+            elif match.group(3):
+                value = _number(match.group(3), match.group(4))
+                # 'до 5' без единиц - скорее этаж или год, чем цена
+                if float(value) >= 1000:
+                    take(match, "price", prefix + value)
+        for match in _AREA_RE.finditer(text):
+            take(match, "area", _number(match.group(1)))
+        for match in _FLOOR_RE.finditer(text):
+            bound = " ".join((match.group(1) or "").split())
+            prefix = ("до " if bound in _FLOOR_UPPER else "от ") if bound else ""
+            take(match, "floor", prefix + match.group(2))
+        for match in _YEAR_RE.finditer(text):
+            take(match, "house_year", match.group(1))
+        for match in _COMPLEX_RE.finditer(text):
+            take(match, "zhiloi_complex", prompt[match.start(1):match.end(1)])
+        for pattern, key, value in _FLAGS:
+            for match in pattern.finditer(text):
+                take(match, key, value)
+
+        for pattern, district in self._district_patterns:
+            for match in pattern.finditer(text):
+                take(match, "city_region", self.districts[district])
+        for pattern, tokens in self._street_patterns:
+            match = pattern.search(text)
+            if match and not covered[match.start():match.end()].all():
+                take(match, "adress", self.streets[tokens])
+        # Улица, которой нет в каталоге: берём как написано в запросе
+        if features["adress"] == "No Information":
+            match = _STREET_RE.search(text)
+            if match:
+                take(match, "adress", prompt[match.start(1):match.end(1)].strip(), group=0)
+
+        return features, self._confidence(text, covered, features)
+
+    @staticmethod
+    def _confidence(text, covered, features):
+        if all(value == "No Information" for value in features.values()):
+            return 0.0
+        words = list(re.finditer(r"[^\W_]+", text))
+        if any(m.group(0) in _NEGATION_WORDS and not covered[m.start():m.end()].all() for m in words):
+            return 0.0
+        content = [m for m in words if m.group(0) not in _FILLER_WORDS]
+        if not content:
+            return 1.0
+        explained = sum(1 for m in content if covered[m.start():m.end()].all())
+        return explained / len(content)
+
+    def try_extract(self, prompt, min_confidence):
+        """Признаки, если уверенность не ниже min_confidence, иначе None (нужен LLM)"""
+        self.calls += 1
+        features, confidence = self.extract(prompt)
+        if confidence < min_confidence:
+            return None
+        self.accepted += 1
+        return features
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "accepted": self.accepted,
+            "fallback_to_llm": self.calls - self.accepted,
+            "districts": len(self.districts),
+            "streets": len(self.streets),
+        }
@@ -0,0 +1,256 @@
+import argparse
+import glob
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+logger = logging.getLogger(__name__)
+
+# Доступные парсеры в порядке предпочтения; html.parser (BeautifulSoup) есть всегда
+try:
+    from selectolax.lexbor import LexborHTMLParser as _SelectolaxParser
+except ImportError:
+    try:
+        from selectolax.parser import HTMLParser as _SelectolaxParser
+    except ImportError:
+        _SelectolaxParser = None
+try:
+    import lxml.html as _lxml_html
+except ImportError:
+    _lxml_html = None
+
+BACKENDS = [name for name, available in (("selectolax", _SelectolaxParser is not None),
+                                         ("lxml", _lxml_html is not None),
+                                         ("html.parser", True)) if available]
+
+
+def default_backend():
+    return BACKENDS[0]
+
+
+# Функции для извлечения информации
+def get_info_from_header(text):
+    try:
+        info = text.split("·")
+        if len(info) >= 2:
+            rooms = info[0].strip()[0] if info[0].strip() and info[0].strip()[0].isdigit() else "1"
+            address = ""
+            for part in info:
+                if "," in part:
+                    address = part.split(",")[1].strip() if len(part.split(",")) > 1 else ""
+                    break
+            return [rooms, address]
+        else:
+            return ["1", ""]
+    except Exception as e:
+        logger.error(f"Ошибка при обработке заголовка: {e}")
+        return ["", ""]
+
+def get_info_from_price(price):
+    try:
+        price_text = price.strip()
+        price_text = price_text.replace("&nbsp;", "").replace("\xa0", "")
+        # Находим цифры в тексте
+        digits = ''.join(filter(str.isdigit, price_text))
+        return digits if digits else "0"
+    except Exception as e:
+        logger.error(f"Ошибка при обработке цены: {e}")
+        return "0"
+
+
+def _xpath_class(tag, *classes):
+    """XPath для элемента tag, у которого есть все указанные классы"""
+    conditions = " and ".join(f"contains(concat(' ', normalize-space(@class), ' '), ' {c} ')" for c in classes)
+    return f"//{tag}[{conditions}]"
+
+
+def _extract_selectolax(html):
+    tree = _SelectolaxParser(html)
+    first = lambda css: tree.css_first(css)
+    header = first("h1")
+    price = first("div.offer__price")
+    city = first("div.offer__location.offer__advert-short-info span")
+    description = first("div.offer__description")
+    params = []
+    for dl in tree.css("dl.offer__advert-short-info"):
+        dt, dd = dl.css_first("dt"), dl.css_first("dd")
+        if dt is not None and dd is not None:
+            params.append((dt.text(), dd.text()))
+    text = lambda node: node.text() if node is not None else None
+    return text(header), text(price), text(city), text(description), params
+
+
+def _extract_lxml(html):
+    tree = _lxml_html.fromstring(html)
+    first = lambda xpath: next(iter(tree.xpath(xpath)), None)
+    header = first("//h1")
+    price = first(_xpath_class("div", "offer__price"))
+    city = first(_xpath_class("div", "offer__location", "offer__advert-short-info") + "//span")
+    description = first(_xpath_class("div", "offer__description"))
+    params = []
+    for dl in tree.xpath(_xpath_class("dl", "offer__advert-short-info")):
+        dt, dd = next(iter(dl.xpath(".//dt")), None), next(iter(dl.xpath(".//dd")), None)
+        if dt is not None and dd is not None:
+            params.append((dt.text_content(), dd.text_content()))
+    text = lambda node: node.text_content() if node is not None else None
+    return text(header), text(price), text(city), text(description), params
+
+
+def _extract_html_parser(html):
+    from bs4 import BeautifulSoup
+    soup_cell = BeautifulSoup(html, "html.parser")
+    header = soup_cell.find("h1")
+    price = soup_cell.find("div", attrs={"class": "offer__price"})
+    city_html = soup_cell.find("div", attrs={"class": "offer__location offer__advert-short-info"})
+    city = city_html.find('span') if city_html else None
+    description = soup_cell.find("div", attrs={"class": "offer__description"})
+    params = []
+    for param in soup_cell.find_all("dl", attrs={"class": "offer__advert-short-info"}):
+        dt, dd = param.find("dt"), param.find("dd")
+        if dt and dd:
+            params.append((dt.text, dd.text))
+    text = lambda node: node.text if node is not None else None
+    return text(header), text(price), text(city), text(description), params
+
+
+_EXTRACTORS = {
+    "selectolax": _extract_selectolax,
+    "lxml": _extract_lxml,
+    "html.parser": _extract_html_parser,
+}
+
+
+def parse_listing(html, cell_url, backend=None):
+    """Извлекает данные о квартире со страницы объявления выбранным парсером"""
+    if isinstance(html, bytes):
+        html = html.decode("utf-8", errors="replace")
+    header, price, city, description, param_pairs = _EXTRACTORS[backend or default_backend()](html)
+    cell_main_info = get_info_from_header(header or "")
+    price_info = get_info_from_price(price or "")
+
+    # Собираем параметры квартиры из списка характеристик
+    params = {}
+    for key, value in param_pairs:
+        params[key.strip().lower()] = value.strip()
+
+    # Формируем словарь с данными о квартире
+    return {
+        "url": cell_url,
+        "rooms": cell_main_info[0],
+        "adress": cell_main_info[1],
+        "price": price_info,
+        "city_region": city.strip() if city else "",
+        "description": description.strip() if description else "",
+        "floor": params.get("этаж", ""),
+        "area": params.get("площадь, м²", ""),
+        "apartment_condition": params.get("состояние", ""),
+        "house_year": params.get("год постройки", ""),
+        "bathroom": params.get("санузел", ""),
+        "furniture_detailed": params.get("мебель", ""),
+    }
+
+
+def _parse_batch(batch, backend):
+    """Задача для процесса-обработчика: [(url, html)] -> [(url, квартира, текст ошибки)]"""
+    results = []
+    for cell_url, html in batch:
+        try:
+            results.append((cell_url, parse_listing(html, cell_url, backend), None))
+        except Exception as e:
+            results.append((cell_url, None, str(e)))
+    return results
+
+
+def parse_pipeline(pages, workers=None, backend=None, queue_size=64, batch_size=8, pool=None):
+    """
+    Конвейер производитель/потребитель: отдельный поток перекладывает сырые страницы
+    (url, html) из итератора pages (например, из загрузчика) в ограниченную очередь,
+    а пул процессов разбирает их пачками по batch_size. Возвращает словари квартир
+    по мере готовности. Готовый пул pool можно переиспользовать между вызовами.
+    """
+    backend = backend or default_backend()
+    workers = workers or os.cpu_count() or 1
+    raw_pages = queue.Queue(maxsize=queue_size)
+    done_marker = object()
+
+    def produce():
+        try:
+            for page in pages:
+                raw_pages.put(page)
+        finally:
+            raw_pages.put(done_marker)
+
+    producer = threading.Thread(target=produce, name="parse-producer", daemon=True)
+    producer.start()
+
+    own_pool = pool is None
+    if own_pool:
+        pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        in_flight = set()
+        exhausted = False
+        while not exhausted or in_flight:
+            # Держим в пуле не больше 2 * workers задач, остальное ждёт в очереди
+            while not exhausted and len(in_flight) < 2 * workers:
+                batch = []
+                while len(batch) < batch_size:
+                    # Неполную пачку отправляем сразу, если очередь пуста и задачи уже идут
+                    if batch and in_flight and raw_pages.empty():
+                        break
+                    page = raw_pages.get()
+                    if page is done_marker:
+                        exhausted = True
+                        break
+                    batch.append(page)
+                if batch:
+                    in_flight.add(pool.submit(_parse_batch, batch, backend))
+            if not in_flight:
+                continue
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                for cell_url, apartment, error in future.result():
+                    if error:
+                        logger.error(f"Ошибка при обработке объявления {cell_url}: {error}")
+                    else:
+                        yield apartment
+    finally:
+        if own_pool:
+            pool.shutdown()
+    producer.join()
+
+
+def benchmark_backends(pages, repeat=3, workers=None):
+    """
+    Скорость разбора (страниц в секунду) для каждого доступного парсера:
+    в одном процессе и через parse_pipeline на пуле процессов
+    """
+    results = {}
+    for backend in BACKENDS:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for url, html in pages:
+                parse_listing(html, url, backend)
+        single = len(pages) * repeat / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        parsed = sum(1 for _ in parse_pipeline(pages * repeat, workers=workers, backend=backend))
+        pooled = parsed / (time.perf_counter() - start)
+        results[backend] = {"single_process_pages_per_sec": round(single, 1),
+                            "process_pool_pages_per_sec": round(pooled, 1)}
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сравнение скорости парсеров страниц объявлений")
+    parser.add_argument("pages_dir", help="каталог с сохранёнными HTML-страницами объявлений")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    files = sorted(glob.glob(os.path.join(args.pages_dir, "**", "*"), recursive=True))
+    saved_pages = [(path, open(path, "rb").read()) for path in files if os.path.isfile(path)]
+    for name, speed in benchmark_backends(saved_pages, args.repeat, args.workers).items():
+        print(f"{name}: {speed}")
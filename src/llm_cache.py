@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+
+def normalize_prompt(prompt):
+    """
+    Приводит запрос к каноническому виду, чтобы почти одинаковые запросы
+    (регистр, пробелы, ё/е, знаки препинания по краям) давали один ключ
+    """
+    text = unicodedata.normalize("NFKC", prompt or "").lower().replace("ё", "е")
+    text = re.sub(r"\s+", " ", text)
+    return text.strip(" .,!?;:")
+
+
+def prompt_key(prompt):
+    """Ключ кэша для запроса пользователя"""
+    return hashlib.sha256(normalize_prompt(prompt).encode("utf-8")).hexdigest()
+
+
+class TTLLRUCache:
+    """
+    Потокобезопасный LRU-кэш с ограничением по количеству записей и временем жизни.
+    При указании sqlite_path записи дополнительно сохраняются в локальный файл
+    SQLite и переживают перезапуск сервера. Соединение с SQLite открывается при
+    первом обращении в каждом процессе: соединение, открытое до fork (serve.py
+    прогревает кэш в родителе), нельзя использовать в дочерних процессах.
+    """
+
+    def __init__(self, maxsize=1024, ttl=3600, sqlite_path=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.sqlite_path = sqlite_path
+        self._db = None
+        self._db_pid = None
+        if sqlite_path:
+            # Таблица создаётся сразу, но соединение не остаётся открытым
+            db = sqlite3.connect(sqlite_path)
+            try:
+                db.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT, created REAL)")
+                db.commit()
+            finally:
+                db.close()
+
+    def _connection(self):
+        """Соединение с SQLite текущего процесса (вызывается под self._lock); None без sqlite_path"""
+        if self.sqlite_path is None:
+            return None
+        if self._db_pid != os.getpid():
+            # Унаследованное от родителя соединение не закрывается и не используется
+            self._db = sqlite3.connect(self.sqlite_path, check_same_thread=False)
+            self._db_pid = os.getpid()
+        return self._db
+
+    def _expired(self, created, now):
+        return self.ttl is not None and now - created > self.ttl
+
+    def _load_from_db(self, key, now):
+        db = self._connection()
+        if db is None:
+            return None
+        row = db.execute("SELECT value, created FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, created = row
+        if self._expired(created, now):
+            db.execute("DELETE FROM cache WHERE key = ?", (key,))
+            db.commit()
+            return None
+        return json.loads(value), created
+
+    def _store(self, key, value, created):
+        self._data[key] = (value, created)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key):
+        """Возвращает значение или None, если записи нет или она устарела"""
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and self._expired(entry[1], now):
+                del self._data[key]
+                entry = None
+            if entry is None:
+                entry = self._load_from_db(key, now)
+                if entry is not None:
+                    self._store(key, *entry)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value):
+        """Сохраняет значение (должно сериализоваться в JSON при использовании SQLite)"""
+        now = time.time()
+        with self._lock:
+            self._store(key, value, now)
+            db = self._connection()
+            if db is not None:
+                db.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, created) VALUES (?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False), now),
+                )
+                db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            db = self._connection()
+            if db is not None:
+                db.execute("DELETE FROM cache")
+                db.commit()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        """Счётчики попаданий и промахов для подбора размера кэша"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+                "persistent": self.sqlite_path is not None,
+            }
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+import time
+
+from src.llm_protocol import read_completion_async
+
+
+class AsyncLLMGateway:
+    """
+    Неблокирующие вызовы LLM на отдельном событийном цикле (в фоновом потоке).
+
+    - не больше max_concurrency одновременных запросов к API;
+    - таймаут timeout секунд на каждый вызов;
+    - одновременные запросы с одинаковым ключом объединяются в один вызов API.
+
+    complete() можно ожидать из любого событийного цикла (например, из async-view
+    Flask), complete_sync() - вызывать из обычного потока. Ответ читается потоком;
+    request_options - дополнительные параметры вызова, usage (LLMUsageTracker) -
+    учёт токенов и задержек.
+    """
+
+    def __init__(self, client_factory, model, max_concurrency=16, timeout=30.0, request_options=None,
+                 usage=None, protocol="compact"):
+        self.model = model
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.request_options = dict(request_options or {})
+        self.usage = usage
+        self.protocol = protocol
+        self.calls = 0
+        self.coalesced = 0
+        self.timeouts = 0
+        self.errors = 0
+        self._client_factory = client_factory
+        self._client = None
+        self._inflight = {}
+        self._loop = asyncio.new_event_loop()
+        self._semaphore = None
+        self._thread = threading.Thread(target=self._loop.run_forever, name="llm-gateway", daemon=True)
+        self._thread.start()
+
+    async def _call(self, messages):
+        if self._client is None:
+            # Клиент создаётся в потоке цикла, к которому привязан его пул соединений
+            self._client = self._client_factory()
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            self.calls += 1
+            try:
+                return await asyncio.wait_for(self._read(messages), self.timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise
+            except Exception:
+                self.errors += 1
+                raise
+
+    async def _read(self, messages):
+        start = time.perf_counter()
+        stream = await self._client.chat.completions.create(model=self.model, messages=messages, stream=True,
+                                                            **self.request_options)
+        return await read_completion_async(stream, usage=self.usage, protocol=self.protocol, start=start)
+
+    async def _complete(self, messages, key):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._call(messages))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # shield: отмена одного ожидающего не отменяет общий вызов для остальных
+        return await asyncio.shield(task)
+
+    def submit(self, messages, key):
+        """Ставит вызов в цикл шлюза; возвращает concurrent.futures.Future с текстом ответа"""
+        return asyncio.run_coroutine_threadsafe(self._complete(messages, key), self._loop)
+
+    async def complete(self, messages, key):
+        return await asyncio.wrap_future(self.submit(messages, key))
+
+    def complete_sync(self, messages, key):
+        return self.submit(messages, key).result()
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "in_flight": len(self._inflight),
+            "max_concurrency": self.max_concurrency,
+        }
+
+    def close(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
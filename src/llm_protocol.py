@@ -0,0 +1,265 @@
+import json
+import threading
+import time
+
+from src.fast_extractor import FEATURE_KEYS
+from src.metrics import metrics
+
+# Короткая схема: модель возвращает только упомянутые в запросе признаки,
+# отсутствующие достраиваются значением "No Information" при разборе
+COMPACT_SYSTEM_PROMPT = (
+    "Extract apartment rental search features from the user's query. "
+    "Reply with one JSON object holding only the keys the query mentions, values in Russian. "
+    "Keep range words for price, area and floor (e.g. \"до 200000\", \"50-60\", \"от 3\"). "
+    "Keys: " + ", ".join(FEATURE_KEYS) + "."
+)
+
+MISSING_VALUE = "No Information"
+
+
+class ResponseTruncated(RuntimeError):
+    """Ответ LLM оборван лимитом max_tokens (finish_reason == "length")"""
+
+
+def expand_features(fields):
+    """Словарь всех признаков в формате подробного протокола: отсутствующие - "No Information" """
+    features = {key: fields.get(key, MISSING_VALUE) for key in FEATURE_KEYS}
+    features.update((key, value) for key, value in fields.items() if key not in features)
+    return features
+
+
+def request_options(protocol, json_mode=True, max_tokens=None):
+    """Дополнительные параметры chat.completions.create для протокола"""
+    # Число токенов ответа приходит последним фрагментом потока
+    options = {"stream_options": {"include_usage": True}}
+    if protocol == "compact":
+        if json_mode:
+            options["response_format"] = {"type": "json_object"}
+        if max_tokens:
+            options["max_tokens"] = max_tokens
+    return options
+
+
+class IncrementalJSONParser:
+    """
+    Разбор JSON-объекта признаков по мере поступления текста ответа.
+
+    feed() принимает очередной фрагмент и возвращает пары (ключ, значение), которые
+    завершились в нём, поэтому полями можно пользоваться до конца ответа. Разбор
+    терпим к ошибкам формата: текст до первой "{" (в т.ч. ```json) и после объекта
+    пропускается, строки допускаются в одинарных кавычках, нераспознанное значение
+    сохраняется строкой.
+    """
+
+    def __init__(self, on_field=None):
+        self.on_field = on_field
+        self.fields = {}
+        self.complete = False
+        self._state = "start"
+        self._quote = None
+        self._escape = False
+        self._depth = 0
+        self._key = None
+        self._token = []
+
+    def feed(self, text):
+        emitted = []
+        for char in text:
+            if self.complete:
+                break
+            field = self._step(char)
+            if field is not None:
+                key, value = field
+                self.fields[key] = value
+                emitted.append(field)
+                if self.on_field is not None:
+                    self.on_field(key, value)
+        return emitted
+
+    @property
+    def started(self):
+        """Встретилось ли начало объекта "{" """
+        return self._state != "start"
+
+    def result(self):
+        """Все полученные поля; незавершённое скалярное значение в конце ответа тоже учитывается"""
+        if not self.complete and self._state == "value" and self._quote is None and self._depth == 0:
+            raw = "".join(self._token).strip()
+            if raw and self._key is not None:
+                self.fields[self._key] = self._decode(raw)
+        return dict(self.fields)
+
+    @staticmethod
+    def _decode(raw):
+        try:
+            return json.loads(raw)
+        except ValueError:
+            pass
+        if len(raw) >= 2 and raw[0] == raw[-1] == "'":
+            try:
+                return json.loads('"' + raw[1:-1].replace('"', '\\"').replace("\\'", "'") + '"')
+            except ValueError:
+                return raw[1:-1]
+        return raw
+
+    def _step(self, char):
+        state = self._state
+        if state == "start":
+            if char == "{":
+                self._state = "key"
+            return None
+
+        # Внутри строки (ключа или значения) - до закрывающей кавычки того же вида
+        if self._quote is not None:
+            self._token.append(char)
+            if self._escape:
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == self._quote:
+                self._quote = None
+                if state == "key":
+                    self._key = self._decode("".join(self._token))
+                    self._token = []
+                    self._state = "colon"
+            return None
+
+        if state == "key":
+            if char in "\"'":
+                self._quote = char
+                self._token = [char]
+            elif char == "}":
+                self.complete = True
+            return None
+
+        if state == "colon":
+            if char == ":":
+                self._state = "value"
+                self._token = []
+            return None
+
+        # Значение: строка, число, литерал или вложенный массив/объект
+        if char in "\"'":
+            self._quote = char
+        elif char in "[{":
+            self._depth += 1
+        elif char in "]}" and self._depth > 0:
+            self._depth -= 1
+        elif char in ",}" and self._depth == 0:
+            raw = "".join(self._token).strip()
+            self._token = []
+            self._state = "key"
+            if char == "}":
+                self.complete = True
+            if raw and self._key is not None:
+                return self._key, self._decode(raw)
+            return None
+        self._token.append(char)
+        return None
+
+
+class LLMUsageTracker:
+    """
+    Токены и задержки вызовов LLM: суммарно и в среднем на вызов, по протоколам.
+    Время до первого фрагмента и полное время вызова пишутся также в гистограмму
+    realtor_llm_seconds{phase="first_token"|"total"}.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = {}
+
+    def record(self, protocol, prompt_tokens, completion_tokens, seconds, first_token_seconds=None):
+        metrics.observe("realtor_llm_seconds", seconds, "Длительность вызовов LLM, секунды",
+                        phase="total", protocol=protocol)
+        if first_token_seconds is not None:
+            metrics.observe("realtor_llm_seconds", first_token_seconds, "Длительность вызовов LLM, секунды",
+                            phase="first_token", protocol=protocol)
+        with self._lock:
+            totals = self._totals.setdefault(protocol, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                                                        "seconds": 0.0})
+            totals["calls"] += 1
+            totals["prompt_tokens"] += prompt_tokens or 0
+            totals["completion_tokens"] += completion_tokens or 0
+            totals["seconds"] += seconds
+
+    def stats(self):
+        with self._lock:
+            return {protocol: dict(totals,
+                                   mean_prompt_tokens=round(totals["prompt_tokens"] / totals["calls"], 1),
+                                   mean_completion_tokens=round(totals["completion_tokens"] / totals["calls"], 1),
+                                   mean_seconds=round(totals["seconds"] / totals["calls"], 4))
+                    for protocol, totals in self._totals.items()}
+
+
+class _StreamReader:
+    """Сборка текста ответа из фрагментов потока с учётом токенов и времени первого фрагмента"""
+
+    def __init__(self, parser, usage, protocol, start=None):
+        self.parser = parser
+        self.usage = usage
+        self.protocol = protocol
+        self.parts = []
+        self.prompt_tokens = None
+        self.completion_tokens = None
+        self.first_token = None
+        self.finish_reason = None
+        self.start = time.perf_counter() if start is None else start
+
+    def add(self, chunk):
+        if getattr(chunk, "usage", None) is not None:
+            self.prompt_tokens = chunk.usage.prompt_tokens
+            self.completion_tokens = chunk.usage.completion_tokens
+        for choice in chunk.choices or []:
+            if getattr(choice, "finish_reason", None):
+                self.finish_reason = choice.finish_reason
+            text = getattr(choice.delta, "content", None)
+            if text:
+                if self.first_token is None:
+                    self.first_token = time.perf_counter() - self.start
+                self.parts.append(text)
+                if self.parser is not None:
+                    self.parser.feed(text)
+
+    def finish(self):
+        if self.usage is not None:
+            self.usage.record(self.protocol, self.prompt_tokens, self.completion_tokens,
+                              time.perf_counter() - self.start, self.first_token)
+        if self.finish_reason == "length":
+            raise ResponseTruncated(f"ответ LLM оборван после {self.completion_tokens} токенов")
+        return "".join(self.parts)
+
+
+def read_completion(stream, parser=None, usage=None, protocol="compact", start=None):
+    """
+    Текст потокового ответа chat.completions; parser получает его по мере поступления.
+    start - time.perf_counter() перед отправкой запроса (иначе время считается от начала чтения).
+    Ответ, оборванный лимитом токенов, - исключение ResponseTruncated.
+    """
+    reader = _StreamReader(parser, usage, protocol, start)
+    for chunk in stream:
+        reader.add(chunk)
+    return reader.finish()
+
+
+async def read_completion_async(stream, parser=None, usage=None, protocol="compact", start=None):
+    """То же для асинхронного клиента"""
+    reader = _StreamReader(parser, usage, protocol, start)
+    async for chunk in stream:
+        reader.add(chunk)
+    return reader.finish()
+
+
+def parse_features(text, parser=None):
+    """
+    Признаки из текста ответа: результат инкрементального разбора (если parser уже
+    получил ответ - повторно не разбирается), все ключи достраиваются до полного словаря.
+    Незакрытый объект - ошибка: без оборванных полей ответ означал бы другой запрос.
+    """
+    if parser is None:
+        parser = IncrementalJSONParser()
+        parser.feed(text)
+    if not parser.complete:
+        return {"error": "Incomplete JSON in response" if parser.started
+                else "No JSON found in response"}
+    return expand_features(parser.result())
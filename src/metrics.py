@@ -0,0 +1,186 @@
+import bisect
+import cProfile
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Границы корзин гистограмм задержек, секунды
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+def _label_key(labels, const_labels=None):
+    """Метки серии и общие метки процесса (const_labels) в виде отсортированного кортежа"""
+    merged = dict(const_labels or {})
+    merged.update(labels)
+    return tuple(sorted((key, str(value)) for key, value in merged.items()))
+
+
+def _format_value(value):
+    return repr(float(value)) if value != float("inf") else "+Inf"
+
+
+class Histogram:
+    """Гистограмма в формате Prometheus: накопительные корзины, сумма и количество"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', _format_value(bound)),))} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {self.sum!r}")
+        lines.append(f"{name}_count{_format_labels(labels)} {self.count}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Потокобезопасный набор гистограмм задержек с метками и вывод в текстовом
+    формате Prometheus (GET /metrics)
+    """
+
+    def __init__(self):
+        self._families = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, value, help_text="", **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            help_text, series = self._families.setdefault(name, (help_text, {}))
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def timed(self, stage, name="realtor_stage_seconds"):
+        """Время выполнения блока как наблюдение гистограммы name{stage=...}"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, "Длительность этапов поиска, секунды", stage=stage)
+
+    def summary(self):
+        """Количество и среднее по каждой серии - для JSON и отладки"""
+        with self._lock:
+            return {f"{name}{_format_labels(key)}": {"count": h.count, "mean": h.sum / h.count if h.count else 0.0}
+                    for name, (_, series) in self._families.items() for key, h in series.items()}
+
+    def render(self, const_labels=None):
+        """Текст Prometheus; const_labels добавляются ко всем сериям (например, pid обработчика)"""
+        lines = []
+        with self._lock:
+            for name, (help_text, series) in sorted(self._families.items()):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in sorted(series.items()):
+                    lines.extend(histogram.render(name, _label_key(dict(key), const_labels)))
+        return "\n".join(lines) + "\n"
+
+
+def _render_samples(name, help_text, kind, samples, const_labels):
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        lines.append(f"{name}{_format_labels(_label_key(labels, const_labels))} {float(value)!r}")
+    return "\n".join(lines) + "\n"
+
+
+def render_gauges(name, help_text, samples, const_labels=None):
+    """Строки Prometheus для набора значений: samples - [(метки dict, значение)]"""
+    return _render_samples(name, help_text, "gauge", samples, const_labels)
+
+
+def render_counters(name, help_text, samples, const_labels=None):
+    """
+    То же для счётчиков, которые только растут с запуска процесса: тип counter и
+    суффикс _total, чтобы к ним можно было применять rate() и increase()
+    """
+    return _render_samples(name if name.endswith("_total") else f"{name}_total", help_text, "counter", samples,
+                           const_labels)
+
+
+def process_memory():
+    """
+    Память текущего процесса по /proc/self/smaps_rollup (Linux), байты: rss, pss
+    (доля разделяемых страниц), shared (общие с другими процессами) и private.
+    При работе нескольких процессов-обработчиков реальный расход - сумма pss.
+    """
+    values = {}
+    try:
+        with open("/proc/self/smaps_rollup", encoding="ascii") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    values[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    except OSError:
+        return {}
+    return {
+        "rss": values.get("Rss", 0),
+        "pss": values.get("Pss", 0),
+        "shared": values.get("Shared_Clean", 0) + values.get("Shared_Dirty", 0),
+        "private": values.get("Private_Clean", 0) + values.get("Private_Dirty", 0),
+    }
+
+
+class SlowRequestProfiler:
+    """
+    Профилирование запросов через cProfile: профиль сохраняется в directory, только
+    если запрос выполнялся дольше threshold секунд. Включается явно, так как
+    профилировщик замедляет каждый запрос.
+    """
+
+    def __init__(self, directory, threshold):
+        self.directory = directory
+        self.threshold = threshold
+        self.dumped = 0
+        self._sequence = itertools.count(1)
+        os.makedirs(directory, exist_ok=True)
+
+    def start(self):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # В этом потоке уже работает другой профилировщик
+            return None
+        return profiler, time.perf_counter()
+
+    def stop(self, handle, label):
+        """Останавливает профиль; возвращает путь к файлу, если запрос оказался медленным"""
+        if handle is None:
+            return None
+        profiler, start = handle
+        profiler.disable()
+        elapsed = time.perf_counter() - start
+        if elapsed < self.threshold:
+            return None
+        safe_label = "".join(c if c.isalnum() else "_" for c in label).strip("_") or "request"
+        path = os.path.join(self.directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{next(self._sequence)}-"
+                                            f"{safe_label}-{int(elapsed * 1000)}ms.prof")
+        profiler.dump_stats(path)
+        self.dumped += 1
+        return path
+
+
+# Общий реестр процесса: этапы из src.model, src.structured_index и app.py
+metrics = MetricsRegistry()
@@ -0,0 +1,134 @@
+"""
+Локальный mock-сервер OpenAI-совместимого API (POST /v1/chat/completions) для
+нагрузочных тестов без обращения к DeepSeek. Отвечает с заданной задержкой
+JSON-словарём признаков, извлечённых из запроса простыми правилами. Поддерживает
+потоковые ответы (stream=True, с usage в последнем фрагменте); если системный
+промпт не требует "No Information", отвечает только найденными признаками.
+token_latency добавляет задержку на каждый токен ответа, как у настоящей модели.
+
+    python src/mock_llm.py --port 8081 --latency 0.8
+    DEEPSEEK_BASE_URL=http://127.0.0.1:8081/v1 python app.py
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.fast_extractor import FEATURE_KEYS
+
+
+def count_tokens(text):
+    """Грубая оценка числа токенов (около 3 символов на токен для смеси кириллицы и латиницы)"""
+    return max(1, len(text) // 3)
+
+
+def fake_features(prompt, compact=False):
+    """Словарь признаков в формате ответа LLM (недостающие - 'No Information' или, при compact, без них)"""
+    features = {key: "No Information" for key in FEATURE_KEYS}
+    rooms = re.search(r"(\d+)\s*-?\s*комнат", prompt)
+    if rooms:
+        features["rooms"] = rooms.group(1)
+    region = re.search(r"([А-ЯЁ][а-яё]+ский)\s+район", prompt)
+    if region:
+        features["city_region"] = f"{region.group(1)} район"
+    street = re.search(r"улиц[еаы]\s+([А-ЯЁ][\w\-]*(?:\s+[а-яё]{2,3}\b)?)", prompt)
+    if street:
+        features["adress"] = street.group(1)
+    if compact:
+        return {key: value for key, value in features.items() if value != "No Information"}
+    return features
+
+
+class MockLLMServer:
+    """Запускает mock-сервер в фоновом потоке; requests - число принятых запросов"""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.5, token_latency=0.0):
+        self.latency = latency
+        self.token_latency = token_latency
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                server.requests += 1
+                messages = body.get("messages", [])
+                prompt = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+                system = next((m["content"] for m in messages if m["role"] == "system"), "")
+                content = json.dumps(fake_features(prompt, compact="No Information" not in system),
+                                     ensure_ascii=False)
+                usage = {"prompt_tokens": sum(count_tokens(m["content"]) for m in messages),
+                         "completion_tokens": count_tokens(content)}
+                usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+                base = {"id": f"mock-{server.requests}", "created": int(time.time()), "model": body.get("model", "mock")}
+                time.sleep(server.latency)
+                if body.get("stream"):
+                    self._stream(base, content, usage, body.get("stream_options") or {})
+                    return
+                time.sleep(server.token_latency * usage["completion_tokens"])
+                payload = json.dumps(dict(base, object="chat.completion", usage=usage, choices=[
+                    {"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}
+                ])).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _stream(self, base, content, usage, stream_options):
+                """Ответ событиями SSE: фрагменты по несколько символов, затем usage и [DONE]"""
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+
+                def send(chunk):
+                    self.wfile.write(f"data: {json.dumps(dict(base, object='chat.completion.chunk', **chunk))}\n\n"
+                                     .encode("utf-8"))
+                    self.wfile.flush()
+
+                step = 3
+                for i in range(0, len(content), step):
+                    time.sleep(server.token_latency)
+                    send({"choices": [{"index": 0, "finish_reason": None,
+                                       "delta": {"role": "assistant", "content": content[i:i + step]}}]})
+                send({"choices": [{"index": 0, "finish_reason": "stop", "delta": {}}]})
+                if stream_options.get("include_usage"):
+                    send({"choices": [], "usage": usage})
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.base_url = f"http://{host}:{self.httpd.server_address[1]}/v1"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock OpenAI-совместимого API для нагрузочных тестов")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.5, help="задержка ответа в секундах")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="задержка на токен ответа, с")
+    args = parser.parse_args()
+    mock = MockLLMServer(port=args.port, latency=args.latency, token_latency=args.token_latency)
+    print(f"Mock LLM: {mock.base_url}")
+    mock.httpd.serve_forever()
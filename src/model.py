@@ -1,61 +1,228 @@
-import pandas as pd
 import re
 import json
+import asyncio
+import importlib
 import os
-from openai import OpenAI
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from dotenv import load_dotenv
+import sys
+import threading
+import time
 import colorama
 from colorama import Fore, Style
 import textwrap
 
-# Инициализируем colorama для цветного вывода
-colorama.init()
-
-# Загружаем переменные окружения из .env файла если он есть
-load_dotenv()
+# Корень проекта в пути импорта, чтобы модуль работал и как скрипт (python src/model.py)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.llm_cache import TTLLRUCache, prompt_key
+from src.metrics import metrics
 
 # Определяем абсолютный путь к файлам данных
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 data_path = os.path.join(BASE_DIR, "data", "apartments.csv")
+catalogue_path = os.path.join(BASE_DIR, "data", "catalogue")
+
+# Адрес API и модель DeepSeek (адрес можно заменить, например, на локальный mock-сервер)
+LLM_BASE_URL = os.environ.get("DEEPSEEK_BASE_URL", "https://api.deepseek.com/v1")
+LLM_MODEL = "deepseek-chat"
+
+# Протокол извлечения признаков: compact - короткая схема, только упомянутые признаки и режим JSON;
+# verbose - прежний подробный промпт со всеми ключами (LLM_PROTOCOL=verbose)
+LLM_PROTOCOL = os.environ.get("LLM_PROTOCOL", "compact")
+LLM_JSON_MODE = os.environ.get("LLM_JSON_MODE", "1") == "1"
+# Ограничение длины ответа в токенах (0 - без ограничения)
+LLM_MAX_TOKENS = int(os.environ.get("LLM_MAX_TOKENS", 300))
+
+# Простые запросы разбираются локально, без LLM, если уверенность не ниже порога (FAST_EXTRACT=0 - выключить)
+FAST_EXTRACT = os.environ.get("FAST_EXTRACT", "1") == "1"
+FAST_EXTRACT_MIN_CONFIDENCE = float(os.environ.get("FAST_EXTRACT_MIN_CONFIDENCE", 0.8))
+
+# Наибольшее число ячеек матрицы оценок (запросы x объявления) в одной части пакетного поиска;
+# 2 млн ячеек float64 - 16 МБ на каждую промежуточную матрицу
+BATCH_MAX_CELLS = int(os.environ.get("BATCH_MAX_CELLS", 2_000_000))
+
+
+class RealtorService:
+    """
+    Ленивая инициализация тяжёлых ресурсов модуля: каталог квартир, клиент DeepSeek
+    и кэш LLM создаются при первом обращении (или в warm_up), а не при импорте.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._df = None
+        self._catalogue = None
+        self._client = None
+        self._llm_cache = None
+        self._llm_gateway = None
+        self._llm_usage = None
+        self._fast_extractor = None
+
+    @property
+    def df(self):
+        if self._df is None:
+            with self._lock:
+                if self._df is None:
+                    import pandas as pd
+                    from src.catalogue import load_catalogue
+                    # Загружаем каталог квартир из колоночного хранилища
+                    try:
+                        self._df, self._catalogue = load_catalogue(data_path, catalogue_path)
+                    except FileNotFoundError:
+                        print(f"Ошибка: Файл {data_path} не найден")
+                        self._df = pd.DataFrame()
+        return self._df
+
+    @property
+    def catalogue(self):
+        """Колоночное хранилище, из которого загружен df (None, если каталог прочитан из CSV)"""
+        self.df  # загружает каталог при первом обращении
+        return self._catalogue
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from openai import OpenAI
+                    # Настройка клиента DeepSeek
+                    self._client = OpenAI(api_key=self.api_key, base_url=LLM_BASE_URL)
+        return self._client
+
+    @property
+    def api_key(self):
+        from dotenv import load_dotenv
+        # Загружаем переменные окружения из .env файла если он есть
+        load_dotenv()
+        # Получаем API ключ из переменных окружения или используем значение по умолчанию
+        return os.environ.get("DEEPSEEK_API_KEY", "sk-74b87290351b47acacfc94680907ed09")
+
+    @property
+    def llm_gateway(self):
+        if self._llm_gateway is None:
+            with self._lock:
+                if self._llm_gateway is None:
+                    from openai import AsyncOpenAI
+                    from src.llm_gateway import AsyncLLMGateway
+                    self._llm_gateway = AsyncLLMGateway(
+                        lambda: AsyncOpenAI(api_key=self.api_key, base_url=LLM_BASE_URL),
+                        model=LLM_MODEL,
+                        max_concurrency=int(os.environ.get("LLM_MAX_CONCURRENCY", 16)),
+                        timeout=float(os.environ.get("LLM_TIMEOUT", 30)),
+                        request_options=llm_request_options(),
+                        usage=self.llm_usage,
+                        protocol=LLM_PROTOCOL,
+                    )
+        return self._llm_gateway
 
-# Загружаем CSV файл с данными о квартирах
-try:
-    df = pd.read_csv(data_path, index_col=0)
-except FileNotFoundError:
-    print(f"Ошибка: Файл {data_path} не найден")
-    df = pd.DataFrame()
+    @property
+    def llm_usage(self):
+        """Учёт токенов и задержек вызовов LLM"""
+        if self._llm_usage is None:
+            with self._lock:
+                if self._llm_usage is None:
+                    from src.llm_protocol import LLMUsageTracker
+                    self._llm_usage = LLMUsageTracker()
+        return self._llm_usage
 
-# Получаем API ключ из переменных окружения или используем значение по умолчанию
-api_key = os.environ.get("DEEPSEEK_API_KEY", "sk-74b87290351b47acacfc94680907ed09")
+    @property
+    def llm_cache(self):
+        if self._llm_cache is None:
+            with self._lock:
+                if self._llm_cache is None:
+                    # Кэш извлечённых признаков: LRU с TTL, при LLM_CACHE_DB - с сохранением в SQLite
+                    self._llm_cache = TTLLRUCache(
+                        maxsize=int(os.environ.get("LLM_CACHE_SIZE", 1024)),
+                        ttl=float(os.environ.get("LLM_CACHE_TTL", 24 * 3600)),
+                        sqlite_path=os.environ.get("LLM_CACHE_DB") or None,
+                    )
+        return self._llm_cache
 
-# Настройка клиента DeepSeek
-client = OpenAI(api_key=api_key, base_url="https://api.deepseek.com/v1")
+    @property
+    def fast_extractor(self):
+        """Локальный извлекатель признаков по справочнику районов и улиц каталога (None, если выключен)"""
+        if self._fast_extractor is None and FAST_EXTRACT:
+            df = self.df
+            with self._lock:
+                if self._fast_extractor is None and not df.empty:
+                    from src.fast_extractor import FastFeatureExtractor
+                    self._fast_extractor = FastFeatureExtractor(df)
+        return self._fast_extractor
 
-# Функция запроса к LLM для извлечения признаков недвижимости
-def get_real_estate_details(client_prompt):
+    def replace_catalogue(self, df, catalogue=None):
+        """Подменяет каталог (после перезагрузки файла) вместе со справочником извлекателя"""
+        fast_extractor = None
+        if FAST_EXTRACT and not df.empty:
+            from src.fast_extractor import FastFeatureExtractor
+            fast_extractor = FastFeatureExtractor(df)
+        with self._lock:
+            self._df = df
+            self._catalogue = catalogue
+            self._fast_extractor = fast_extractor
+
+    def warm_up(self, catalogue=True):
+        """Явная инициализация всех ресурсов, например до приёма запросов сервером"""
+        # Подгружает scikit-learn заранее
+        importlib.import_module("src.scoring")
+        self.client
+        self.llm_cache
+        if catalogue:
+            self.df
+            self.fast_extractor
+        return self
+
+
+service = RealtorService()
+
+
+def __getattr__(name):
+    # Совместимость со старыми обращениями model.df / model.client / model.llm_cache
+    if name in ("df", "client", "llm_cache"):
+        return getattr(service, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Системный промпт подробного протокола (LLM_PROTOCOL=verbose)
+SYSTEM_PROMPT = (
+    "You are a professional realtor. "
+    "Extract the following real estate features from the user's input and make sure values are in Russian and return them as a Python dictionary:\n\n"
+    "{ 'rooms': value, 'adress': value, 'price': value, 'city_region': value, 'floor': value, 'area': value, 'kitchen_studio': value,"
+    " 'apartment_condition': value, 'is_apartment_has_furniture(full or no)': value, 'is_previously_dormitory': value, 'security': value,"
+    " 'furniture_detailed': value, 'facilities': value, 'bathroom': value, 'zhiloi_complex': value, 'house_year': value,"
+    " 'parking': value, 'is_separated_toilet': value, 'toilet_count': value, 'description': value }\n\n"
+    "If any information is missing, replace it with 'No Information'. Ensure the response is a properly formatted JSON string without any markdown formatting."
+)
+
+def build_messages(client_prompt):
+    """Сообщения чата для запроса к LLM по текущему протоколу"""
+    from src.llm_protocol import COMPACT_SYSTEM_PROMPT
+    system_prompt = COMPACT_SYSTEM_PROMPT if LLM_PROTOCOL == "compact" else SYSTEM_PROMPT
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": client_prompt},
+    ]
+
+def llm_request_options():
+    """Параметры вызова chat.completions: поток с числом токенов, для compact - режим JSON и лимит ответа"""
+    from src.llm_protocol import request_options
+    return request_options(LLM_PROTOCOL, json_mode=LLM_JSON_MODE, max_tokens=LLM_MAX_TOKENS)
+
+# Функция запроса к LLM для извлечения признаков недвижимости.
+# Ответ читается потоком; parser (IncrementalJSONParser) получает поля по мере поступления.
+# None при ошибке запроса, обрыве потока или ответе, оборванном лимитом LLM_MAX_TOKENS:
+# уже полученные parser поля неполные
+def get_real_estate_details(client_prompt, parser=None):
+    from src.llm_protocol import read_completion
     try:
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[
-                {"role": "system", "content": (
-                    "You are a professional realtor. "
-                    "Extract the following real estate features from the user's input and make sure values are in Russian and return them as a Python dictionary:\n\n"
-                    "{ 'rooms': value, 'adress': value, 'price': value, 'city_region': value, 'floor': value, 'area': value, 'kitchen_studio': value,"
-                    " 'apartment_condition': value, 'is_apartment_has_furniture(full or no)': value, 'is_previously_dormitory': value, 'security': value,"
-                    " 'furniture_detailed': value, 'facilities': value, 'bathroom': value, 'zhiloi_complex': value, 'house_year': value,"
-                    " 'parking': value, 'is_separated_toilet': value, 'toilet_count': value, 'description': value }\n\n"
-                    "If any information is missing, replace it with 'No Information'. Ensure the response is a properly formatted JSON string without any markdown formatting."
-                )},
-                {"role": "user", "content": client_prompt},
-            ],
-            stream=False
-        )
-        return response.choices[0].message.content
+        with metrics.timed("llm"):
+            start = time.perf_counter()
+            stream = service.client.chat.completions.create(
+                model=LLM_MODEL,
+                messages=build_messages(client_prompt),
+                stream=True,
+                **llm_request_options()
+            )
+            return read_completion(stream, parser, service.llm_usage, LLM_PROTOCOL, start)
     except Exception as e:
         print(f"Ошибка при запросе к API: {e}")
-        return "{}"
+        return None
 
 # Функция для извлечения JSON из строки
 def extract_json_from_string(response_str):
@@ -81,135 +248,149 @@ def extract_json_from_string(response_str):
         print(f"Ошибка декодирования JSON: {json_str}")
         return {"error": "Invalid JSON format"}
 
+# Признаки простого запроса без обращения к LLM или None, если уверенность мала
+def extract_features_locally(client_prompt):
+    extractor = service.fast_extractor
+    if extractor is None:
+        return None
+    with metrics.timed("fast_extract"):
+        return extractor.try_extract(client_prompt, FAST_EXTRACT_MIN_CONFIDENCE)
+
+# Все признаки, которые удалось разобрать локально, без порога уверенности - для
+# предварительной выдачи, пока отвечает LLM (пустой словарь, если извлекатель выключен)
+def preliminary_features(client_prompt):
+    extractor = service.fast_extractor
+    if extractor is None:
+        return {}
+    with metrics.timed("fast_extract"):
+        return extractor.extract(client_prompt)[0]
+
+# Извлечение признаков из запроса с кэшированием ответа LLM
+def extract_real_estate_features(client_prompt):
+    local_features = extract_features_locally(client_prompt)
+    if local_features is not None:
+        return local_features
+    return extract_features_with_llm(client_prompt)
+
+# Извлечение признаков через кэш и LLM, без локального разбора;
+# on_field(ключ, значение) вызывается для каждого признака, как только он получен из потока
+def extract_features_with_llm(client_prompt, on_field=None):
+    from src.llm_protocol import IncrementalJSONParser, parse_features
+    key = prompt_key(client_prompt)
+    cached = service.llm_cache.get(key)
+    if cached is not None:
+        return dict(cached)
+
+    parser = IncrementalJSONParser(on_field)
+    formatted_response = get_real_estate_details(client_prompt, parser)
+    if formatted_response is None:
+        # Поток оборвался или упёрся в лимит токенов: частично разобранные поля не возвращаем и не кэшируем
+        return {"error": "LLM request failed"}
+    with metrics.timed("json_parse"):
+        real_estate_dict = parse_features(formatted_response, parser)
+    # Ошибки не кэшируем, чтобы следующий запрос снова обратился к LLM
+    if "error" not in real_estate_dict:
+        service.llm_cache.set(key, real_estate_dict)
+    return real_estate_dict
+
+# Асинхронный вариант: общий лимит параллельных вызовов LLM, таймаут и объединение
+# одинаковых одновременных запросов в один вызов
+async def extract_real_estate_features_async(client_prompt):
+    from src.llm_protocol import parse_features
+    local_features = extract_features_locally(client_prompt)
+    if local_features is not None:
+        return local_features
+
+    key = prompt_key(client_prompt)
+    cached = service.llm_cache.get(key)
+    if cached is not None:
+        return dict(cached)
+
+    try:
+        with metrics.timed("llm"):
+            formatted_response = await service.llm_gateway.complete(build_messages(client_prompt), key)
+    except Exception as e:
+        # Таймаут или ошибка API: возвращаем ошибку, а не пустой словарь, чтобы её не кэшировать
+        print(f"Ошибка при запросе к API: {e!r}")
+        return {"error": repr(e)}
+    with metrics.timed("json_parse"):
+        real_estate_dict = parse_features(formatted_response)
+    if "error" not in real_estate_dict:
+        service.llm_cache.set(key, real_estate_dict)
+    return real_estate_dict
+
 # Подсчёт схожести по признакам
-def calculate_similarity_score(df, feature_dict, user_prompt):
-    similarity_scores = []
+def calculate_similarity_score(df, feature_dict, user_prompt, description_index=None):
     if df.empty:
         return []
-        
-    # Если DataFrame содержит URL в первом столбце, пропускаем его
-    data_df = df.iloc[:, 1:] if 'url' in df.columns else df
-
-    # Определяем важные признаки и их веса
-    key_features = {
-        'price': 3.0,      # Цена - очень важный параметр
-        'rooms': 5.0,      # Количество комнат - критически важный параметр
-        'city_region': 3.0, # Район - критически важный параметр
-        'description': 0.5 # Описание - важный параметр
-    }
-    
-    # Стандартный вес для остальных признаков
-    default_weight = 1.0
-    
-    # Дополнительный фактор для улицы (будем проверять как часть адреса)
-    street_bonus = 5.0
-
-    # Отбираем релевантные признаки (исключаем с 'No Information')
-    relevant_features = [col for col in data_df.columns if 
-                         col in feature_dict and 
-                         feature_dict.get(col, "No Information") != "No Information" and 
-                         col != "description"]
-    
-    # Проверяем, есть ли информация об улице в запросе
-    street_info = None
-    if 'adress' in feature_dict and feature_dict['adress'] != "No Information":
-        street_info = feature_dict['adress'].lower()
-    
-    for index, row in data_df.iterrows():
-        # Базовая оценка - начинаем с 0.2 (20% совпадения по умолчанию)
-        base_score = 0.2
-        feature_similarity = 0
-        feature_weights_sum = 0
-        total_score = 0
-        
-        # Проверяем точные совпадения по ключевым параметрам
-        exact_matches = 0
-        key_features_count = 0
-        
-        # 1. Проверка совпадения по комнатам
-        if 'rooms' in relevant_features and 'rooms' in row:
-            key_features_count += 1
-            row_rooms = str(row.get('rooms', "")).strip()
-            dict_rooms = str(feature_dict.get('rooms', "")).strip()
-            
-            if row_rooms and dict_rooms and row_rooms == dict_rooms:
-                exact_matches += 1
-                # Бонус за точное совпадение комнат
-                base_score += 0.2
-        
-        # 2. Проверка совпадения по району
-        if 'city_region' in relevant_features and 'city_region' in row:
-            key_features_count += 1
-            row_region = str(row.get('city_region', "")).lower().strip()
-            dict_region = str(feature_dict.get('city_region', "")).lower().strip()
-            
-            # Проверяем вхождение района
-            if row_region and dict_region and (dict_region in row_region or row_region in dict_region):
-                exact_matches += 1
-                # Бонус за совпадение района
-                base_score += 0.2
-        
-        # 3. Проверка совпадения по улице (в адресе)
-        if street_info and 'adress' in row:
-            row_address = str(row.get('adress', "")).lower().strip()
-            if row_address and street_info in row_address:
-                # Значительный бонус за совпадение улицы
-                base_score += 0.3
-        
-        # Если есть хотя бы одно точное совпадение по ключевым параметрам, 
-        # увеличиваем базовую оценку
-        if exact_matches > 0:
-            base_score = max(base_score, 0.3 + (exact_matches / key_features_count) * 0.4)
-        
-        # TF-IDF для признаков с учетом весов
-        if relevant_features:
-            try:
-                weighted_similarities = []
-                
-                for feature in relevant_features:
-                    # Получаем вес для текущего признака
-                    weight = key_features.get(feature, default_weight)
-                    feature_weights_sum += weight
-                    
-                    # Создаем отдельные векторы для текущего признака
-                    feature_vectorizer = TfidfVectorizer()
-                    row_value = str(row.get(feature, ""))
-                    dict_value = str(feature_dict.get(feature, ""))
-                    
-                    if row_value.strip() and dict_value.strip():
-                        tfidf_matrix = feature_vectorizer.fit_transform([dict_value, row_value])
-                        similarity = cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:2])[0][0]
-                        weighted_similarities.append(similarity * weight)
-                
-                # Считаем средневзвешенное значение
-                if feature_weights_sum > 0 and weighted_similarities:
-                    feature_similarity = sum(weighted_similarities) / feature_weights_sum
-                    feature_similarity = feature_similarity * 0.5  # Вклад TF-IDF в общую оценку - 50%
-                    
-            except Exception as e:
-                print(f"Ошибка при расчете схожести признаков: {str(e)}")
-
-        # TF-IDF для описания (с меньшим весом)
-        description_similarity = 0
-        if "description" in data_df.columns:
-            try:
-                description_text = str(row.get("description", ""))
-                if description_text.strip() and user_prompt.strip():
-                    desc_vectorizer = TfidfVectorizer()
-                    tfidf_desc_matrix = desc_vectorizer.fit_transform([user_prompt, description_text])
-                    description_similarity = cosine_similarity(tfidf_desc_matrix[0:1], tfidf_desc_matrix[1:2])[0][0] * 0.3 # Меньший вес для описания
-            except Exception as e:
-                print(f"Ошибка при расчете схожести описания: {str(e)}")
-
-        # Общий результат - сумма базовой оценки, TF-IDF оценки признаков и оценки описания
-        total_score = base_score + feature_similarity + description_similarity
-        
-        # Нормализация оценки до диапазона 0-1
-        total_score = min(total_score, 1.0)
-        
-        similarity_scores.append(total_score)
+    from src.scoring import score_listings
+    # Бонусы за комнаты, район и улицу и TF-IDF схожесть считаются по столбцам целиком
+    with metrics.timed("scoring"):
+        return score_listings(df, feature_dict, user_prompt, description_index)
+
+# Признаки для нескольких запросов: вызовы LLM идут параллельно через асинхронный шлюз
+def extract_features_many(prompts):
+    async def extract_all():
+        return await asyncio.gather(*(extract_real_estate_features_async(prompt) for prompt in prompts))
+    return asyncio.run(extract_all()) if prompts else []
+
+# Рекомендации для пакета запросов одной матрицей оценок (запросы x объявления)
+def recommend_batch(df, queries, k=10, description_index=None, batch_size=64, result_cache=None,
+                    catalogue_version=None, numeric=None, hard_filter=False, max_cells=BATCH_MAX_CELLS):
+    """
+    queries - тексты запросов или словари {"user_input": текст, "features": признаки};
+    признаки без текста тоже допустимы. Для текстов без признаков они извлекаются
+    параллельно. Возвращает список (номера строк, оценки, признаки) в порядке
+    запросов; если признаки извлечь не удалось, номера пустые, а в признаках есть "error".
+    result_cache (ResultCache) хранит уже посчитанные top-k между вызовами; ключи
+    строятся по catalogue_version (по умолчанию - текущей версии кэша).
+    numeric - готовые числовые столбцы (StructuredIndex.numeric); при hard_filter=True
+    в результаты не попадают объявления вне числовых диапазонов запроса.
+    Запросы оцениваются частями не больше batch_size и не больше max_cells ячеек
+    матрицы (запросы x объявления), так что память не растёт с размером пакета.
+    """
+    import numpy as np
+    from src.scoring import score_listings_batch, top_k_batch
+    prompts, features = [], []
+    for query in queries:
+        if isinstance(query, str):
+            query = {"user_input": query}
+        prompts.append(str(query.get("user_input") or ""))
+        features.append(query.get("features"))
+
+    missing = [j for j, fd in enumerate(features) if fd is None]
+    for j, fd in zip(missing, extract_features_many([prompts[j] for j in missing])):
+        features[j] = fd
 
-    return similarity_scores
+    results = [(np.array([], dtype=np.int64), np.array([]), fd) for fd in features]
+    valid = [j for j, fd in enumerate(features) if "error" not in fd]
+    keys = {}
+    if result_cache is not None:
+        from src.result_cache import result_key
+        version = catalogue_version or result_cache.version
+        for j in list(valid):
+            keys[j] = result_key(features[j], prompts[j], version, k, mode="exact+filter" if hard_filter else "exact",
+                                 columns=df.columns)
+            cached = result_cache.get(keys[j])
+            if cached is not None:
+                results[j] = (np.array(cached[0], dtype=np.int64), np.array(cached[1]), features[j])
+                valid.remove(j)
+    # Запросы обрабатываются частями, чтобы матрица оценок помещалась в память
+    batch_size = max(1, min(batch_size, max_cells // max(len(df), 1)))
+    for start in range(0, len(valid), batch_size):
+        chunk = valid[start:start + batch_size]
+        with metrics.timed("batch_scoring"):
+            scores = score_listings_batch(df, [features[j] for j in chunk], [prompts[j] for j in chunk],
+                                          description_index, numeric, hard_filter)
+        with metrics.timed("top_k"):
+            positions, top_scores = top_k_batch(scores, k)
+        for i, j in enumerate(chunk):
+            # Отфильтрованные строки имеют оценку 0, у остальных она не ниже 0.2
+            keep = top_scores[i] > 0 if hard_filter else slice(None)
+            results[j] = (positions[i][keep], top_scores[i][keep], features[j])
+            if j in keys:
+                result_cache.set(keys[j], *results[j][:2])
+    return results
 
 # Функция для красивого вывода результатов
 def print_detailed_results(df_sorted, client_input, extracted_features, top_n=3):
@@ -284,11 +465,13 @@ client_input = (
     "Ищу 2-комнатную квартиру в Алматы, Алмалинский район, желательно по улице Айтеки би")
 
 if __name__ == "__main__":
+    # Инициализируем colorama для цветного вывода
+    colorama.init()
+    df = service.df
     if not df.empty:
         # Получение признаков из LLM
         print(f"{Fore.CYAN}Анализ запроса пользователя...{Style.RESET_ALL}")
-        formatted_response = get_real_estate_details(client_input)
-        real_estate_dict = extract_json_from_string(formatted_response)
+        real_estate_dict = extract_real_estate_features(client_input)
         
         if "error" not in real_estate_dict:
             # Вычисление схожести и сортировка
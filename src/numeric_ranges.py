@@ -0,0 +1,127 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# Числовые признаки и масштаб затухания оценки за пределами диапазона запроса:
+# relative - доля границы диапазона (цена 200 000 -> 30 000), иначе - в единицах признака
+NUMERIC_FEATURES = {
+    "price": {"scale": 0.15, "relative": True},
+    "area": {"scale": 0.15, "relative": True},
+    "floor": {"scale": 2.0, "relative": False},
+}
+
+_NUMBER_RE = re.compile(r"(\d[\d ]*(?:[.,]\d+)?)\s*(млн|тыс\w*|к\b|k\b)?")
+_UPPER_RE = re.compile(r"(?:\bдо|\bне\s+(?:дороже|больше|более|выше)|\bмакс\w*|\bменьше|\bменее|\bдешевле|\bниже|<|≤)\s*$")
+_LOWER_RE = re.compile(r"(?:\bот|\bне\s+(?:дешевле|меньше|менее|ниже)|\bмин\w*|\bбольше|\bболее|\bдороже|\bвыше|>|≥)\s*$")
+_BETWEEN_RE = re.compile(r"^\s*(?:-|–|—|\.\.\.?|до)\s*$")
+
+
+def _number(text, unit=None):
+    value = float(text.replace(" ", "").replace(",", "."))
+    if unit == "млн":
+        value *= 1_000_000
+    elif unit:
+        value *= 1000
+    return value
+
+
+def parse_numeric_range(value):
+    """
+    Диапазон (нижняя, верхняя граница) из значения признака: 'до 200 000' -> (None, 200000),
+    '50-60 м²' -> (50, 60), 'от 3' -> (3, None), '150000' -> (150000, 150000).
+    None, если числа в значении нет (тогда признак сравнивается как текст).
+    """
+    if isinstance(value, (int, float, np.integer, np.floating)) and not isinstance(value, bool):
+        return None if np.isnan(value) else (float(value), float(value))
+    text = str(value).lower().replace("\xa0", " ").replace("ё", "е")
+    matches = list(_NUMBER_RE.finditer(text))
+    if not matches:
+        return None
+    first = _number(matches[0].group(1).strip(), matches[0].group(2))
+    if len(matches) > 1 and _BETWEEN_RE.match(text[matches[0].end():matches[1].start()]):
+        second = _number(matches[1].group(1).strip(), matches[1].group(2) or matches[0].group(2))
+        # '200-250 тыс': единица второго числа относится к обоим
+        if matches[1].group(2) and not matches[0].group(2):
+            first = _number(matches[0].group(1).strip(), matches[1].group(2))
+        return min(first, second), max(first, second)
+    before = text[:matches[0].start()]
+    if _UPPER_RE.search(before):
+        return None, first
+    if _LOWER_RE.search(before):
+        return first, None
+    return first, first
+
+
+def numeric_column(series):
+    """Первое число из значений столбца ('45 м²' -> 45.0, '3 из 9' -> 3.0), NaN если числа нет"""
+    if pd.api.types.is_numeric_dtype(series):
+        return series.to_numpy(dtype=np.float64)
+    # Разбираются только уникальные значения
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    text = pd.Series([str(value) for value in uniques], dtype=object).str.replace("\xa0", "").str.replace(" ", "")
+    parsed = pd.to_numeric(text.str.extract(r"(\d+(?:[.,]\d+)?)")[0].str.replace(",", "."),
+                           errors="coerce").to_numpy(dtype=np.float64)
+    return parsed[codes] if len(parsed) else np.full(len(series), np.nan)
+
+
+def numeric_bounds(feature_dict, features):
+    """Диапазоны запроса для числовых признаков из features, значения которых удалось разобрать"""
+    bounds = {}
+    for feature in features:
+        value = feature_dict.get(feature, "No Information")
+        if feature in NUMERIC_FEATURES and value != "No Information":
+            parsed = parse_numeric_range(value)
+            if parsed is not None:
+                bounds[feature] = parsed
+    return bounds
+
+
+def _scale(feature, bound):
+    config = NUMERIC_FEATURES[feature]
+    return config["scale"] * max(abs(bound), 1.0) if config["relative"] else config["scale"]
+
+
+def numeric_similarity(values, bounds, feature):
+    """
+    Схожесть значений с диапазоном запроса: 1 внутри диапазона, за его пределами
+    экспоненциально убывает с расстоянием до границы; 0 для строк без значения
+    """
+    low, high = bounds
+    distance = np.zeros(len(values))
+    with np.errstate(invalid="ignore"):
+        if low is not None:
+            distance += np.maximum(low - values, 0.0) / _scale(feature, low)
+        if high is not None:
+            distance += np.maximum(values - high, 0.0) / _scale(feature, high)
+        similarity = np.exp(-distance)
+    return np.where(np.isnan(values), 0.0, similarity)
+
+
+def filter_window(bounds, feature):
+    """Границы жёсткого фильтра: диапазон как есть, одиночное значение - плюс-минус масштаб"""
+    low, high = bounds
+    if low is not None and low == high:
+        return low - _scale(feature, low), high + _scale(feature, high)
+    return low, high
+
+
+def numeric_filter_mask(values_by_feature, bounds):
+    """
+    Строки, проходящие жёсткий фильтр по всем числовым признакам запроса.
+    Строки без значения признака не отбрасываются: о них ничего не известно.
+    """
+    mask = None
+    for feature, feature_bounds in bounds.items():
+        values = values_by_feature[feature]
+        low, high = filter_window(feature_bounds, feature)
+        keep = np.isnan(values)
+        with np.errstate(invalid="ignore"):
+            inside = np.ones(len(values), dtype=bool)
+            if low is not None:
+                inside &= values >= low
+            if high is not None:
+                inside &= values <= high
+        keep |= inside
+        mask = keep if mask is None else mask & keep
+    return mask
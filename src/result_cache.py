@@ -0,0 +1,180 @@
+import hashlib
+import json
+import os
+import threading
+from collections import Counter, OrderedDict
+
+from sklearn.feature_extraction.text import CountVectorizer
+
+# Примерный размер записи без учёта top-k: ключ, кортеж, служебные поля OrderedDict
+_ENTRY_OVERHEAD = 256
+# Байт на один результат: номер строки и оценка
+_BYTES_PER_RESULT = 16
+
+# Токенизация как у TF-IDF описаний
+_analyzer = CountVectorizer().build_analyzer()
+
+
+def canonical_features(feature_dict, columns=None):
+    """
+    Признаки, влияющие на оценку, в каноническом виде: без 'No Information' и
+    описания, только столбцы каталога (если columns задан), значения как str()
+    """
+    return {key: str(value) for key, value in sorted(feature_dict.items(), key=lambda item: str(item[0]))
+            if value != "No Information" and key != "description" and (columns is None or key in columns)}
+
+
+def prompt_terms(user_prompt):
+    """Термины запроса с частотами - всё, что использует TF-IDF описаний"""
+    return sorted(Counter(_analyzer(user_prompt or "")).items())
+
+
+def normalized_prompt(user_prompt):
+    """Текст запроса без лишних пробелов - то, что видят кодировщики векторов описаний"""
+    return " ".join((user_prompt or "").split())
+
+
+def result_key(feature_dict, user_prompt, catalogue_version, k, mode="search", columns=None):
+    """
+    Ключ кэша результатов: признаки, термины запроса, версия каталога, k и режим поиска.
+    В режиме dense кодировщик учитывает пунктуацию, короткие токены и порядок слов,
+    поэтому вместо терминов в ключ входит сам текст запроса.
+    """
+    prompt = normalized_prompt(user_prompt) if mode.startswith("dense") else prompt_terms(user_prompt)
+    payload = json.dumps([canonical_features(feature_dict, columns), prompt, k, mode],
+                         ensure_ascii=False, separators=(",", ":"))
+    return f"{catalogue_version}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+
+class ResultCache:
+    """
+    Кэш ранжированных результатов (номера строк и оценки top-k) с LRU-вытеснением
+    по оценке занимаемой памяти. Ключ содержит версию каталога, поэтому после
+    перезагрузки каталога старые записи не используются, а set_version() их удаляет.
+    При указании redis_url записи дополнительно хранятся в Redis (или совместимом
+    хранилище) и общие для всех процессов сервера. Клиент Redis создаётся в каждом
+    процессе при первом обращении, чтобы обработчики serve.py не делили соединения,
+    открытые до fork.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, redis_url=None, redis_ttl=3600, prefix="realtor:topk:"):
+        self.max_bytes = max_bytes
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.redis_hits = 0
+        self.redis_errors = 0
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._redis_url = None
+        self._redis_from_url = None
+        self._redis = None
+        self._redis_pid = None
+        self._redis_ttl = redis_ttl
+        self._prefix = prefix
+        if redis_url:
+            try:
+                import redis
+                self._redis_from_url = redis.Redis.from_url
+                self._redis_url = redis_url
+            except ImportError:
+                print("Пакет redis не установлен, кэш результатов только в памяти процесса")
+
+    def _client(self):
+        """Клиент Redis текущего процесса; None без redis_url"""
+        if self._redis_url is None:
+            return None
+        pid = os.getpid()
+        if self._redis_pid != pid:
+            with self._lock:
+                if self._redis_pid != pid:
+                    self._redis = self._redis_from_url(self._redis_url, socket_timeout=0.2,
+                                                       socket_connect_timeout=0.2)
+                    self._redis_pid = pid
+        return self._redis
+
+    @staticmethod
+    def _entry_size(key, positions):
+        return _ENTRY_OVERHEAD + len(key) + _BYTES_PER_RESULT * len(positions)
+
+    def set_version(self, version):
+        """Новая версия каталога: записи предыдущей версии удаляются из памяти"""
+        with self._lock:
+            if version != self.version:
+                self._data.clear()
+                self._bytes = 0
+                self.version = version
+
+    def _store(self, key, value):
+        if key in self._data:
+            self._bytes -= self._entry_size(key, self._data.pop(key)[0])
+        self._data[key] = value
+        self._bytes += self._entry_size(key, value[0])
+        while self._bytes > self.max_bytes and self._data:
+            old_key, old_value = self._data.popitem(last=False)
+            self._bytes -= self._entry_size(old_key, old_value[0])
+            self.evictions += 1
+
+    def get(self, key):
+        """(номера строк, оценки) или None"""
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+        client = self._client()
+        if client is not None:
+            try:
+                raw = client.get(self._prefix + key)
+            except Exception:
+                raw = None
+                self.redis_errors += 1
+            if raw is not None:
+                value = tuple(json.loads(raw))
+                with self._lock:
+                    self._store(key, value)
+                    self.hits += 1
+                    self.redis_hits += 1
+                return value
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, positions, scores):
+        value = ([int(p) for p in positions], [float(s) for s in scores])
+        with self._lock:
+            self._store(key, value)
+        client = self._client()
+        if client is not None:
+            try:
+                client.set(self._prefix + key, json.dumps(value), ex=self._redis_ttl)
+            except Exception:
+                self.redis_errors += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+                "version": self.version,
+                "redis": self._redis_url is not None,
+                "redis_hits": self.redis_hits,
+                "redis_errors": self.redis_errors,
+            }
@@ -0,0 +1,440 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer
+
+from src.numeric_ranges import numeric_bounds, numeric_column, numeric_filter_mask, numeric_similarity
+
+# Веса важных признаков (остальные признаки получают DEFAULT_WEIGHT)
+KEY_FEATURE_WEIGHTS = {
+    'price': 3.0,       # Цена - очень важный параметр
+    'rooms': 5.0,       # Количество комнат - критически важный параметр
+    'city_region': 3.0, # Район - критически важный параметр
+    'description': 0.5  # Описание - важный параметр
+}
+DEFAULT_WEIGHT = 1.0
+
+# IDF термина, встречающегося только в одном из двух документов
+# (smooth_idf: ln((1 + 2) / (1 + 1)) + 1); у общего термина IDF равен 1
+_SINGLE_DOC_IDF = np.log(1.5) + 1.0
+
+# Анализатор с теми же настройками токенизации, что у TfidfVectorizer по умолчанию
+_analyzer = CountVectorizer().build_analyzer()
+
+
+def column_as_text(series):
+    """Возвращает коды и уникальные строковые значения столбца (str(x), как при iterrows)"""
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    return codes, [str(value) for value in uniques]
+
+
+def pairwise_tfidf_cosine(query, texts):
+    """
+    Косинусная схожесть query с каждым текстом, как если бы для каждой пары
+    вызывался TfidfVectorizer().fit_transform([query, text]).
+
+    Возвращает массив схожестей и маску пар, для которых TfidfVectorizer
+    выбросил бы ошибку пустого словаря (в обоих документах нет токенов).
+    """
+    similarity, empty_vocabulary = pairwise_tfidf_cosine_many([query], texts)
+    return similarity[:, 0], empty_vocabulary[:, 0]
+
+
+def pairwise_tfidf_cosine_many(queries, texts):
+    """
+    pairwise_tfidf_cosine сразу для нескольких запросов: тексты токенизируются
+    один раз, схожести считаются произведениями разреженных матриц.
+    Возвращает матрицы (тексты x запросы).
+    """
+    texts = list(texts)
+    n, q = len(texts), len(queries)
+    query_counts = []
+    for query in queries:
+        counts = {}
+        for token in _analyzer(query):
+            counts[token] = counts.get(token, 0) + 1
+        query_counts.append(counts)
+    query_has_tokens = np.array([bool(counts) for counts in query_counts], dtype=bool)
+
+    vectorizer = CountVectorizer()
+    try:
+        counts = vectorizer.fit_transform(texts).tocsr()
+    except ValueError:
+        # Ни в одном тексте нет токенов
+        return np.zeros((n, q)), np.tile(~query_has_tokens, (n, 1))
+
+    counts = counts.astype(np.float64)
+    row_tokens = np.diff(counts.indptr) > 0
+    empty_vocabulary = ~row_tokens[:, None] & ~query_has_tokens[None, :]
+
+    # Матрица запросов по словарю текстов: только общие с текстами термины
+    vocabulary = vectorizer.vocabulary_
+    rows, cols, values = [], [], []
+    for j, query in enumerate(query_counts):
+        for term, count in query.items():
+            if term in vocabulary:
+                rows.append(vocabulary[term])
+                cols.append(j)
+                values.append(count)
+    shared = sparse.csc_matrix((np.array(values, dtype=np.float64), (rows, cols)), shape=(counts.shape[1], q))
+
+    # У общих терминов IDF = 1, поэтому корректируем нормы обоих векторов
+    query_norm_sq = np.array([sum(c * c for c in query.values()) for query in query_counts],
+                             dtype=np.float64) * _SINGLE_DOC_IDF ** 2
+    row_norm_sq = np.asarray(counts.multiply(counts).sum(axis=1)).ravel() * _SINGLE_DOC_IDF ** 2
+    dot = (counts @ shared).toarray()
+    shared_query_sq = ((counts > 0).astype(np.float64) @ shared.multiply(shared)).toarray()
+    shared_row_sq = (counts.multiply(counts) @ (shared > 0).astype(np.float64)).toarray()
+    query_norm_sq = query_norm_sq[None, :] - shared_query_sq * (_SINGLE_DOC_IDF ** 2 - 1)
+    row_norm_sq = row_norm_sq[:, None] - shared_row_sq * (_SINGLE_DOC_IDF ** 2 - 1)
+
+    denominator = np.sqrt(np.clip(query_norm_sq, 0, None) * np.clip(row_norm_sq, 0, None))
+    similarity = np.divide(dot, denominator, out=np.zeros((n, q)), where=denominator > 0)
+    similarity[:, ~query_has_tokens] = 0.0
+    return np.clip(similarity, 0.0, 1.0), empty_vocabulary
+
+
+def column_tfidf_cosine(query, series):
+    """
+    pairwise_tfidf_cosine для столбца DataFrame: токенизирует только
+    уникальные значения и разворачивает результат обратно на все строки
+    """
+    codes, uniques = column_as_text(series)
+    similarity, empty_vocabulary = pairwise_tfidf_cosine(query, uniques)
+    non_blank = np.array([bool(value.strip()) for value in uniques], dtype=bool)
+    return similarity[codes], empty_vocabulary[codes], non_blank[codes]
+
+
+def _map_unique(series, func):
+    """Применяет func к каждому уникальному строковому значению столбца"""
+    codes, uniques = column_as_text(series)
+    return np.array([func(value) for value in uniques], dtype=bool)[codes]
+
+
+def relevant_features_for(columns, feature_dict):
+    """Признаки запроса, по которым считается TF-IDF (без 'No Information' и описания)"""
+    return [col for col in columns if
+            col in feature_dict and
+            feature_dict.get(col, "No Information") != "No Information" and
+            col != "description"]
+
+
+def street_from_features(feature_dict):
+    """Улица из запроса в нижнем регистре или None"""
+    if 'adress' in feature_dict and feature_dict['adress'] != "No Information":
+        return str(feature_dict['adress']).lower()
+    return None
+
+
+def structured_scores(data_df, feature_dict):
+    """Базовая оценка по комнатам, району и улице для всех строк сразу"""
+    relevant_features = relevant_features_for(data_df.columns, feature_dict)
+    base_score = np.full(len(data_df), 0.2)
+    exact_matches = np.zeros(len(data_df))
+    key_features_count = 0
+
+    # 1. Совпадение по комнатам
+    if 'rooms' in relevant_features:
+        key_features_count += 1
+        dict_rooms = str(feature_dict.get('rooms', "")).strip()
+        if dict_rooms:
+            matched = _map_unique(data_df['rooms'], lambda value: value.strip() == dict_rooms)
+            exact_matches += matched
+            base_score += 0.2 * matched
+
+    # 2. Совпадение по району (вхождение в любую сторону)
+    if 'city_region' in relevant_features:
+        key_features_count += 1
+        dict_region = str(feature_dict.get('city_region', "")).lower().strip()
+        if dict_region:
+            def region_matches(value):
+                row_region = value.lower().strip()
+                return bool(row_region) and (dict_region in row_region or row_region in dict_region)
+            matched = _map_unique(data_df['city_region'], region_matches)
+            exact_matches += matched
+            base_score += 0.2 * matched
+
+    # 3. Совпадение по улице (в адресе)
+    street_info = street_from_features(feature_dict)
+    if street_info and 'adress' in data_df.columns:
+        matched = _map_unique(data_df['adress'],
+                              lambda value: bool(value.lower().strip()) and street_info in value.lower().strip())
+        base_score += 0.3 * matched
+
+    # Хотя бы одно точное совпадение по ключевым параметрам повышает базовую оценку
+    if key_features_count:
+        boosted = 0.3 + (exact_matches / key_features_count) * 0.4
+        base_score = np.where(exact_matches > 0, np.maximum(base_score, boosted), base_score)
+    return base_score
+
+
+def _numeric_values(data_df, feature, numeric=None):
+    """Числовой столбец признака: из предрасчитанных numeric (по строкам data_df) или разбором строк"""
+    if numeric is not None and feature in numeric:
+        return numeric[feature]
+    return numeric_column(data_df[feature])
+
+
+def feature_scores(data_df, feature_dict, numeric=None):
+    """
+    Взвешенная схожесть признаков запроса (вклад до 0.5): TF-IDF для текстовых
+    признаков, близость к диапазону запроса для цены, площади и этажа.
+    numeric - предрасчитанные числовые столбцы (признак -> массив по строкам data_df).
+    """
+    relevant_features = relevant_features_for(data_df.columns, feature_dict)
+    n = len(data_df)
+    weights_sum = sum(KEY_FEATURE_WEIGHTS.get(f, DEFAULT_WEIGHT) for f in relevant_features)
+    if not relevant_features or weights_sum <= 0:
+        return np.zeros(n)
+
+    bounds = numeric_bounds(feature_dict, relevant_features)
+    weighted = np.zeros(n)
+    # Строки, для которых исходный построчный расчёт прерывался ошибкой пустого словаря
+    failed = np.zeros(n, dtype=bool)
+    for feature in relevant_features:
+        weight = KEY_FEATURE_WEIGHTS.get(feature, DEFAULT_WEIGHT)
+        dict_value = str(feature_dict.get(feature, ""))
+        if not dict_value.strip():
+            continue
+        if feature in bounds:
+            values = _numeric_values(data_df, feature, numeric)
+            weighted += numeric_similarity(values, bounds[feature], feature) * weight
+            continue
+        similarity, empty_vocabulary, non_blank = column_tfidf_cosine(dict_value, data_df[feature])
+        weighted += np.where(non_blank, similarity * weight, 0.0)
+        failed |= empty_vocabulary & non_blank
+
+    return np.where(failed, 0.0, weighted / weights_sum * 0.5)
+
+
+def numeric_filter_rows(data_df, feature_dict, numeric=None):
+    """
+    Номера строк, проходящих жёсткий фильтр по цене, площади и этажу запроса,
+    или None, если числовых ограничений в запросе нет
+    """
+    bounds = numeric_bounds(feature_dict, relevant_features_for(data_df.columns, feature_dict))
+    if not bounds:
+        return None
+    values = {feature: _numeric_values(data_df, feature, numeric) for feature in bounds}
+    return np.flatnonzero(numeric_filter_mask(values, bounds))
+
+
+def description_scores(data_df, user_prompt, description_index=None, rows=None):
+    """
+    TF-IDF схожесть запроса пользователя с описанием (вклад до 0.3).
+    С готовым индексом описаний считается одним произведением матрицы на вектор;
+    rows - номера строк индекса, которым соответствует data_df (по умолчанию все).
+    """
+    n = len(data_df)
+    if "description" not in data_df.columns or not user_prompt.strip():
+        return np.zeros(n)
+    if description_index is not None:
+        return description_index.query(user_prompt, rows) * 0.3
+    similarity, empty_vocabulary, non_blank = column_tfidf_cosine(user_prompt, data_df["description"])
+    return np.where(non_blank & ~empty_vocabulary, similarity * 0.3, 0.0)
+
+
+def _take_numeric(numeric, rows):
+    return {feature: values[rows] for feature, values in numeric.items()} if numeric is not None else None
+
+
+def score_listings(df, feature_dict, user_prompt, description_index=None, numeric=None, hard_filter=False):
+    """
+    Векторизованный подсчёт схожести всех объявлений с запросом.
+    Возвращает массив оценок в диапазоне 0-1 в порядке строк df.
+    description_index (DescriptionIndex по тем же строкам) заменяет попарный
+    TF-IDF описаний предобученным индексом, numeric (например, StructuredIndex.numeric) -
+    разбор чисел из строк цены, площади и этажа.
+    hard_filter=True исключает строки вне числовых диапазонов запроса до текстового
+    расчёта; их оценка 0 (у остальных строк она не ниже 0.2).
+    """
+    if df.empty:
+        return np.array([])
+
+    # Если DataFrame содержит URL в первом столбце, пропускаем его
+    data_df = df.iloc[:, 1:] if 'url' in df.columns else df
+
+    rows = numeric_filter_rows(data_df, feature_dict, numeric) if hard_filter else None
+    if rows is not None:
+        if not len(rows):
+            return np.zeros(len(data_df))
+        data_df, numeric = data_df.iloc[rows], _take_numeric(numeric, rows)
+
+    total_score = (structured_scores(data_df, feature_dict)
+                   + feature_scores(data_df, feature_dict, numeric)
+                   + description_scores(data_df, user_prompt, description_index, rows))
+    # Нормализация оценки до диапазона 0-1
+    total_score = np.minimum(total_score, 1.0)
+    if rows is None:
+        return total_score
+    scores = np.zeros(len(df))
+    scores[rows] = total_score
+    return scores
+
+
+def _match_unique_many(series, values, func):
+    """
+    Матрица (строки x запросы) значений func(значение строки, значение запроса);
+    func вызывается только для пар уникальных значений
+    """
+    codes, uniques = column_as_text(series)
+    distinct = list(dict.fromkeys(values))
+    position = {value: j for j, value in enumerate(distinct)}
+    matrix = np.array([[func(unique, value) for value in distinct] for unique in uniques],
+                      dtype=bool).reshape(len(uniques), len(distinct))
+    return matrix[codes][:, [position[value] for value in values]]
+
+
+def structured_scores_batch(data_df, feature_dicts):
+    """structured_scores для нескольких запросов: матрица (строки x запросы)"""
+    n, q = len(data_df), len(feature_dicts)
+    relevant = [relevant_features_for(data_df.columns, fd) for fd in feature_dicts]
+    base_score = np.full((n, q), 0.2)
+    exact_matches = np.zeros((n, q))
+    key_features_count = np.zeros(q)
+
+    def add(column, bonus, queries, values, func, key_feature=True):
+        if not queries:
+            return
+        matched = _match_unique_many(data_df[column], values, func)
+        if key_feature:
+            key_features_count[queries] += 1
+        for j, query in enumerate(queries):
+            # Пустое значение запроса учитывается в числе признаков, но бонуса не даёт
+            if values[j]:
+                if key_feature:
+                    exact_matches[:, query] += matched[:, j]
+                base_score[:, query] += bonus * matched[:, j]
+
+    # 1. Совпадение по комнатам
+    queries = [j for j in range(q) if 'rooms' in relevant[j]]
+    add('rooms', 0.2, queries, [str(feature_dicts[j].get('rooms', "")).strip() for j in queries],
+        lambda value, rooms: value.strip() == rooms)
+
+    # 2. Совпадение по району (вхождение в любую сторону)
+    queries = [j for j in range(q) if 'city_region' in relevant[j]]
+    add('city_region', 0.2, queries, [str(feature_dicts[j].get('city_region', "")).lower().strip() for j in queries],
+        lambda value, region: bool(value.lower().strip()) and
+        (region in value.lower().strip() or value.lower().strip() in region))
+
+    # 3. Совпадение по улице (в адресе)
+    if 'adress' in data_df.columns:
+        streets = [street_from_features(fd) for fd in feature_dicts]
+        queries = [j for j in range(q) if streets[j]]
+        add('adress', 0.3, queries, [streets[j] for j in queries],
+            lambda value, street: bool(value.lower().strip()) and street in value.lower().strip(),
+            key_feature=False)
+
+    # Хотя бы одно точное совпадение по ключевым параметрам повышает базовую оценку
+    with np.errstate(invalid="ignore", divide="ignore"):
+        boosted = 0.3 + (exact_matches / key_features_count) * 0.4
+    return np.where((key_features_count > 0) & (exact_matches > 0), np.maximum(base_score, boosted), base_score)
+
+
+def feature_scores_batch(data_df, feature_dicts, numeric=None):
+    """feature_scores для нескольких запросов: матрица (строки x запросы)"""
+    n, q = len(data_df), len(feature_dicts)
+    relevant = [relevant_features_for(data_df.columns, fd) for fd in feature_dicts]
+    bounds = [numeric_bounds(fd, features) for fd, features in zip(feature_dicts, relevant)]
+    weights_sum = np.array([sum(KEY_FEATURE_WEIGHTS.get(f, DEFAULT_WEIGHT) for f in features)
+                            for features in relevant])
+    weighted = np.zeros((n, q))
+    failed = np.zeros((n, q), dtype=bool)
+
+    for feature in dict.fromkeys(f for features in relevant for f in features):
+        weight = KEY_FEATURE_WEIGHTS.get(feature, DEFAULT_WEIGHT)
+        queries = [j for j in range(q) if feature in relevant[j] and str(feature_dicts[j].get(feature, "")).strip()]
+        # Числовые значения: близость к диапазону, по одному расчёту на различающийся диапазон
+        numeric_queries = [j for j in queries if feature in bounds[j]]
+        if numeric_queries:
+            column = _numeric_values(data_df, feature, numeric)
+            similarity = {b: numeric_similarity(column, b, feature)
+                          for b in dict.fromkeys(bounds[j][feature] for j in numeric_queries)}
+            for j in numeric_queries:
+                weighted[:, j] += similarity[bounds[j][feature]] * weight
+        queries = [j for j in queries if feature not in bounds[j]]
+        if not queries:
+            continue
+        values = [str(feature_dicts[j].get(feature, "")) for j in queries]
+        distinct = list(dict.fromkeys(values))
+        codes, uniques = column_as_text(data_df[feature])
+        # Один словарь уникальных значений столбца на все запросы пакета
+        similarity, empty_vocabulary = pairwise_tfidf_cosine_many(distinct, uniques)
+        non_blank = np.array([bool(value.strip()) for value in uniques], dtype=bool)[codes]
+        columns = [distinct.index(value) for value in values]
+        similarity, empty_vocabulary = similarity[codes][:, columns], empty_vocabulary[codes][:, columns]
+        weighted[:, queries] += np.where(non_blank[:, None], similarity * weight, 0.0)
+        failed[:, queries] |= empty_vocabulary & non_blank[:, None]
+
+    active = (weights_sum > 0) & np.array([bool(features) for features in relevant])
+    scores = np.divide(weighted, weights_sum, out=np.zeros((n, q)), where=active[None, :]) * 0.5
+    return np.where(failed, 0.0, scores)
+
+
+def description_scores_batch(data_df, user_prompts, description_index=None):
+    """
+    description_scores для нескольких запросов. С индексом описаний - одно
+    произведение матрицы документов на матрицу запросов.
+    """
+    n, q = len(data_df), len(user_prompts)
+    if "description" not in data_df.columns:
+        return np.zeros((n, q))
+    present = np.array([bool(prompt.strip()) for prompt in user_prompts], dtype=bool)
+    if description_index is not None:
+        query_matrix = description_index.vectorizer.transform(list(user_prompts))
+        scores = (description_index.matrix @ query_matrix.T).toarray() * 0.3
+    else:
+        codes, uniques = column_as_text(data_df["description"])
+        similarity, empty_vocabulary = pairwise_tfidf_cosine_many(list(user_prompts), uniques)
+        non_blank = np.array([bool(value.strip()) for value in uniques], dtype=bool)
+        scores = np.where(non_blank[:, None] & ~empty_vocabulary, similarity * 0.3, 0.0)[codes]
+    scores[:, ~present] = 0.0
+    return scores
+
+
+def score_listings_batch(df, feature_dicts, user_prompts, description_index=None, numeric=None,
+                         hard_filter=False):
+    """
+    score_listings для нескольких запросов сразу. Возвращает матрицу оценок
+    (запросы x объявления); строка j совпадает с score_listings(df, feature_dicts[j], user_prompts[j]).
+    При hard_filter=True строки вне числовых диапазонов запроса получают оценку 0
+    (текстовые произведения матриц общие для пакета и считаются по всем строкам).
+    """
+    if df.empty:
+        return np.zeros((len(feature_dicts), 0))
+    data_df = df.iloc[:, 1:] if 'url' in df.columns else df
+    total_score = (structured_scores_batch(data_df, feature_dicts)
+                   + feature_scores_batch(data_df, feature_dicts, numeric)
+                   + description_scores_batch(data_df, user_prompts, description_index))
+    total_score = np.minimum(total_score, 1.0)
+    if hard_filter:
+        for j, fd in enumerate(feature_dicts):
+            rows = numeric_filter_rows(data_df, fd, numeric)
+            if rows is not None:
+                keep = np.zeros(len(data_df), dtype=bool)
+                keep[rows] = True
+                total_score[~keep, j] = 0.0
+    return total_score.T
+
+
+def top_k_batch(scores, k):
+    """
+    Топ-k объявлений для каждой строки матрицы оценок (запросы x объявления):
+    по убыванию оценки, при равенстве - по порядку строк. Возвращает номера и оценки.
+    """
+    q, n = scores.shape
+    k = min(k, n)
+    if k == 0:
+        return np.zeros((q, 0), dtype=np.int64), np.zeros((q, 0))
+    positions, top_scores = [], []
+    for row in scores:
+        if n > k:
+            # Добираем строки с той же оценкой, что и k-я, чтобы порядок был детерминированным
+            threshold = row[np.argpartition(-row, k - 1)[:k]].min()
+            candidates = np.flatnonzero(row >= threshold)
+        else:
+            candidates = np.arange(n)
+        order = np.lexsort((candidates, -row[candidates]))[:k]
+        positions.append(candidates[order])
+        top_scores.append(row[candidates[order]])
+    return np.array(positions), np.array(top_scores)
@@ -0,0 +1,122 @@
+import collections
+import json
+import os
+import socket
+import threading
+import time
+
+# Пустая строка в канале - отметка flush(): все записи, отправленные до неё, уже на диске
+_FLUSH_MARK = b"\n"
+# Наибольший размер одной записи в канале
+_MAX_RECORD_BYTES = 1 << 18
+
+
+def _channel():
+    """
+    Канал от процессов к писателю. Датаграммы Unix-сокета доставляются целиком,
+    поэтому записи разных процессов не перемешиваются; без AF_UNIX (Windows, где
+    нет и serve.py) - обычная пара сокетов, записи разделяются переводом строки
+    """
+    if hasattr(socket, "AF_UNIX"):
+        return socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+    return socket.socketpair()
+
+
+class SearchLog:
+    """
+    Асинхронный журнал поисковых запросов в формате JSON Lines.
+    Записи передаются через сокет единственному фоновому потоку-писателю в процессе,
+    создавшем журнал, поэтому запрос пользователя не ждёт диска. Обработчики serve.py,
+    порождённые fork, наследуют сокет и отправляют записи писателю родителя: файл
+    один и ротируется в одном месте. Если писатель не успевает и буфер сокета
+    заполнен, записи отбрасываются. Файл ротируется по достижении max_bytes
+    (хранится backup_count старых файлов).
+    """
+
+    def __init__(self, path, max_bytes=10 * 1024 * 1024, backup_count=3):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.dropped = 0
+        self._owner_pid = os.getpid()
+        self._reader, self._sender = _channel()
+        self._sender.setblocking(False)
+        self._flush_waiters = collections.deque()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="search-log", daemon=True)
+        self._thread.start()
+        # Обработчикам, порождённым fork, читающий конец не нужен: пишет только родитель
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reader.close)
+
+    def log(self, user_input, features, results):
+        """Отправляет запись писателю; results - список (url, оценка)"""
+        record = {
+            "ts": time.time(),
+            "pid": os.getpid(),
+            "user_input": user_input,
+            "features": features,
+            "results": [{"url": url, "score": round(float(score), 6)} for url, score in results],
+        }
+        # json.dumps экранирует переводы строк внутри значений: одна запись - одна строка
+        line = (json.dumps(record, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+        if len(line) > _MAX_RECORD_BYTES:
+            self.dropped += 1
+            return
+        try:
+            self._sender.send(line)
+        except OSError:
+            # Буфер заполнен или писатель завершился
+            self.dropped += 1
+
+    def flush(self, timeout=None):
+        """
+        Ждёт, пока писатель запишет всё, что этот процесс отправил до вызова.
+        В обработчиках serve.py записи уже переданы родителю - возвращает True сразу.
+        """
+        if os.getpid() != self._owner_pid:
+            return True
+        done = threading.Event()
+        self._flush_waiters.append(done)
+        try:
+            self._sender.send(_FLUSH_MARK)
+        except OSError:
+            self._flush_waiters.remove(done)
+            return False
+        return done.wait(timeout)
+
+    def _rotate(self):
+        for i in range(self.backup_count - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def _write(self, line):
+        try:
+            if os.path.exists(self.path) and os.path.getsize(self.path) + len(line) > self.max_bytes:
+                self._rotate()
+            with open(self.path, "ab") as f:
+                f.write(line)
+        except Exception as e:
+            print(f"Ошибка записи журнала поиска: {e}")
+
+    def _run(self):
+        pending = b""
+        while True:
+            try:
+                data = self._reader.recv(_MAX_RECORD_BYTES)
+            except OSError:
+                return
+            if not data:
+                return
+            pending += data
+            while b"\n" in pending:
+                line, pending = pending.split(b"\n", 1)
+                if line:
+                    self._write(line + b"\n")
+                elif self._flush_waiters:
+                    self._flush_waiters.popleft().set()
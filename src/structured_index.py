@@ -0,0 +1,297 @@
+import re
+from collections import defaultdict
+
+import numpy as np
+
+from src.metrics import metrics
+from src.numeric_ranges import NUMERIC_FEATURES, filter_window, numeric_bounds, numeric_column
+from src.scoring import (column_as_text, relevant_features_for, street_from_features,
+                         structured_scores, feature_scores, description_scores, score_listings)
+
+# До такого размера каталога полный векторизованный перебор быстрее отбора по ярусам
+# (benchmarks/suite.py: около 5 мс у обоих на 5 000 строк, на 10 000 ярусы уже вдвое быстрее)
+FULL_SCAN_ROWS = 5000
+
+# Служебные слова адреса, не несущие информации об улице
+_STREET_STOPWORDS = {"ул", "улица", "пр", "проспект", "мкр", "микрорайон", "д", "дом", "кв"}
+
+
+def parse_district(region):
+    """Название района из city_region ('Алматы, Алатауский р-н' -> 'алатауский')"""
+    for part in str(region).lower().replace("ё", "е").split(","):
+        part = part.strip()
+        match = re.match(r"(.+?)\s*(?:р-н|район)\b", part)
+        if match:
+            return match.group(1).strip()
+    return None
+
+
+def normalize_street(address):
+    """Нормализованные токены улицы из адреса (без номеров домов и служебных слов)"""
+    tokens = re.findall(r"[^\W\d_]+", str(address).lower().replace("ё", "е"))
+    return [token for token in tokens if len(token) > 1 and token not in _STREET_STOPWORDS]
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class _SortedColumn:
+    """Отсортированные значения числового столбца для выборки диапазона за O(log N + k)"""
+
+    def __init__(self, values):
+        missing = np.isnan(values)
+        valid = np.flatnonzero(~missing)
+        order = np.argsort(values[valid], kind="stable")
+        self.rows = valid[order]
+        self.values = values[self.rows]
+        self.missing = np.flatnonzero(missing)
+
+    def range(self, low=None, high=None):
+        start = 0 if low is None else np.searchsorted(self.values, low, side="left")
+        stop = len(self.values) if high is None else np.searchsorted(self.values, high, side="right")
+        return np.sort(self.rows[start:stop])
+
+
+class StructuredIndex:
+    """
+    Инвертированные индексы по структурированным полям каталога: комнаты, район,
+    улица (триграммы адреса), отсортированные цена и площадь. Позволяют выбрать
+    кандидатов для запроса, не просматривая весь каталог.
+    catalogue (Catalogue по тем же строкам) даёт готовые типизированные столбцы:
+    числа и районы тогда не разбираются из строк заново.
+    """
+
+    def __init__(self, df, catalogue=None):
+        data_df = df.iloc[:, 1:] if 'url' in df.columns else df
+        self.size = len(data_df)
+        self.columns = set(data_df.columns)
+        if catalogue is not None and len(catalogue) != self.size:
+            catalogue = None
+
+        self.rooms = self._postings(data_df, 'rooms', lambda value: value.strip())
+        self.regions = self._postings(data_df, 'city_region', lambda value: value.lower().strip())
+        if catalogue is not None:
+            self.districts = self._code_postings(catalogue.typed("district_code"), catalogue.districts)
+        else:
+            self.districts = defaultdict(list)
+            for region, rows in self.regions.items():
+                district = parse_district(region)
+                if district:
+                    self.districts[district].append(rows)
+            self.districts = {name: np.unique(np.concatenate(parts)) for name, parts in self.districts.items()}
+
+        # Адреса хранятся по уникальным значениям, триграммы ссылаются на них
+        self.addresses = self._postings(data_df, 'adress', lambda value: value.lower().strip())
+        self._address_values = list(self.addresses)
+        self.street_tokens = defaultdict(list)
+        address_trigrams = defaultdict(list)
+        for address_id, address in enumerate(self._address_values):
+            for trigram in _trigrams(address):
+                address_trigrams[trigram].append(address_id)
+            for token in set(normalize_street(address)):
+                self.street_tokens[token].append(self.addresses[address])
+        self._address_trigrams = {t: np.array(ids) for t, ids in address_trigrams.items()}
+        self.street_tokens = {t: np.unique(np.concatenate(parts)) for t, parts in self.street_tokens.items()}
+
+        # Цена, площадь и этаж как числа: для оценки близости к диапазону запроса и жёсткого фильтра
+        if catalogue is not None:
+            self.numeric = {feature: values for feature, values in catalogue.numeric().items()
+                            if feature in data_df.columns}
+        else:
+            self.numeric = {feature: numeric_column(data_df[feature])
+                            for feature in NUMERIC_FEATURES if feature in data_df.columns}
+        self.sorted_numeric = {feature: _SortedColumn(values) for feature, values in self.numeric.items()}
+        self.price = self.sorted_numeric.get('price')
+        self.area = self.sorted_numeric.get('area')
+
+    @staticmethod
+    def _postings(data_df, column, normalize):
+        """Значение столбца (после normalize(str(x))) -> отсортированные номера строк"""
+        if column not in data_df.columns:
+            return {}
+        codes, uniques = column_as_text(data_df[column])
+        order = np.argsort(codes, kind="stable")
+        bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+        postings = defaultdict(list)
+        for code, value in enumerate(uniques):
+            postings[normalize(value)].append(order[bounds[code]:bounds[code + 1]])
+        return {key: np.sort(np.concatenate(parts)) for key, parts in postings.items()}
+
+    @staticmethod
+    def _code_postings(codes, names):
+        """Код категории (-1 - нет значения) -> отсортированные номера строк для каждого имени"""
+        codes = np.asarray(codes)
+        order = np.argsort(codes, kind="stable")
+        bounds = np.searchsorted(codes[order], np.arange(len(names) + 1))
+        return {name: order[bounds[code]:bounds[code + 1]] for code, name in enumerate(names)
+                if bounds[code + 1] > bounds[code]}
+
+    @staticmethod
+    def _union(parts):
+        parts = [p for p in parts if len(p)]
+        return np.unique(np.concatenate(parts)) if parts else np.array([], dtype=np.int64)
+
+    def rooms_rows(self, rooms):
+        rooms = str(rooms).strip()
+        return self.rooms.get(rooms, np.array([], dtype=np.int64)) if rooms else np.array([], dtype=np.int64)
+
+    def region_rows(self, region):
+        """Строки, где район совпадает с запросом по вхождению в любую сторону"""
+        region = str(region).lower().strip()
+        if not region:
+            return np.array([], dtype=np.int64)
+        return self._union([rows for key, rows in self.regions.items()
+                            if key and (region in key or key in region)])
+
+    def district_rows(self, region):
+        district = parse_district(region) or str(region).lower().replace("ё", "е").strip()
+        return self.districts.get(district, np.array([], dtype=np.int64))
+
+    def street_rows(self, street):
+        """Строки, адрес которых содержит street как подстроку (проверка по триграммам)"""
+        street = str(street).lower()
+        if not street:
+            return np.array([], dtype=np.int64)
+        trigrams = _trigrams(street)
+        if trigrams and all(t in self._address_trigrams for t in trigrams):
+            candidate_ids = None
+            for trigram in sorted(trigrams, key=lambda t: len(self._address_trigrams[t])):
+                ids = self._address_trigrams[trigram]
+                candidate_ids = ids if candidate_ids is None else np.intersect1d(candidate_ids, ids, assume_unique=True)
+            candidates = [self._address_values[i] for i in candidate_ids]
+        elif trigrams:
+            return np.array([], dtype=np.int64)
+        else:
+            candidates = self._address_values
+        return self._union([self.addresses[a] for a in candidates if a and street in a])
+
+    def street_token_rows(self, street):
+        """Строки, в адресе которых встречается хотя бы одно слово улицы из запроса"""
+        return self._union([self.street_tokens[t] for t in normalize_street(street) if t in self.street_tokens])
+
+    def price_rows(self, low=None, high=None):
+        return self.price.range(low, high) if self.price is not None else np.array([], dtype=np.int64)
+
+    def area_rows(self, low=None, high=None):
+        return self.area.range(low, high) if self.area is not None else np.array([], dtype=np.int64)
+
+    def numeric_filter_rows(self, feature_dict):
+        """
+        Строки в числовых диапазонах запроса (выборка по отсортированным столбцам);
+        строки без значения признака остаются. None, если числовых ограничений нет.
+        """
+        bounds = numeric_bounds(feature_dict, relevant_features_for(self.columns, feature_dict))
+        rows = None
+        for feature, feature_bounds in bounds.items():
+            column = self.sorted_numeric[feature]
+            feature_rows = np.union1d(column.range(*filter_window(feature_bounds, feature)), column.missing)
+            rows = feature_rows if rows is None else np.intersect1d(rows, feature_rows, assume_unique=True)
+        return rows
+
+    def candidates(self, feature_dict):
+        """
+        Строки, получающие бонус за комнаты, район или улицу, и дополнительные
+        кандидаты из того же района или с похожей улицей
+        """
+        relevant_features = relevant_features_for(self.columns, feature_dict)
+        scored, related = [], []
+        if 'rooms' in relevant_features:
+            scored.append(self.rooms_rows(feature_dict['rooms']))
+        if 'city_region' in relevant_features:
+            scored.append(self.region_rows(feature_dict['city_region']))
+            related.append(self.district_rows(feature_dict['city_region']))
+        street_info = street_from_features(feature_dict)
+        if street_info and 'adress' in self.columns:
+            scored.append(self.street_rows(street_info))
+            related.append(self.street_token_rows(street_info))
+        return self._union(scored), self._union(related)
+
+
+def _top_k(positions, scores, k):
+    """Топ-k по убыванию оценки (при равенстве - по порядку строк) через argpartition"""
+    if len(scores) > k:
+        part = np.argpartition(-scores, k - 1)[:k]
+        # Добираем строки с той же оценкой, что и k-я, чтобы порядок был детерминированным
+        threshold = scores[part].min()
+        part = np.flatnonzero(scores >= threshold)
+        positions, scores = positions[part], scores[part]
+    order = np.lexsort((positions, -scores))[:k]
+    return positions[order], scores[order]
+
+
+def search_top_k(df, feature_dict, user_prompt, k=10, structured_index=None,
+                 description_index=None, exact=False, hard_filter=False):
+    """
+    Поиск top-k объявлений с предварительным отбором кандидатов.
+
+    Кандидаты обрабатываются ярусами по убыванию структурной оценки; текстовая
+    схожесть считается только для обработанных ярусов, и поиск останавливается, как
+    только набрано k кандидатов. Это приближение: строка следующего яруса с высокой
+    текстовой схожестью может обойти последние строки выдачи.
+
+    exact=True и каталоги не больше FULL_SCAN_ROWS строк оцениваются одним полным
+    векторизованным перебором, результат совпадает с ранжированием score_listings.
+    Ярусы точный результат не ускоряют: базовая оценка любой строки не ниже 0.2, а
+    текстовый вклад до 0.8, поэтому верхняя граница оценки каждого яруса равна 1.
+    hard_filter=True оставляет только строки в числовых диапазонах запроса (цена,
+    площадь, этаж), поэтому результатов может быть меньше k. Возвращает номера строк
+    df и их оценки.
+    """
+    if df.empty:
+        return np.array([], dtype=np.int64), np.array([])
+    data_df = df.iloc[:, 1:] if 'url' in df.columns else df
+    if structured_index is None:
+        structured_index = StructuredIndex(df)
+
+    use_index = description_index is not None and "description" in data_df.columns and user_prompt.strip()
+    if exact or structured_index.size <= FULL_SCAN_ROWS:
+        scores = score_listings(df, feature_dict, user_prompt, description_index if use_index else None,
+                                numeric=structured_index.numeric, hard_filter=hard_filter)
+        allowed = structured_index.numeric_filter_rows(feature_dict) if hard_filter else None
+        positions = np.arange(len(scores)) if allowed is None else allowed
+        with metrics.timed("top_k"):
+            return _top_k(positions, scores[positions], k)
+
+    # Описания оценивает индекс: столбец не копируется при выборе строк, а объекты строк не затрагиваются
+    # (страницы каталога остаются общими для процессов-обработчиков serve.py)
+    score_df = data_df.drop(columns="description") if use_index else data_df
+
+    matched, related = structured_index.candidates(feature_dict)
+    # Жёсткий фильтр: строки вне диапазонов сразу помечаются просмотренными и не попадают ни в один ярус
+    seen = np.zeros(len(data_df), dtype=bool)
+    allowed = structured_index.numeric_filter_rows(feature_dict) if hard_filter else None
+    if allowed is not None:
+        seen[:] = True
+        seen[allowed] = False
+        matched, related = matched[~seen[matched]], related[~seen[related]]
+    base = structured_scores(score_df.iloc[matched], feature_dict) if len(matched) else np.array([])
+    # Ярусы: строки с бонусом по убыванию базовой оценки, затем связанные строки, затем остальные
+    tiers = [(level, matched[base == level]) for level in np.unique(base)[::-1]]
+    related = np.setdiff1d(related, matched, assume_unique=True)
+    rest_base = 0.2
+    if len(related):
+        tiers.append((rest_base, related))
+    seen[matched] = True
+    seen[related] = True
+    rest = np.flatnonzero(~seen)
+    if len(rest):
+        tiers.append((rest_base, rest))
+
+    positions = np.array([], dtype=np.int64)
+    scores = np.array([])
+    for level, rows in tiers:
+        sub_df = score_df.iloc[rows]
+        if use_index:
+            description = description_index.query(user_prompt, rows) * 0.3
+        else:
+            description = description_scores(sub_df, user_prompt)
+        numeric = {feature: values[rows] for feature, values in structured_index.numeric.items()}
+        tier_scores = np.minimum(structured_scores(sub_df, feature_dict)
+                                 + feature_scores(sub_df, feature_dict, numeric) + description, 1.0)
+        with metrics.timed("top_k"):
+            positions, scores = _top_k(np.concatenate([positions, rows]), np.concatenate([scores, tier_scores]), k)
+
+        if len(scores) >= k:
+            break
+    return positions, scores
@@ -0,0 +1,12 @@
+import os
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def app_module():
+    """app.py с каталогом data/apartments.csv, без фонового слежения за каталогом и журнала поиска"""
+    os.environ.setdefault("CATALOGUE_RELOAD_INTERVAL", "0")
+    os.environ.setdefault("SEARCH_LOG", "0")
+    import app
+    return app
@@ -0,0 +1,105 @@
+"""Прерванный обход продолжается с контрольной точки без дублей и пропусков в любом режиме"""
+import logging
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+import pytest
+
+from benchmarks.fixtures import listing_pages
+from src import apartments_scrap
+from src.dataset_writer import StreamingDatasetWriter
+
+PAGES = 3
+PER_PAGE = 5
+LISTINGS = dict((f"/a/show/{100 + i}", html) for i, (_, html) in enumerate(listing_pages(PAGES * PER_PAGE, seed=5)))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Страницы списка (?page=N) ссылаются на PER_PAGE объявлений каждая"""
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path in LISTINGS:
+            body = LISTINGS[url.path]
+        else:
+            page = int(parse_qs(url.query)["page"][0])
+            paths = list(LISTINGS)[(page - 1) * PER_PAGE:page * PER_PAGE]
+            body = "".join(f'<a class="a-card__title" href="{path[1:]}">{path}</a>' for path in paths).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Interrupted(KeyboardInterrupt):
+    pass
+
+
+class _StoppingWriter(StreamingDatasetWriter):
+    """Прерывает обход, когда передано stop_after объявлений"""
+
+    def __init__(self, *args, stop_after, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.seen = 0
+        self.stop_after = stop_after
+
+    def _count(self, count):
+        self.seen += count
+        if self.seen > self.stop_after:
+            raise _Interrupted()
+
+    def write(self, apartment, page, listing):
+        self._count(1)
+        super().write(apartment, page, listing)
+
+    def write_page(self, apartments, page):
+        self._count(len(apartments))
+        super().write_page(apartments, page)
+
+
+@pytest.fixture
+def base_link(monkeypatch):
+    # Без пауз между объявлениями и без записи в scraper.log
+    monkeypatch.setattr(apartments_scrap, "time", types.SimpleNamespace(sleep=lambda seconds: None, time=time.time))
+    root = logging.getLogger()
+    monkeypatch.setattr(root, "handlers", [h for h in root.handlers if not isinstance(h, logging.FileHandler)])
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, args=(0.05,), daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _scrape(concurrent, base_link, writer):
+    if concurrent:
+        apartments_scrap.scrape_concurrent(base_link, PAGES, writer, concurrency=4, rate=1000)
+    else:
+        apartments_scrap.scrape_sequential(base_link, PAGES, writer)
+
+
+@pytest.mark.parametrize("first, second", [(False, False), (False, True), (True, False), (True, True)],
+                         ids=["seq-seq", "seq-conc", "conc-seq", "conc-conc"])
+@pytest.mark.parametrize("stop_after", [3, 7])
+def test_resume_writes_every_listing_once(tmp_path, base_link, first, second, stop_after):
+    path, checkpoint = str(tmp_path / "apartments.csv"), str(tmp_path / "checkpoint.json")
+    writer = _StoppingWriter(path, checkpoint, batch_size=2, stop_after=stop_after)
+    with pytest.raises(_Interrupted):
+        _scrape(first, base_link, writer)
+    writer.close(complete=False)
+
+    writer = StreamingDatasetWriter(path, checkpoint, batch_size=2, resume=True)
+    assert writer.rows_written <= stop_after
+    _scrape(second, base_link, writer)
+    writer.close()
+
+    df = pd.read_csv(path, index_col=0)
+    assert list(df.index) == list(range(len(LISTINGS)))
+    assert sorted(df["url"]) == sorted(base_link + path[1:] for path in LISTINGS)
@@ -0,0 +1,82 @@
+"""/recommend/batch: ответы в порядке запросов, 400 на некорректный ввод, оценка частями ограниченного размера"""
+import numpy as np
+import pytest
+
+from src import scoring
+from src.scoring import score_listings, top_k_batch
+
+QUERIES = [
+    {"user_input": "Двушка в Бостандыкском районе", "features": {"rooms": "2", "city_region": "Бостандыкский р-н"}},
+    {"user_input": "Однокомнатная на Абая с мебелью", "features": {"rooms": "1", "adress": "Абая"}},
+    {"user_input": "трёшка до 300 тысяч", "features": {"rooms": "3", "price": "до 300000"}},
+    {"user_input": "квартира в Медеуском районе", "features": {"city_region": "Медеуский р-н"}},
+    {"user_input": "уютная квартира с видом на горы", "features": {}},
+]
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+def _expected_urls(snapshot, query, k):
+    scores = score_listings(snapshot.df, query["features"], query["user_input"], snapshot.description_index)
+    positions, _ = top_k_batch(scores[None, :], k)
+    return list(snapshot.df["url"].iloc[positions[0]])
+
+
+def test_batch_returns_top_k_in_query_order(app_module, client):
+    response = client.post("/recommend/batch", json={"queries": QUERIES, "k": 5})
+    assert response.status_code == 200
+    snapshot = app_module.reloader.current
+    assert [[item["url"] for item in entry["results"]] for entry in response.json] == \
+        [_expected_urls(snapshot, query, 5) for query in QUERIES]
+    assert [entry["features"] for entry in response.json] == [query["features"] for query in QUERIES]
+
+
+@pytest.mark.parametrize("body", [
+    {"queries": QUERIES, "k": "десять"},
+    {"queries": QUERIES, "k": None},
+    {"queries": QUERIES, "k": 0},
+    {"queries": QUERIES, "k": -3},
+    {"queries": QUERIES, "k": 10 ** 6},
+    {"queries": []},
+    {"queries": "двушка"},
+    {"queries": {"user_input": "двушка"}},
+    {"queries": [123]},
+    {"queries": [{"user_input": "двушка", "features": "rooms=2"}]},
+    {"queries": [{"user_input": ["двушка"]}]},
+    {},
+    ["двушка"],
+    "двушка",
+], ids=lambda body: repr(body)[:40])
+def test_batch_rejects_invalid_input(client, body):
+    assert client.post("/recommend/batch", json=body).status_code == 400
+
+
+def test_batch_rejects_oversized_batch(app_module, client, monkeypatch):
+    monkeypatch.setattr(app_module, "BATCH_MAX_QUERIES", 3)
+    assert client.post("/recommend/batch", json={"queries": QUERIES[:3]}).status_code == 200
+    assert client.post("/recommend/batch", json={"queries": QUERIES[:4]}).status_code == 400
+
+
+def test_batch_scores_in_bounded_chunks(app_module, monkeypatch):
+    from src.model import recommend_batch
+    df = app_module.reloader.current.df
+    full = recommend_batch(df, QUERIES * 4, k=5)
+
+    shapes = []
+    score_batch = scoring.score_listings_batch
+
+    def recording(df, feature_dicts, *args, **kwargs):
+        scores = score_batch(df, feature_dicts, *args, **kwargs)
+        shapes.append(scores.shape)
+        return scores
+
+    monkeypatch.setattr(scoring, "score_listings_batch", recording)
+    chunked = recommend_batch(df, QUERIES * 4, k=5, max_cells=3 * len(df))
+    assert [rows for rows, _ in shapes] == [3] * 6 + [2]
+    assert all(cells <= 3 * len(df) for cells in (rows * n for rows, n in shapes))
+    for (positions, scores, _), (expected_positions, expected_scores, _) in zip(chunked, full):
+        np.testing.assert_array_equal(positions, expected_positions)
+        np.testing.assert_allclose(scores, expected_scores)
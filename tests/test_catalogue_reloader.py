@@ -0,0 +1,74 @@
+"""CatalogueReloader: версия снимка и индексы соответствуют тем данным, которые загружены, даже если CSV меняется во время перезагрузки"""
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+from src import catalogue_reloader
+from src.catalogue import load_catalogue
+from src.catalogue_reloader import CatalogueReloader, CatalogueSnapshot
+from src.description_index import DescriptionIndex, file_checksum
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "apartments.csv")
+
+
+@pytest.fixture
+def paths(tmp_path):
+    full = pd.read_csv(DATA_PATH, index_col=0)
+    versions = {}
+    for name, rows in (("first", 40), ("second", 70), ("third", len(full))):
+        path = tmp_path / f"{name}.csv"
+        full.iloc[:rows].to_csv(path)
+        versions[name] = str(path)
+    csv_path = str(tmp_path / "apartments.csv")
+    shutil.copy(versions["first"], csv_path)
+    return {"csv": csv_path, "store": str(tmp_path / "catalogue"), "index": str(tmp_path / "index.pkl"), **versions}
+
+
+def _reloader(paths):
+    df, catalogue = load_catalogue(paths["csv"], paths["store"])
+    snapshot = CatalogueSnapshot.build(df, paths["csv"], paths["index"], catalogue=catalogue)
+    return CatalogueReloader(snapshot, paths["csv"], paths["index"], store_path=paths["store"], interval=0)
+
+
+def _replace_during_load(monkeypatch, paths, source, load):
+    def replacing(csv_path, store_path):
+        # CSV заменяется после проверки контрольной суммы, но до загрузки
+        shutil.copy(paths[source], csv_path)
+        return load(csv_path, store_path)
+    monkeypatch.setattr(catalogue_reloader, "load_catalogue", replacing)
+
+
+def test_version_matches_loaded_rows(paths, monkeypatch):
+    reloader = _reloader(paths)
+    assert reloader.current.version == file_checksum(paths["first"])
+    shutil.copy(paths["second"], paths["csv"])
+    _replace_during_load(monkeypatch, paths, "third", load_catalogue)
+
+    assert reloader.reload()
+    snapshot = reloader.current
+    assert snapshot.version == file_checksum(paths["third"])
+    assert len(snapshot.df) == len(snapshot.description_index) == len(pd.read_csv(paths["third"]))
+    assert snapshot.description_index.checksum == snapshot.version
+    # Индекс на диске сохранён под версией тех данных, по которым построен
+    assert len(DescriptionIndex.load(paths["index"], snapshot.version)) == len(snapshot.df)
+
+
+def test_direct_csv_read_rejects_file_changed_during_load(paths, monkeypatch):
+    reloader = _reloader(paths)
+    shutil.copy(paths["second"], paths["csv"])
+    read_csv = lambda csv_path, store_path: (pd.read_csv(csv_path, index_col=0), None)
+    # Хранилище недоступно: CSV читается напрямую, а затем файл меняется
+    monkeypatch.setattr(catalogue_reloader, "load_catalogue",
+                        lambda csv_path, store_path: (read_csv(csv_path, store_path),
+                                                      shutil.copy(paths["third"], csv_path))[0])
+
+    assert not reloader.reload()
+    assert reloader.failures == 1
+    assert reloader.current.version == file_checksum(paths["first"])
+
+    monkeypatch.setattr(catalogue_reloader, "load_catalogue", read_csv)
+    assert reloader.reload()
+    assert reloader.current.version == file_checksum(paths["third"])
+    assert len(reloader.current.df) == len(pd.read_csv(paths["third"]))
@@ -0,0 +1,130 @@
+"""Crawler против локального http.server: порядок, повторы на 429/5xx, частота и одновременность запросов к хосту"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.crawler import Crawler
+
+
+class _Stub:
+    """Состояние тестового сервера: сколько раз запрошен каждый путь и пик одновременных запросов к хосту"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = {}
+        self.times = []
+        self.in_flight = {}
+        self.peak = {}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # /page/<n>?delay=<с>      - страница после задержки
+    # /flaky/<status>/<fails>  - fails раз status (429 с Retry-After: 0), затем 200
+    # /missing                 - 404
+    def do_GET(self):
+        stub = self.server.stub
+        host = self.headers["Host"]
+        path, _, query = self.path.partition("?")
+        with stub.lock:
+            hits = stub.hits[path] = stub.hits.get(path, 0) + 1
+            stub.times.append(time.monotonic())
+            stub.in_flight[host] = stub.in_flight.get(host, 0) + 1
+            stub.peak[host] = max(stub.peak.get(host, 0), stub.in_flight[host])
+        try:
+            if query.startswith("delay="):
+                time.sleep(float(query[len("delay="):]))
+            parts = path.strip("/").split("/")
+            status, headers = 200, {}
+            if parts[0] == "missing":
+                status = 404
+            elif parts[0] == "flaky" and hits <= int(parts[2]):
+                status = int(parts[1])
+                if status == 429:
+                    headers["Retry-After"] = "0"
+            body = path.encode("utf-8")
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with stub.lock:
+                stub.in_flight[host] -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.daemon_threads = True
+    httpd.stub = _Stub()
+    thread = threading.Thread(target=httpd.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _url(server, path, host="127.0.0.1"):
+    return f"http://{host}:{server.server_address[1]}{path}"
+
+
+def test_fetch_many_returns_every_page_in_completion_order(server):
+    urls = [_url(server, f"/page/{i}?delay={0.3 if i == 0 else 0}") for i in range(6)]
+    with Crawler(concurrency=4, rate=1000, burst=100) as crawler:
+        results = list(crawler.fetch_many(urls))
+    assert sorted(url for url, _ in results) == sorted(urls)
+    assert all(url.endswith(response.text + "?" + url.partition("?")[2]) for url, response in results)
+    # Медленная страница не задерживает остальные: она приходит последней
+    assert results[-1][0] == urls[0]
+
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_retries_transient_errors(server, status):
+    with Crawler(rate=1000, burst=100, max_retries=3, backoff=0.05) as crawler:
+        started = time.monotonic()
+        response = crawler.fetch(_url(server, f"/flaky/{status}/2"))
+        elapsed = time.monotonic() - started
+    assert response is not None and response.status_code == 200
+    assert server.stub.hits[f"/flaky/{status}/2"] == 3
+    if status != 429:
+        # Экспоненциальная задержка: не меньше половины 0.05*2 + 0.05*4
+        assert elapsed >= 0.15
+
+
+def test_gives_up_after_max_retries(server):
+    with Crawler(rate=1000, burst=100, max_retries=2, backoff=0.01) as crawler:
+        assert crawler.fetch(_url(server, "/flaky/503/5")) is None
+    assert server.stub.hits["/flaky/503/5"] == 2
+
+
+def test_client_errors_are_not_retried(server):
+    with Crawler(rate=1000, burst=100, max_retries=3, backoff=0.01) as crawler:
+        assert crawler.fetch(_url(server, "/missing")) is None
+    assert server.stub.hits["/missing"] == 1
+
+
+def test_token_bucket_limits_request_rate(server):
+    urls = [_url(server, f"/page/{i}") for i in range(11)]
+    with Crawler(concurrency=8, rate=20, burst=1) as crawler:
+        started = time.monotonic()
+        assert len(list(crawler.fetch_many(urls))) == 11
+        elapsed = time.monotonic() - started
+    # Первый запрос - из запаса, остальные десять - по одному на 1/20 секунды
+    assert elapsed >= 10 / 20 * 0.9
+    gaps = [b - a for a, b in zip(server.stub.times, server.stub.times[1:])]
+    assert min(gaps) >= 1 / 20 * 0.5
+
+
+def test_host_concurrency_limit(server):
+    # 127.0.0.1 и localhost - разные хосты для ограничителей, но один и тот же сервер
+    urls = [_url(server, f"/page/{i}?delay=0.05", host) for host in ("127.0.0.1", "localhost") for i in range(8)]
+    with Crawler(concurrency=8, rate=1000, burst=100, host_concurrency=2) as crawler:
+        assert len(list(crawler.fetch_many(urls))) == 16
+    port = server.server_address[1]
+    assert server.stub.peak == {f"127.0.0.1:{port}": 2, f"localhost:{port}": 2}
@@ -0,0 +1,47 @@
+"""load_or_build_embedding_index сравнивает сохранённый индекс с моделью, которая действительно используется"""
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+from src.embedding_index import EmbeddingIndex, load_or_build_embedding_index
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "apartments.csv")
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    calls = []
+    build = EmbeddingIndex.build.__func__
+
+    def counting(cls, *args, **kwargs):
+        calls.append(kwargs["encoder"].name)
+        return build(cls, *args, **kwargs)
+
+    monkeypatch.setattr(EmbeddingIndex, "build", classmethod(counting))
+    return calls
+
+
+@pytest.mark.parametrize("model_name", [None, "all-MiniLM-L6-v2"])
+def test_index_is_reused_when_model_package_is_missing(tmp_path, monkeypatch, builds, model_name):
+    # Без sentence-transformers заданная модель заменяется хешированными n-граммами
+    monkeypatch.setitem(sys.modules, "sentence_transformers", None)
+    df = pd.read_csv(DATA_PATH, index_col=0)
+    path = str(tmp_path / "embeddings")
+
+    first = load_or_build_embedding_index(df, DATA_PATH, path, model_name=model_name)
+    second = load_or_build_embedding_index(df, DATA_PATH, path, model_name=model_name)
+    assert builds == ["hashing"]
+    assert first.meta == second.meta
+    assert second.meta["encoder"] == "hashing" and second.meta["model"] is None
+
+
+def test_index_is_rebuilt_for_another_catalogue(tmp_path, monkeypatch, builds):
+    monkeypatch.setitem(sys.modules, "sentence_transformers", None)
+    df = pd.read_csv(DATA_PATH, index_col=0)
+    path = str(tmp_path / "embeddings")
+    load_or_build_embedding_index(df, DATA_PATH, path)
+    load_or_build_embedding_index(df.iloc[:50], DATA_PATH, path, checksum="другая версия")
+    assert builds == ["hashing", "hashing"]
+    assert len(EmbeddingIndex(path)) == 50
@@ -0,0 +1,49 @@
+"""FastFeatureExtractor: простые запросы разбираются локально, запросы с отрицаниями уходят в LLM"""
+import pandas as pd
+import pytest
+
+from src.fast_extractor import FastFeatureExtractor
+
+MIN_CONFIDENCE = 0.8
+
+
+@pytest.fixture(scope="module")
+def extractor():
+    df = pd.DataFrame({
+        "city_region": ["Алматы, Алмалинский р-н", "Алматы, Медеуский р-н", "Алматы, Бостандыкский р-н"],
+        "adress": ["Айтеке би 12", "Абая 150", "Достык — Жолдасбекова 97"],
+    })
+    return FastFeatureExtractor(df)
+
+
+@pytest.mark.parametrize("prompt", [
+    "2-комнатная квартира, не Алмалинский район",
+    "квартира в любом районе кроме Медеуского",
+    "однушка без Бостандыкского района",
+    "2-комнатная, Алмалинский район, не на улице Айтеке би",
+    "квартира кроме улицы Абая, до 250 000 тг",
+    "3-комнатная, не 1 этаж",
+    "двушка, Медеуский район, не на первом этаже",
+    "студия, ни 5 этаж ни 9 этаж",
+])
+def test_negated_queries_fall_back_to_llm(extractor, prompt):
+    assert extractor.try_extract(prompt, MIN_CONFIDENCE) is None
+
+
+@pytest.mark.parametrize("prompt, expected", [
+    ("2-комнатная, Алмалинский район, улица Айтеке би, до 250 000 тг",
+     {"rooms": "2", "city_region": "Алмалинский р-н", "adress": "Айтеке би", "price": "до 250000"}),
+    ("двушка в Медеуском районе не дороже 300 тыс тг",
+     {"rooms": "2", "city_region": "Медеуский р-н", "price": "до 300000"}),
+    ("3-комнатная, Бостандыкский район, не выше 5 этажа",
+     {"rooms": "3", "city_region": "Бостандыкский р-н", "floor": "до 5"}),
+    ("однушка не ниже 3 этажа без мебели",
+     {"rooms": "1", "floor": "от 3", "is_apartment_has_furniture(full or no)": "нет"}),
+    ("студия на улице Абая 40 м2",
+     {"rooms": "1", "kitchen_studio": "да", "adress": "Абая", "area": "40"}),
+])
+def test_simple_queries_use_fast_path(extractor, prompt, expected):
+    features = extractor.try_extract(prompt, MIN_CONFIDENCE)
+    assert features is not None
+    assert {key: features[key] for key in expected} == expected
+    assert all(value == "No Information" for key, value in features.items() if key not in expected)
@@ -0,0 +1,48 @@
+"""Все доступные парсеры страниц объявлений дают те же записи, что и html.parser (BeautifulSoup)"""
+import pytest
+
+from benchmarks.fixtures import listing_pages
+from src.listing_parser import BACKENDS, parse_listing
+
+# Страницы с отклонениями от обычной разметки: нет части блоков, сущности, вложенные теги
+EDGE_PAGES = [
+    ("https://krisha.kz/a/show/1", "<html><body><p>Объявление снято с публикации</p></body></html>"),
+    ("https://krisha.kz/a/show/2", """<html><body>
+<h1>Студия · 28 м² · 3/9 этаж, мкр Самал-2 12</h1>
+<div class="offer__price">1&nbsp;250&nbsp;000 〒</div>
+<div class="offer__description">Рядом <b>метро</b> &amp; парк.<br>Без животных</div>
+</body></html>"""),
+    ("https://krisha.kz/a/show/3", """<html><body>
+<h1>3-комнатная квартира · 90 м² · 7/12 этаж, Абая 150</h1>
+<div class="offer__price"><span>договорная</span></div>
+<div class="offer__location offer__advert-short-info"><span> Алматы, Бостандыкский р-н </span></div>
+<dl class="offer__advert-short-info"><dt> Этаж </dt><dd> 7 из 12 </dd></dl>
+<dl class="offer__advert-short-info"><dt>Санузел</dt></dl>
+<dl class="offer__advert-short-info"><dt>МЕБЕЛЬ</dt><dd>полностью <i>меблирована</i></dd></dl>
+</body></html>"""),
+]
+
+
+@pytest.fixture(scope="module")
+def pages():
+    return listing_pages(20, seed=3) + [(url, html.encode("utf-8")) for url, html in EDGE_PAGES]
+
+
+def test_html_parser_always_available():
+    assert "html.parser" in BACKENDS
+
+
+@pytest.mark.parametrize("backend", [name for name in BACKENDS if name != "html.parser"])
+def test_backend_matches_html_parser(pages, backend):
+    for url, html in pages:
+        assert parse_listing(html, url, backend) == parse_listing(html, url, "html.parser"), url
+
+
+def test_listing_fields(pages):
+    url, html = pages[-1]
+    assert parse_listing(html, url, "html.parser") == {
+        "url": url, "rooms": "3", "adress": "Абая 150", "price": "0",
+        "city_region": "Алматы, Бостандыкский р-н", "description": "",
+        "floor": "7 из 12", "area": "", "apartment_condition": "", "house_year": "",
+        "bathroom": "", "furniture_detailed": "полностью меблирована",
+    }
@@ -0,0 +1,56 @@
+"""TTLLRUCache с SQLite и ResultCache с Redis: соединения открываются в каждом процессе, а не наследуются после fork"""
+import os
+
+import pytest
+
+from src.llm_cache import TTLLRUCache
+from src.result_cache import ResultCache
+
+
+def test_sqlite_connection_opened_lazily(tmp_path):
+    cache = TTLLRUCache(sqlite_path=str(tmp_path / "cache.db"))
+    assert cache._db is None
+    assert cache.stats()["persistent"]
+    cache.set("key", {"rooms": "2"})
+    assert cache._db is not None
+    assert TTLLRUCache(sqlite_path=str(tmp_path / "cache.db")).get("key") == {"rooms": "2"}
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="нужен fork")
+def test_sqlite_connection_reopened_after_fork(tmp_path):
+    cache = TTLLRUCache(sqlite_path=str(tmp_path / "cache.db"))
+    cache.set("parent", "1")
+    parent_db = cache._db
+
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            cache._data.clear()
+            # Запись из родителя читается уже через собственное соединение
+            if cache.get("parent") == "1" and cache._db is not parent_db:
+                cache.set("child", "2")
+                code = 0
+        finally:
+            os._exit(code)
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
+
+    assert cache._db is parent_db
+    cache._data.clear()
+    assert cache.get("child") == "2"
+    assert cache.get("parent") == "1"
+
+
+def test_redis_client_per_process(monkeypatch):
+    pytest.importorskip("redis")
+    created = []
+    cache = ResultCache(redis_url="redis://localhost:1/0")
+    monkeypatch.setattr(cache, "_redis_from_url", lambda url, **kwargs: created.append(url) or object())
+    assert created == []
+
+    client = cache._client()
+    assert cache._client() is client and len(created) == 1
+    # В дочернем процессе pid другой: клиент родителя не используется
+    monkeypatch.setattr(os, "getpid", lambda: cache._redis_pid + 1)
+    assert cache._client() is not client and len(created) == 2
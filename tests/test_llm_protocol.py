@@ -0,0 +1,127 @@
+"""IncrementalJSONParser на любых границах фрагментов и обработка оборванных ответов LLM"""
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import src.model as model
+from src.llm_protocol import (IncrementalJSONParser, MISSING_VALUE, ResponseTruncated, parse_features,
+                              read_completion)
+
+REPLY = ('{"rooms": "2", "adress": "ул. \\"Абая\\" \\\\ 150", "price": "до 250000", "floor": 3, '
+         '"facilities": ["интернет", {"тип": "лифт, грузовой"}], "security": {"есть": true}, '
+         '"description": "тихо }, без шума", "parking": null}')
+
+
+def feed_split(text, sizes):
+    """Подаёт text фрагментами заданных длин по кругу; возвращает парсер и все выданные поля"""
+    parser = IncrementalJSONParser()
+    emitted, position, index = [], 0, 0
+    while position < len(text):
+        size = sizes[index % len(sizes)]
+        emitted.extend(parser.feed(text[position:position + size]))
+        position += size
+        index += 1
+    return parser, emitted
+
+
+@pytest.mark.parametrize("sizes", [[1], [2], [3], [5, 1], [7], [len(REPLY)]])
+def test_chunk_boundaries_inside_strings_and_escapes(sizes):
+    parser, emitted = feed_split(REPLY, sizes)
+    assert parser.complete
+    assert dict(emitted) == json.loads(REPLY) == parser.result()
+
+
+def test_every_single_split_point():
+    expected = json.loads(REPLY)
+    for cut in range(1, len(REPLY)):
+        parser = IncrementalJSONParser()
+        parser.feed(REPLY[:cut])
+        parser.feed(REPLY[cut:])
+        assert parser.complete and parser.result() == expected, cut
+
+
+def test_fields_emitted_as_soon_as_complete():
+    seen = []
+    parser = IncrementalJSONParser(on_field=lambda key, value: seen.append(key))
+    parser.feed('{"rooms": "2", "price": "до 2')
+    assert seen == ["rooms"]
+    parser.feed('50000"}')
+    assert seen == ["rooms", "price"]
+
+
+def test_single_quotes():
+    parser, _ = feed_split("{'rooms': '2', 'adress': 'д\\'Артаньяна \"5\"', \"floor\": 'от 3'}", [4])
+    assert parser.result() == {"rooms": "2", "adress": "д'Артаньяна \"5\"", "floor": "от 3"}
+
+
+def test_code_fence_and_surrounding_text():
+    text = 'Вот ответ:\n```json\n{"rooms": "1", "kitchen_studio": "да"}\n```\nГотово {"rooms": "3"}'
+    parser, _ = feed_split(text, [3])
+    assert parser.complete
+    assert parser.result() == {"rooms": "1", "kitchen_studio": "да"}
+
+
+def test_nested_values():
+    parser, _ = feed_split('{"facilities": [["a", "b"], {"c": [1, 2]}], "rooms": "2"}', [1])
+    assert parser.result() == {"facilities": [["a", "b"], {"c": [1, 2]}], "rooms": "2"}
+
+
+def test_unquoted_garbage_kept_as_string():
+    parser, _ = feed_split('{"rooms": два, "price": 250000}', [2])
+    assert parser.result() == {"rooms": "два", "price": 250000}
+
+
+@pytest.mark.parametrize("text", ['{"rooms": "2", "price": "до 25', '{"rooms": "2", "price": 250', '{"rooms": "2",'])
+def test_truncated_object_is_error(text):
+    parser, emitted = feed_split(text, [4])
+    assert not parser.complete
+    assert emitted == [("rooms", "2")]
+    assert parse_features(text, parser) == {"error": "Incomplete JSON in response"}
+    assert parse_features(text) == {"error": "Incomplete JSON in response"}
+
+
+def test_no_json_is_error():
+    assert parse_features("Извините, не понял запрос") == {"error": "No JSON found in response"}
+
+
+def test_complete_object_expanded():
+    features = parse_features('```json\n{"rooms": "2"}\n```')
+    assert features["rooms"] == "2" and features["price"] == MISSING_VALUE
+
+
+def chunk(text=None, finish_reason=None):
+    return SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=SimpleNamespace(content=text),
+                                                                finish_reason=finish_reason)])
+
+
+def test_read_completion_raises_on_length():
+    parser = IncrementalJSONParser()
+    with pytest.raises(ResponseTruncated):
+        read_completion([chunk('{"rooms": "2", "pri'), chunk(None, "length")], parser)
+    assert read_completion([chunk('{"rooms": "2"}'), chunk(None, "stop")]) == '{"rooms": "2"}'
+
+
+class _FakeCache:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value):
+        self.data[key] = value
+
+
+@pytest.mark.parametrize("chunks", [
+    [chunk('{"rooms": "2", "price": "до 25'), chunk(None, "length")],
+    [chunk('{"rooms": "2", "price": "до 25'), chunk(None, "stop")],
+])
+def test_truncated_reply_not_cached(monkeypatch, chunks):
+    cache = _FakeCache()
+    create = lambda **kwargs: iter(chunks)
+    service = SimpleNamespace(llm_cache=cache, llm_usage=None,
+                              client=SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create))))
+    monkeypatch.setattr(model, "service", service)
+    assert "error" in model.extract_features_with_llm("двушка до 250 тысяч")
+    assert cache.data == {}
@@ -0,0 +1,63 @@
+"""/metrics: счётчики с типом counter и суффиксом _total; время потокового ответа - до конца тела"""
+import os
+import time
+
+from src.metrics import MetricsRegistry, render_counters, render_gauges
+
+
+def test_render_counters_and_gauges():
+    assert render_counters("realtor_cache_lookups", "Обращения", [({"cache": "llm", "result": "hit"}, 3)]) == (
+        "# HELP realtor_cache_lookups_total Обращения\n"
+        "# TYPE realtor_cache_lookups_total counter\n"
+        'realtor_cache_lookups_total{cache="llm",result="hit"} 3.0\n')
+    assert render_gauges("realtor_catalogue_rows", "Объявлений", [({}, 5)]).splitlines()[1] == \
+        "# TYPE realtor_catalogue_rows gauge"
+
+
+def test_metrics_endpoint_types(app_module):
+    text = app_module.app.test_client().get("/metrics").get_data(as_text=True)
+    for name in ("realtor_cache_lookups_total", "realtor_llm_requests_total", "realtor_llm_tokens_total"):
+        assert f"# TYPE {name} counter" in text
+    assert "# TYPE realtor_catalogue_rows gauge" in text
+    assert "realtor_llm_tokens{" not in text
+
+
+def test_stream_request_time_covers_body(app_module, monkeypatch):
+    registry = MetricsRegistry()
+    monkeypatch.setattr(app_module, "metrics", registry)
+    rank_listings = app_module.rank_listings
+
+    def slow_rank_listings(*args, **kwargs):
+        time.sleep(0.3)
+        return rank_listings(*args, **kwargs)
+
+    monkeypatch.setattr(app_module, "rank_listings", slow_rank_listings)
+    # Запрос разбирается локально: один итоговый этап без LLM
+    response = app_module.app.test_client().post("/recommend/stream", json={"user_input": "2-комнатная квартира"})
+    assert response.status_code == 200
+    assert response.get_data(as_text=True).count("\n") == 1
+    response.close()
+
+    summary = registry.summary()
+    request = summary['realtor_request_seconds{endpoint="/recommend/stream",status="200"}']
+    assert request["count"] == 1
+    assert request["mean"] >= 0.3
+    assert request["mean"] >= summary['realtor_stream_stage_seconds{stage="final"}']["mean"]
+
+
+def test_metrics_pid_label_under_serve(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "MASTER_PID", os.getppid())
+    app_module.metrics.observe("realtor_stage_seconds", 0.01, "Этапы", stage="scoring")
+    text = app_module.app.test_client().get("/metrics").get_data(as_text=True)
+    pid = f'pid="{os.getpid()}"'
+    samples = [line for line in text.splitlines() if line and not line.startswith("#")]
+    assert samples and all(pid in line for line in samples)
+    assert f'realtor_stage_seconds_count{{{pid},stage="scoring"}}' in text
+
+
+def test_metrics_without_serve_has_no_pid(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "MASTER_PID", None)
+    text = app_module.app.test_client().get("/metrics").get_data(as_text=True)
+    samples = [line for line in text.splitlines()
+               if line and not line.startswith("#") and not line.startswith("realtor_process_memory_bytes")]
+    assert samples and not any("pid=" in line for line in samples)
@@ -0,0 +1,350 @@
+"""
+Регрессионный тест векторизованного подсчёта оценок: score_listings совпадает с
+исходным построчным расчётом через iterrows (calculate_similarity_score из
+src/model.py до векторизации) на фиксированном наборе строк и на data/apartments.csv.
+"""
+import os
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+from src.description_index import DescriptionIndex
+from src.numeric_ranges import filter_window, numeric_bounds, numeric_similarity
+from src.scoring import score_listings
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "apartments.csv")
+
+
+# Исходная реализация без изменений
+def calculate_similarity_score(df, feature_dict, user_prompt):
+    similarity_scores = []
+    if df.empty:
+        return []
+        
+    # Если DataFrame содержит URL в первом столбце, пропускаем его
+    data_df = df.iloc[:, 1:] if 'url' in df.columns else df
+
+    # Определяем важные признаки и их веса
+    key_features = {
+        'price': 3.0,      # Цена - очень важный параметр
+        'rooms': 5.0,      # Количество комнат - критически важный параметр
+        'city_region': 3.0, # Район - критически важный параметр
+        'description': 0.5 # Описание - важный параметр
+    }
+    
+    # Стандартный вес для остальных признаков
+    default_weight = 1.0
+    
+    # Дополнительный фактор для улицы (будем проверять как часть адреса)
+    street_bonus = 5.0
+
+    # Отбираем релевантные признаки (исключаем с 'No Information')
+    relevant_features = [col for col in data_df.columns if 
+                         col in feature_dict and 
+                         feature_dict.get(col, "No Information") != "No Information" and 
+                         col != "description"]
+    
+    # Проверяем, есть ли информация об улице в запросе
+    street_info = None
+    if 'adress' in feature_dict and feature_dict['adress'] != "No Information":
+        street_info = feature_dict['adress'].lower()
+    
+    for index, row in data_df.iterrows():
+        # Базовая оценка - начинаем с 0.2 (20% совпадения по умолчанию)
+        base_score = 0.2
+        feature_similarity = 0
+        feature_weights_sum = 0
+        total_score = 0
+        
+        # Проверяем точные совпадения по ключевым параметрам
+        exact_matches = 0
+        key_features_count = 0
+        
+        # 1. Проверка совпадения по комнатам
+        if 'rooms' in relevant_features and 'rooms' in row:
+            key_features_count += 1
+            row_rooms = str(row.get('rooms', "")).strip()
+            dict_rooms = str(feature_dict.get('rooms', "")).strip()
+            
+            if row_rooms and dict_rooms and row_rooms == dict_rooms:
+                exact_matches += 1
+                # Бонус за точное совпадение комнат
+                base_score += 0.2
+        
+        # 2. Проверка совпадения по району
+        if 'city_region' in relevant_features and 'city_region' in row:
+            key_features_count += 1
+            row_region = str(row.get('city_region', "")).lower().strip()
+            dict_region = str(feature_dict.get('city_region', "")).lower().strip()
+            
+            # Проверяем вхождение района
+            if row_region and dict_region and (dict_region in row_region or row_region in dict_region):
+                exact_matches += 1
+                # Бонус за совпадение района
+                base_score += 0.2
+        
+        # 3. Проверка совпадения по улице (в адресе)
+        if street_info and 'adress' in row:
+            row_address = str(row.get('adress', "")).lower().strip()
+            if row_address and street_info in row_address:
+                # Значительный бонус за совпадение улицы
+                base_score += 0.3
+        
+        # Если есть хотя бы одно точное совпадение по ключевым параметрам, 
+        # увеличиваем базовую оценку
+        if exact_matches > 0:
+            base_score = max(base_score, 0.3 + (exact_matches / key_features_count) * 0.4)
+        
+        # TF-IDF для признаков с учетом весов
+        if relevant_features:
+            try:
+                weighted_similarities = []
+                
+                for feature in relevant_features:
+                    # Получаем вес для текущего признака
+                    weight = key_features.get(feature, default_weight)
+                    feature_weights_sum += weight
+                    
+                    # Создаем отдельные векторы для текущего признака
+                    feature_vectorizer = TfidfVectorizer()
+                    row_value = str(row.get(feature, ""))
+                    dict_value = str(feature_dict.get(feature, ""))
+                    
+                    if row_value.strip() and dict_value.strip():
+                        tfidf_matrix = feature_vectorizer.fit_transform([dict_value, row_value])
+                        similarity = cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:2])[0][0]
+                        weighted_similarities.append(similarity * weight)
+                
+                # Считаем средневзвешенное значение
+                if feature_weights_sum > 0 and weighted_similarities:
+                    feature_similarity = sum(weighted_similarities) / feature_weights_sum
+                    feature_similarity = feature_similarity * 0.5  # Вклад TF-IDF в общую оценку - 50%
+                    
+            except Exception as e:
+                print(f"Ошибка при расчете схожести признаков: {str(e)}")
+
+        # TF-IDF для описания (с меньшим весом)
+        description_similarity = 0
+        if "description" in data_df.columns:
+            try:
+                description_text = str(row.get("description", ""))
+                if description_text.strip() and user_prompt.strip():
+                    desc_vectorizer = TfidfVectorizer()
+                    tfidf_desc_matrix = desc_vectorizer.fit_transform([user_prompt, description_text])
+                    description_similarity = cosine_similarity(tfidf_desc_matrix[0:1], tfidf_desc_matrix[1:2])[0][0] * 0.3 # Меньший вес для описания
+            except Exception as e:
+                print(f"Ошибка при расчете схожести описания: {str(e)}")
+
+        # Общий результат - сумма базовой оценки, TF-IDF оценки признаков и оценки описания
+        total_score = base_score + feature_similarity + description_similarity
+        
+        # Нормализация оценки до диапазона 0-1
+        total_score = min(total_score, 1.0)
+        
+        similarity_scores.append(total_score)
+
+    return similarity_scores
+
+
+# Фиксированный набор строк с крайними случаями: пропуски, значения без токенов,
+# числа вместо строк, совпадения района по вхождению и улицы в адресе
+FIXTURE = pd.DataFrame({
+    "url": [f"https://krisha.kz/a/show/{i}" for i in range(8)],
+    "rooms": [2, 1, 3, 2, np.nan, 1, 4, 2],
+    "adress": ["Абая 10", "мкр Аккент", "Сатпаева — Байзакова", np.nan, "Абая угол Жандосова", "-", "Толе би 5", "абай"],
+    "price": [250000, 180000, 400000, np.nan, 300000, 120000, 650000, 220000],
+    "city_region": ["Алматы, Бостандыкский р-н", "Алматы, Алатауский р-н", "Алматы, Бостандыкский р-н",
+                    "Алматы, Медеуский р-н", np.nan, "Алматы", "Алматы, Алмалинский р-н", "бостандыкский"],
+    "description": ["Уютная двушка с мебелью и техникой", "Квартира после ремонта, рядом школа", np.nan,
+                    "-", "Светлая квартира с видом на горы", "Сдаётся однокомнатная квартира", "",
+                    "Двушка в Бостандыкском районе с мебелью"],
+    "floor": ["3 из 9", "1 из 5", np.nan, "12 из 16", "5 из 5", "2", "7 из 10", "4 из 9"],
+    "area": ["54 м²", "38 м²", "90 м²", np.nan, "60 м²", "33", "120 м²", "50 м²"],
+    "apartment_condition": ["евроремонт", "свежий ремонт", "среднее", np.nan, "евроремонт", "-",
+                            "требует ремонта", "свежий ремонт"],
+    "furniture_detailed": ["полностью", "частично", "без мебели", np.nan, "полностью", "полностью", "-", "полностью"],
+})
+
+# Запросы без разбираемых чисел в цене, площади и этаже: для них исходный расчёт
+# (TF-IDF по всем признакам) и текущий совпадают без оговорок
+BASELINE_FEATURE_DICTS = [
+    {"rooms": "2", "city_region": "Бостандыкский р-н", "price": "No Information"},
+    {"rooms": "1", "city_region": "Алматы, Алмалинский р-н", "adress": "Абая",
+     "apartment_condition": "свежий ремонт", "furniture_detailed": "полностью"},
+    {"city_region": "Медеуский", "apartment_condition": "евроремонт", "price": "недорого"},
+    {"rooms": "3", "adress": "абая", "furniture_detailed": "-", "bathroom": "раздельный"},
+    {"rooms": "No Information", "city_region": "No Information"},
+]
+# Запросы с ценой, площадью и этажом: эти признаки оцениваются по близости к диапазону
+FEATURE_DICTS = [
+    {"rooms": "2", "city_region": "Бостандыкский р-н", "price": "No Information"},
+    {"rooms": "1", "city_region": "Алматы, Алмалинский р-н", "adress": "Абая",
+     "apartment_condition": "свежий ремонт", "furniture_detailed": "полностью"},
+    {"rooms": "3", "price": "до 300 000", "area": "70-90", "floor": "No Information"},
+    {"city_region": "Медеуский", "price": "200000", "floor": "от 3", "bathroom": "раздельный"},
+    {"rooms": "No Information", "city_region": "No Information"},
+]
+PROMPTS = [
+    "Двушка в Бостандыкском районе",
+    "Однокомнатная квартира на Абая, с мебелью и свежим ремонтом",
+    "трёхкомнатная до 300 тысяч, 70-90 квадратов",
+    "",
+]
+@pytest.fixture(scope="module")
+def catalogue():
+    return pd.read_csv(DATA_PATH, index_col=0)
+
+
+def _first_number(value):
+    match = re.search(r"\d+(?:[.,]\d+)?", str(value).replace("\xa0", "").replace(" ", ""))
+    return float(match.group().replace(",", ".")) if match else np.nan
+
+
+def numeric_reference_scores(df, feature_dict, user_prompt, description_index=None, hard_filter=False):
+    """
+    calculate_similarity_score с правилами, добавленными позже: цена, площадь и этаж
+    с разобранным диапазоном сравниваются по близости к диапазону, описание - по
+    готовому индексу, если он передан, hard_filter обнуляет строки вне диапазонов
+    """
+    key_features = {'price': 3.0, 'rooms': 5.0, 'city_region': 3.0, 'description': 0.5}
+    default_weight = 1.0
+    data_df = df.iloc[:, 1:] if 'url' in df.columns else df
+    relevant_features = [col for col in data_df.columns if
+                         col in feature_dict and
+                         feature_dict.get(col, "No Information") != "No Information" and
+                         col != "description"]
+    bounds = numeric_bounds(feature_dict, relevant_features)
+    street_info = None
+    if 'adress' in feature_dict and feature_dict['adress'] != "No Information":
+        street_info = feature_dict['adress'].lower()
+
+    similarity_scores = []
+    for index, row in data_df.iterrows():
+        if hard_filter and not _inside_filter(row, bounds):
+            similarity_scores.append(0.0)
+            continue
+        base_score = 0.2
+        feature_similarity = 0
+        feature_weights_sum = 0
+        exact_matches = 0
+        key_features_count = 0
+
+        if 'rooms' in relevant_features and 'rooms' in row:
+            key_features_count += 1
+            row_rooms = str(row.get('rooms', "")).strip()
+            dict_rooms = str(feature_dict.get('rooms', "")).strip()
+            if row_rooms and dict_rooms and row_rooms == dict_rooms:
+                exact_matches += 1
+                base_score += 0.2
+
+        if 'city_region' in relevant_features and 'city_region' in row:
+            key_features_count += 1
+            row_region = str(row.get('city_region', "")).lower().strip()
+            dict_region = str(feature_dict.get('city_region', "")).lower().strip()
+            if row_region and dict_region and (dict_region in row_region or row_region in dict_region):
+                exact_matches += 1
+                base_score += 0.2
+
+        if street_info and 'adress' in row:
+            row_address = str(row.get('adress', "")).lower().strip()
+            if row_address and street_info in row_address:
+                base_score += 0.3
+
+        if exact_matches > 0:
+            base_score = max(base_score, 0.3 + (exact_matches / key_features_count) * 0.4)
+
+        if relevant_features:
+            try:
+                weighted_similarities = []
+                for feature in relevant_features:
+                    weight = key_features.get(feature, default_weight)
+                    feature_weights_sum += weight
+                    row_value = str(row.get(feature, ""))
+                    dict_value = str(feature_dict.get(feature, ""))
+                    if feature in bounds:
+                        if dict_value.strip():
+                            value = np.array([_first_number(row.get(feature, ""))])
+                            weighted_similarities.append(numeric_similarity(value, bounds[feature], feature)[0] * weight)
+                        continue
+                    if row_value.strip() and dict_value.strip():
+                        tfidf_matrix = TfidfVectorizer().fit_transform([dict_value, row_value])
+                        similarity = cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:2])[0][0]
+                        weighted_similarities.append(similarity * weight)
+                if feature_weights_sum > 0 and weighted_similarities:
+                    feature_similarity = sum(weighted_similarities) / feature_weights_sum * 0.5
+            except ValueError:
+                pass
+
+        description_similarity = 0
+        if "description" in data_df.columns and user_prompt.strip():
+            if description_index is not None:
+                vectorizer = description_index.vectorizer
+                description_text = row.get("description", "")
+                description_text = description_text if isinstance(description_text, str) else ""
+                description_similarity = cosine_similarity(vectorizer.transform([user_prompt]),
+                                                           vectorizer.transform([description_text]))[0][0] * 0.3
+            else:
+                try:
+                    description_text = str(row.get("description", ""))
+                    if description_text.strip():
+                        tfidf_desc_matrix = TfidfVectorizer().fit_transform([user_prompt, description_text])
+                        description_similarity = cosine_similarity(tfidf_desc_matrix[0:1],
+                                                                   tfidf_desc_matrix[1:2])[0][0] * 0.3
+                except ValueError:
+                    pass
+
+        similarity_scores.append(min(base_score + feature_similarity + description_similarity, 1.0))
+    return np.array(similarity_scores)
+
+
+def _inside_filter(row, bounds):
+    for feature, feature_bounds in bounds.items():
+        value = _first_number(row.get(feature, ""))
+        if np.isnan(value):
+            continue
+        low, high = filter_window(feature_bounds, feature)
+        if (low is not None and value < low) or (high is not None and value > high):
+            return False
+    return True
+
+
+@pytest.mark.parametrize("feature_dict", FEATURE_DICTS)
+@pytest.mark.parametrize("user_prompt", PROMPTS)
+def test_numeric_ranges_match_iterrows(catalogue, feature_dict, user_prompt):
+    expected = numeric_reference_scores(catalogue, feature_dict, user_prompt)
+    assert np.allclose(score_listings(catalogue, feature_dict, user_prompt), expected)
+
+
+@pytest.mark.parametrize("feature_dict", FEATURE_DICTS)
+def test_hard_filter_matches_iterrows(catalogue, feature_dict):
+    user_prompt = PROMPTS[0]
+    expected = numeric_reference_scores(catalogue, feature_dict, user_prompt, hard_filter=True)
+    assert np.allclose(score_listings(catalogue, feature_dict, user_prompt, hard_filter=True), expected)
+
+
+@pytest.mark.parametrize("hard_filter", [False, True])
+@pytest.mark.parametrize("feature_dict", FEATURE_DICTS)
+def test_description_index_matches_iterrows(catalogue, feature_dict, hard_filter):
+    index = DescriptionIndex.build(catalogue["description"])
+    user_prompt = PROMPTS[1]
+    expected = numeric_reference_scores(catalogue, feature_dict, user_prompt, index, hard_filter)
+    actual = score_listings(catalogue, feature_dict, user_prompt, description_index=index, hard_filter=hard_filter)
+    assert np.allclose(actual, expected)
+
+
+@pytest.mark.parametrize("feature_dict", BASELINE_FEATURE_DICTS)
+@pytest.mark.parametrize("user_prompt", PROMPTS)
+def test_fixture_matches_baseline(feature_dict, user_prompt):
+    expected = calculate_similarity_score(FIXTURE, feature_dict, user_prompt)
+    assert np.allclose(score_listings(FIXTURE, feature_dict, user_prompt), expected)
+
+
+@pytest.mark.parametrize("feature_dict", BASELINE_FEATURE_DICTS)
+@pytest.mark.parametrize("user_prompt", PROMPTS)
+def test_catalogue_matches_baseline(catalogue, feature_dict, user_prompt):
+    expected = calculate_similarity_score(catalogue, feature_dict, user_prompt)
+    assert np.allclose(score_listings(catalogue, feature_dict, user_prompt), expected)
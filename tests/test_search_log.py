@@ -0,0 +1,45 @@
+"""SearchLog: записи процессов, порождённых fork, пишет один писатель в один файл с общей ротацией"""
+import json
+import os
+
+import pytest
+
+from src.search_log import SearchLog
+
+
+def _records(directory):
+    return [json.loads(line) for name in sorted(os.listdir(directory))
+            for line in open(os.path.join(directory, name), encoding="utf-8")]
+
+
+def test_rotation_keeps_backup_count(tmp_path):
+    log = SearchLog(str(tmp_path / "search_log.jsonl"), max_bytes=600, backup_count=2)
+    for i in range(40):
+        log.log(f"запрос {i}", {"rooms": "2"}, [("https://krisha.kz/a/show/1", 0.5)])
+    assert log.flush(5)
+    assert sorted(os.listdir(tmp_path)) == ["search_log.jsonl", "search_log.jsonl.1", "search_log.jsonl.2"]
+    assert all(os.path.getsize(tmp_path / name) <= 600 for name in os.listdir(tmp_path))
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="нужен os.fork")
+def test_forked_workers_share_one_writer(tmp_path):
+    log = SearchLog(str(tmp_path / "search_log.jsonl"), max_bytes=10 ** 6)
+    pids = []
+    for worker in range(3):
+        pid = os.fork()
+        if pid == 0:
+            for i in range(20):
+                log.log(f"{worker}-{i}", {"description": "строка\nс переводом"}, [("u", 1)])
+            os._exit(0)
+        pids.append(pid)
+    for pid in pids:
+        os.waitpid(pid, 0)
+    log.log("owner", {}, [])
+    assert log.flush(5)
+
+    # Один файл, без файлов по pid, и ни одна запись не потеряна и не склеена с другой
+    assert os.listdir(tmp_path) == ["search_log.jsonl"]
+    records = _records(tmp_path)
+    assert sorted(r["user_input"] for r in records) == sorted(
+        [f"{w}-{i}" for w in range(3) for i in range(20)] + ["owner"])
+    assert {r["pid"] for r in records} == set(pids) | {os.getpid()}
@@ -0,0 +1,72 @@
+"""
+search_top_k в точном режиме (как в app.py) возвращает тот же top-k, что и полный
+перебор score_listings, на каталоге больше FULL_SCAN_ROWS; приближённый режим
+возвращает k строк из того же каталога
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.description_index import DescriptionIndex
+from src.scoring import score_listings, top_k_batch
+from src.structured_index import FULL_SCAN_ROWS, StructuredIndex, search_top_k
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "apartments.csv")
+
+QUERIES = [
+    ("Двушка в Бостандыкском районе", {"rooms": "2", "city_region": "Бостандыкский р-н"}),
+    ("Однокомнатная на Абая с мебелью", {"rooms": "1", "adress": "Абая", "furniture_detailed": "полностью"}),
+    ("трёшка до 300 тысяч", {"rooms": "3", "price": "до 300000", "area": "70-90"}),
+    ("квартира в Медеуском районе от 3 этажа", {"city_region": "Медеуский р-н", "floor": "от 3"}),
+    ("уютная квартира с видом на горы", {}),
+]
+
+
+@pytest.fixture(scope="module")
+def catalogue():
+    # Реальный каталог, повторённый до размера больше порога полного перебора; цены и
+    # площади слегка различаются между копиями, чтобы ярусы не совпадали целиком
+    base = pd.read_csv(DATA_PATH, index_col=0)
+    copies = FULL_SCAN_ROWS // len(base) + 2
+    rng = np.random.default_rng(0)
+    df = pd.concat([base] * copies, ignore_index=True)
+    df["price"] = (pd.to_numeric(df["price"], errors="coerce") * rng.uniform(0.8, 1.2, len(df))).round(-3)
+    df["description"] = [f"{text} вариант {i % 7}" if isinstance(text, str) else text
+                         for i, text in enumerate(df["description"])]
+    assert len(df) > FULL_SCAN_ROWS
+    return df, StructuredIndex(df), DescriptionIndex.build(df["description"])
+
+
+@pytest.mark.parametrize("hard_filter", [False, True])
+@pytest.mark.parametrize("use_description_index", [False, True])
+@pytest.mark.parametrize("user_prompt, features", QUERIES)
+def test_exact_top_k_matches_full_scan(catalogue, user_prompt, features, use_description_index, hard_filter):
+    df, structured_index, description_index = catalogue
+    description_index = description_index if use_description_index else None
+    positions, scores = search_top_k(df, features, user_prompt, k=10, structured_index=structured_index,
+                                     description_index=description_index, exact=True, hard_filter=hard_filter)
+
+    full = score_listings(df, features, user_prompt, description_index, numeric=structured_index.numeric,
+                          hard_filter=hard_filter)
+    allowed = structured_index.numeric_filter_rows(features) if hard_filter else None
+    if allowed is not None:
+        # Строки вне диапазонов в выдачу не попадают
+        full = np.where(np.isin(np.arange(len(full)), allowed), full, -1.0)
+    expected_positions, expected_scores = top_k_batch(full[None, :], 10)
+    keep = expected_scores[0] >= 0
+    assert list(positions) == list(expected_positions[0][keep])
+    assert np.allclose(scores, expected_scores[0][keep])
+
+
+@pytest.mark.parametrize("user_prompt, features", QUERIES)
+def test_approximate_top_k_returns_k_rows(catalogue, user_prompt, features):
+    df, structured_index, description_index = catalogue
+    positions, scores = search_top_k(df, features, user_prompt, k=10, structured_index=structured_index,
+                                     description_index=description_index)
+    full = score_listings(df, features, user_prompt, description_index, numeric=structured_index.numeric)
+    assert len(positions) == 10 and len(set(positions)) == 10
+    # Оценки приближённого поиска - те же оценки строк, что и при полном переборе
+    assert np.allclose(scores, full[positions])
+    assert np.all(np.diff(scores) <= 0)